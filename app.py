@@ -1,22 +1,98 @@
+import asyncio
+import hmac
+import json
 import logging
-from typing import Optional
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Dict, List, Literal, Optional, TypeVar
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-import gradio as gr
 
-from services.legal_generator import generate_legal_document, stream_legal_document
-from fastapi.responses import StreamingResponse
-from legal_assistant import interface as gradio_interface
+from config import (
+    ADMIN_TOKEN,
+    BATCH_CONCURRENCY,
+    BATCH_MAX_CONCURRENCY,
+    BATCH_MAX_ITEMS,
+    BACKEND_HEALTH_INTERVAL,
+    BULK_EXPORT_MAX_DOCS,
+    STREAM_FLUSH_BYTES,
+    STREAM_FLUSH_INTERVAL,
+    MODEL_NAME,
+    ENABLE_UI,
+    DOCUMENT_STORE_PRUNE_INTERVAL,
+    KEEP_ALIVE_INTERVAL,
+    WARMUP_ON_STARTUP,
+)
+from services.legal_generator import (
+    generate_legal_document,
+    stream_legal_document,
+    normalize_doc_type,
+    document_title,
+    response_cache,
+    context_cache,
+    scheduler,
+)
+from services.ollama_client import open_clients, close_clients, run_health_checks, backend_pool
+from services.jobs import job_manager, JOB_CANCELLED, JOB_DONE, JOB_FAILED
+from services.warmup import model_warmer
+from services.token_budget import token_budgets
+from services.scheduler import AdmissionError, PRIORITY_BATCH
+from services.streaming import StreamAbandoned, coalesce, sse_event, stop_on
+from services.profiler import profiler
+from services.tracing import TracingMiddleware, current_trace, span
+from services.document_store import document_store, run_retention, store_document
+from services.export_utils import (
+    EXPORT_FORMATS,
+    IncrementalExport,
+    export_filename,
+    incremental_export,
+    render_async,
+    render_stored_async,
+    shutdown_export_pool,
+    stream_zip,
+)
+from services.metrics import (
+    CONTENT_TYPE,
+    REGISTRY,
+    REQUEST_ERRORS,
+    REQUEST_LATENCY,
+    REQUESTS_IN_FLIGHT,
+    STREAMS_CANCELLED,
+)
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
 
 # Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("legal-assistant")
 
+T = TypeVar("T")
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # One pooled HTTP client per process, shared by every Ollama call
+    await open_clients()
+    tasks = [asyncio.create_task(run_health_checks(BACKEND_HEALTH_INTERVAL))]
+    if document_store.enabled:
+        tasks.append(asyncio.create_task(run_retention(DOCUMENT_STORE_PRUNE_INTERVAL)))
+    # Load the models in the background so the API is up (and /health reports "warm") while they load
+    tasks.append(asyncio.create_task(model_warmer.run(KEEP_ALIVE_INTERVAL, warm_up=WARMUP_ON_STARTUP)))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.to_thread(profiler.stop)
+        await job_manager.shutdown()
+        shutdown_export_pool()
+        document_store.close()
+        await close_clients()
+
 
-app = FastAPI(title="AI Legal Assistant API")
+app = FastAPI(title="AI Legal Assistant API", lifespan=lifespan)
 
 # CORS (adjust origins for your environment)
 app.add_middleware(
@@ -25,7 +101,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+# Spans of each request, reported in Server-Timing headers (and the opt-in "timing" breakdown)
+app.add_middleware(TracingMiddleware)
+
+
+@app.exception_handler(AdmissionError)
+async def admission_error_handler(_: Request, exc: AdmissionError) -> JSONResponse:
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(int(exc.retry_after))},
+    )
 
 
 class LegalRequest(BaseModel):
@@ -36,61 +124,553 @@ class LegalRequest(BaseModel):
     salary: Optional[str] = Field("", description="Annual, for employment")
     temperature: Optional[float] = Field(None, ge=0.0, le=2.0)
     top_p: Optional[float] = Field(None, ge=0.0, le=1.0)
-    num_predict: Optional[int] = Field(None, ge=1, le=8192)
+    num_predict: Optional[int] = Field(None, ge=1, le=8192,
+                                       description="Token budget; default: learned per doc_type (NUM_PREDICT at first)")
+    bypass_cache: bool = Field(False, description="Skip the response cache and always call the model")
+    priority: Literal["interactive", "batch"] = Field(PRIORITY_BATCH, description="Scheduling class")
+    parallel_sections: bool = Field(False, description="Generate the template's sections concurrently")
+    skeleton: Optional[bool] = Field(None, description="Fill party names into a cached placeholder skeleton "
+                                                       "(default: SKELETON_MODE)")
+    keep_alive: Optional[str] = Field(None, pattern=r"^(-?\d+|\d+(\.\d+)?(ms|s|m|h))$",
+                                      description="How long Ollama keeps the model loaded afterwards, e.g. "
+                                                  "'30m', or seconds ('-1' = forever); default: KEEP_ALIVE")
+    think: Optional[bool] = Field(None, description="Reasoning models: false skips the reasoning phase, which is "
+                                                    "faster and cheaper; default: THINK")
+    export: List[Literal["pdf", "docx"]] = Field(
+        [], description="Build these files while the document is generated, so /legal/documents/{id}/export is "
+                        "ready when it ends (needs the document store)"
+    )
+    timing: bool = Field(False, description="Include a timing breakdown (spans in ms) in the response, or in the "
+                                            "SSE done event")
 
 
 class LegalResponse(BaseModel):
     response: str
+    id: Optional[str] = Field(None, description="Document id for /legal/documents/{id}; null if the store is off")
+    timing: Optional[Dict[str, Any]] = Field(None, description="Where the time went, if the request asked")
+
+
+class ProfilerRequest(BaseModel):
+    rate: float = Field(1.0, gt=0.0, le=1.0, description="Fraction of requests to profile")
+    duration: float = Field(60.0, ge=0.0, description="Seconds before it stops and writes the profile; 0 = until "
+                                                      "stopped")
+
+
+class JobInfo(BaseModel):
+    id: str
+    status: Literal["queued", "running", "done", "failed", "cancelled"]
+    doc_type: Optional[str] = None
+    bytes: int = Field(0, description="Output buffered so far; resume streams from any offset up to this")
+    error: Optional[str] = None
+    document_id: Optional[str] = None
+    exports: List[str] = Field([], description="Formats built while generating, stored with the document")
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+class DocumentResponse(BaseModel):
+    id: str
+    doc_type: str
+    title: str
+    text: str
+    created_at: float
+
+
+class ExportRequest(BaseModel):
+    text: str = Field(..., min_length=1)
+    title: str = Field("AI Legal Document")
+
+
+class BulkExportItem(ExportRequest):
+    name: Optional[str] = Field(None, description="File name stem inside the archive")
+
+
+class BulkExportRequest(BaseModel):
+    documents: List[BulkExportItem] = Field(..., min_length=1, max_length=BULK_EXPORT_MAX_DOCS)
+    formats: List[Literal["pdf", "docx"]] = Field(["pdf", "docx"], min_length=1)
+
+
+class BatchRequest(BaseModel):
+    items: List[LegalRequest] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+    concurrency: Optional[int] = Field(None, ge=1, le=BATCH_MAX_CONCURRENCY,
+                                       description="Concurrent generations for this batch")
+
+
+def _generation_kwargs(req: LegalRequest) -> Dict[str, Any]:
+    return dict(
+        doc_type=req.doc_type,
+        party1=req.party1,
+        party2=req.party2,
+        duration=req.duration or "",
+        salary=req.salary or "",
+        temperature=req.temperature,
+        top_p=req.top_p,
+        num_predict=req.num_predict,
+        use_cache=not req.bypass_cache,
+        priority=req.priority,
+        parallel_sections=req.parallel_sections,
+        skeleton=req.skeleton,
+        keep_alive=req.keep_alive,
+        think=req.think,
+    )
+
+
+async def _store_document(text: str, doc_type: str, exports: Optional[IncrementalExport] = None) -> Optional[str]:
+    """Store a generated document, with the files `exports` built from it, and return its id."""
+    with span("store"):
+        doc_id = await store_document(text, normalize_doc_type(doc_type) or doc_type, document_title(doc_type))
+    if exports is not None:
+        await exports.save(doc_id)
+    return doc_id
+
+
+def _exports(req: LegalRequest) -> Optional[IncrementalExport]:
+    return incremental_export(req.export, document_title(req.doc_type))
+
+
+def _timing(req: LegalRequest) -> Optional[Dict[str, Any]]:
+    trace = current_trace()
+    return trace.breakdown() if req.timing and trace is not None else None
+
+
+class _RequestMetrics:
+    """Latency, in-flight and error accounting for one API request; finish() is idempotent."""
+
+    def __init__(self, endpoint: str, doc_type: str = "") -> None:
+        self.endpoint = endpoint
+        self.doc_type = normalize_doc_type(doc_type) or "unknown" if doc_type else ""
+        self.started = time.perf_counter()
+        self.finished = False
+        REQUESTS_IN_FLIGHT.labels(endpoint=endpoint).inc()
+
+    def error(self, kind: str, doc_type: Optional[str] = None) -> None:
+        label = self.doc_type if doc_type is None else (normalize_doc_type(doc_type) or "unknown")
+        REQUEST_ERRORS.labels(endpoint=self.endpoint, doc_type=label, kind=kind).inc()
+
+    def finish(self) -> None:
+        if self.finished:
+            return
+        self.finished = True
+        REQUESTS_IN_FLIGHT.labels(endpoint=self.endpoint).dec()
+        REQUEST_LATENCY.labels(endpoint=self.endpoint, doc_type=self.doc_type, model=MODEL_NAME).observe(
+            time.perf_counter() - self.started
+        )
+
+
+async def _prime(chunks: AsyncIterator[str]) -> AsyncGenerator[str, None]:
+    """Pull the first chunk up front so validation and admission errors become HTTP errors, not stream text."""
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = None
+
+    async def rest() -> AsyncGenerator[str, None]:
+        if first is None:
+            return
+        yield first
+        async for chunk in chunks:
+            yield chunk
+
+    return rest()
 
 
 @app.get("/health")
 async def health() -> dict:
-    return {"status": "ok"}
+    return {
+        "status": "ok" if backend_pool.healthy_count() else "degraded",
+        "backends": backend_pool.stats(),
+        "scheduler": scheduler.stats(),
+        "cache": response_cache.stats(),
+        "context_cache": context_cache.stats(),
+        "document_store": await asyncio.to_thread(document_store.stats),
+        "jobs": job_manager.stats(),
+        "models": model_warmer.stats(),
+        "token_budgets": token_budgets.stats(),
+    }
+
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+async def _client_gone(request: Request) -> None:
+    """Return once the client has disconnected (the request body has already been read)."""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def _unless_disconnected(request: Request, work: Awaitable[T]) -> T:
+    """Await `work`, cancelling it (and so its upstream call) if the client disconnects first."""
+    task = asyncio.ensure_future(work)
+    gone = asyncio.ensure_future(_client_gone(request))
+    try:
+        await asyncio.wait({task, gone}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        gone.cancel()
+        if not task.done():
+            task.cancel()
+            await asyncio.wait({task})
+    if gone.done() and not gone.cancelled():
+        STREAMS_CANCELLED.labels(source="api").inc()
+        # Nobody is left to read this status; it only shows in access logs
+        raise HTTPException(status_code=499, detail="Client closed request")
+    return task.result()
 
 
 @app.post("/legal/", response_model=LegalResponse)
-async def legal(req: LegalRequest) -> LegalResponse:
+async def legal(req: LegalRequest, request: Request) -> LegalResponse:
+    m = _RequestMetrics("/legal/", req.doc_type)
     try:
-        text = await generate_legal_document(
-            doc_type=req.doc_type,
-            party1=req.party1,
-            party2=req.party2,
-            duration=req.duration or "",
-            salary=req.salary or "",
-            temperature=req.temperature,
-            top_p=req.top_p,
-            num_predict=req.num_predict,
-        )
-        return LegalResponse(response=text)
+        text = await _unless_disconnected(request, generate_legal_document(**_generation_kwargs(req)))
+        exports = _exports(req)
+        if exports is not None:
+            exports.feed(text)
+        doc_id = await _store_document(text, req.doc_type, exports)
+        return LegalResponse(response=text, id=doc_id, timing=_timing(req))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        m.error("invalid_request")
+        raise HTTPException(status_code=400, detail=str(e))
+    except AdmissionError:
+        m.error("admission")
+        raise
+    except Exception as e:
+        m.error("upstream")
+        logger.exception("Generation failed")
+        raise HTTPException(status_code=502, detail=f"Generation failed: {e}")
+    finally:
+        m.finish()
+
+
+async def _open_stream(req: LegalRequest, request: Request, m: _RequestMetrics) -> AsyncGenerator[str, None]:
+    """Start a document stream, mapping errors raised before the first chunk to HTTP errors.
+
+    The result stops (raising StreamAbandoned) as soon as the client disconnects, also before the first chunk.
+    """
+    try:
+        chunks = await _unless_disconnected(request, _prime(stream_legal_document(**_generation_kwargs(req))))
+    except HTTPException:
+        m.finish()
+        raise
     except ValueError as e:
+        m.error("invalid_request")
+        m.finish()
         raise HTTPException(status_code=400, detail=str(e))
+    except AdmissionError:
+        m.error("admission")
+        m.finish()
+        raise
     except Exception as e:
+        m.error("upstream")
+        m.finish()
         logger.exception("Generation failed")
         raise HTTPException(status_code=502, detail=f"Generation failed: {e}")
+    return stop_on(coalesce(chunks, STREAM_FLUSH_BYTES, STREAM_FLUSH_INTERVAL), _client_gone(request))
 
 
 @app.post("/legal/stream")
-async def legal_stream(req: LegalRequest):
+async def legal_stream(req: LegalRequest, request: Request):
+    m = _RequestMetrics("/legal/stream", req.doc_type)
+    chunks = await _open_stream(req, request, m)
+
     async def generator():
+        parts: List[str] = []
+        exports = _exports(req)
         try:
-            async for chunk in stream_legal_document(
-                doc_type=req.doc_type,
-                party1=req.party1,
-                party2=req.party2,
-                duration=req.duration or "",
-                salary=req.salary or "",
-                temperature=req.temperature,
-                top_p=req.top_p,
-                num_predict=req.num_predict,
-            ):
+            async for chunk in chunks:
                 yield chunk
+                parts.append(chunk)
+                if exports is not None:
+                    exports.feed(chunk)
+            await _store_document("".join(parts), req.doc_type, exports)
+        except StreamAbandoned:
+            # Client gone: the upstream call has been cancelled and its model slot released
+            STREAMS_CANCELLED.labels(source="api").inc()
+        except asyncio.CancelledError:
+            # The server noticed first (or is shutting down); unwinding cancels the upstream call the same way
+            STREAMS_CANCELLED.labels(source="api").inc()
+            raise
         except Exception as e:
+            m.error("upstream")
             yield f"\n[STREAM ERROR] {e}"
+        finally:
+            if exports is not None:
+                exports.close()
+            m.finish()
 
     return StreamingResponse(generator(), media_type="text/plain")
 
 
-# Mount Gradio UI
-app = gr.mount_gradio_app(app, gradio_interface, path="/ui")
+@app.post("/legal/stream/sse")
+async def legal_stream_sse(req: LegalRequest, request: Request):
+    """Server-Sent Events variant of /legal/stream: text batches as `message` events, then `done` or `error`.
+
+    The `done` event's data is {"document_id": ...} (and "timing" if asked); files asked for with `export` are
+    stored by then.
+    """
+    m = _RequestMetrics("/legal/stream/sse", req.doc_type)
+    chunks = await _open_stream(req, request, m)
+
+    async def events():
+        parts: List[str] = []
+        exports = _exports(req)
+        try:
+            async for chunk in chunks:
+                yield sse_event(chunk)
+                parts.append(chunk)
+                if exports is not None:
+                    exports.feed(chunk)
+            doc_id = await _store_document("".join(parts), req.doc_type, exports)
+        except StreamAbandoned:
+            STREAMS_CANCELLED.labels(source="api").inc()
+            return
+        except asyncio.CancelledError:
+            STREAMS_CANCELLED.labels(source="api").inc()
+            raise
+        except Exception as e:
+            m.error("upstream")
+            yield sse_event(str(e), event="error")
+            return
+        finally:
+            if exports is not None:
+                exports.close()
+            m.finish()
+        done: Dict[str, Any] = {"document_id": doc_id}
+        if req.timing:
+            done["timing"] = _timing(req)
+        yield sse_event(json.dumps(done), event="done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/legal/batch")
+async def legal_batch(batch: BatchRequest):
+    """Generate many documents; results stream back as NDJSON lines in completion order, tagged by index."""
+    limit = asyncio.Semaphore(batch.concurrency or BATCH_CONCURRENCY)
+    m = _RequestMetrics("/legal/batch")
+
+    async def run_one(index: int, item: LegalRequest) -> Dict[str, Any]:
+        async with limit:
+            try:
+                text = await generate_legal_document(**{**_generation_kwargs(item), "priority": PRIORITY_BATCH})
+                exports = _exports(item)
+                if exports is not None:
+                    exports.feed(text)
+                doc_id = await _store_document(text, item.doc_type, exports)
+                return {"index": index, "status": 200, "response": text, "id": doc_id}
+            except ValueError as e:
+                m.error("invalid_request", item.doc_type)
+                return {"index": index, "status": 400, "error": str(e)}
+            except AdmissionError as e:
+                m.error("admission", item.doc_type)
+                return {"index": index, "status": e.status_code, "error": str(e), "retry_after": e.retry_after}
+            except Exception as e:
+                m.error("upstream", item.doc_type)
+                logger.exception("Batch item %d failed", index)
+                return {"index": index, "status": 502, "error": f"Generation failed: {e}"}
+
+    async def results():
+        tasks = [asyncio.ensure_future(run_one(i, item)) for i, item in enumerate(batch.items)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + "\n"
+        finally:
+            # Client went away: stop the items that have not finished yet and wait for them to unwind. Shielded
+            # because this generator is being cancelled too, and a second cancel would cut their cleanup short
+            for task in tasks:
+                task.cancel()
+            try:
+                await asyncio.shield(asyncio.gather(*tasks, return_exceptions=True))
+            finally:
+                m.finish()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@app.post("/legal/jobs", response_model=JobInfo, status_code=202)
+async def create_job(req: LegalRequest) -> JSONResponse:
+    """Start a generation in the background and return its job id at once."""
+    try:
+        job = await job_manager.submit(export=req.export, **_generation_kwargs(req))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(status_code=202, content=job.info(), headers={"Location": f"/legal/jobs/{job.id}"})
+
+
+async def _get_job(job_id: str):
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+
+@app.get("/legal/jobs/{job_id}", response_model=JobInfo)
+async def job_status(job_id: str) -> Dict[str, Any]:
+    return (await _get_job(job_id)).info()
+
+
+@app.delete("/legal/jobs/{job_id}", response_model=JobInfo)
+async def cancel_job(job_id: str) -> Dict[str, Any]:
+    """Cancel a queued or running job; its upstream call stops at once. 409 if it already finished."""
+    job = await _get_job(job_id)
+    if job.finished and job.status != JOB_CANCELLED:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    await job_manager.cancel(job)
+    return job.info()
+
+
+@app.get("/legal/jobs/{job_id}/result", response_model=LegalResponse)
+async def job_result(job_id: str) -> LegalResponse:
+    """The finished document; 409 while the job is still running or was cancelled, 502 if it failed."""
+    job = await _get_job(job_id)
+    if job.status == JOB_FAILED:
+        raise HTTPException(status_code=502, detail=f"Generation failed: {job.error}")
+    if job.status != JOB_DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return LegalResponse(response=job.text(), id=job.document_id)
+
+
+@app.get("/legal/jobs/{job_id}/stream")
+async def job_stream(job_id: str, offset: int = Query(0, ge=0, description="Resume after this many bytes")):
+    """Job output as plain text from `offset` bytes on, live until the job ends; reconnecting never re-runs it."""
+    job = await _get_job(job_id)
+
+    async def generator():
+        async for _, data in job.read(offset):
+            yield data
+        if job.status in (JOB_FAILED, JOB_CANCELLED):
+            yield f"\n[STREAM ERROR] {job.error}".encode("utf-8")
+
+    return StreamingResponse(generator(), media_type="text/plain; charset=utf-8",
+                             headers={"X-Job-Offset": str(offset)})
+
+
+@app.get("/legal/jobs/{job_id}/stream/sse")
+async def job_stream_sse(
+    job_id: str,
+    last_event_id: Optional[str] = Header(None),
+    offset: int = Query(0, ge=0, description="Resume offset when no Last-Event-ID header is sent"),
+):
+    """SSE job output. Each event id is the byte offset after it, so EventSource reconnects resume automatically."""
+    job = await _get_job(job_id)
+    start = offset
+    if last_event_id:
+        try:
+            start = max(0, int(last_event_id))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Last-Event-ID must be a byte offset")
+
+    async def events():
+        end = start
+        async for end, data in job.read(start):
+            yield sse_event(data.decode("utf-8", errors="replace"), event_id=str(end))
+        if job.status in (JOB_FAILED, JOB_CANCELLED):
+            yield sse_event(job.error or "", event="error", event_id=str(end))
+        else:
+            yield sse_event(json.dumps({"document_id": job.document_id}), event="done", event_id=str(end))
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/legal/export")
+async def legal_export(req: ExportRequest, fmt: Literal["pdf", "docx"] = Query(..., alias="format")) -> Response:
+    """Render text as PDF or DOCX in memory, off the event loop, and return the file bytes."""
+    m = _RequestMetrics("/legal/export")
+    try:
+        data = await render_async(fmt, req.text, req.title)
+    finally:
+        m.finish()
+    _, media_type, ext = EXPORT_FORMATS[fmt]
+    return Response(
+        content=data,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(ext)}"'},
+    )
+
+
+@app.get("/legal/documents/{doc_id}", response_model=DocumentResponse)
+async def get_document(doc_id: str) -> DocumentResponse:
+    doc = await asyncio.to_thread(document_store.get, doc_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return DocumentResponse(id=doc.id, doc_type=doc.doc_type, title=doc.title, text=doc.text,
+                            created_at=doc.created_at)
+
+
+@app.get("/legal/documents/{doc_id}/export")
+async def export_document(doc_id: str, fmt: Literal["pdf", "docx"] = Query(..., alias="format")) -> Response:
+    """Download a stored document as PDF or DOCX; the rendered file is kept, so repeat downloads skip rendering."""
+    m = _RequestMetrics("/legal/documents/export")
+    try:
+        data = await render_stored_async(doc_id, fmt)
+    finally:
+        m.finish()
+    if data is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    _, media_type, ext = EXPORT_FORMATS[fmt]
+    return Response(
+        content=data,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(ext, prefix=doc_id)}"'},
+    )
+
+
+@app.post("/legal/export/bulk")
+async def legal_export_bulk(req: BulkExportRequest) -> StreamingResponse:
+    """Render many documents across all cores and stream them back as one ZIP archive."""
+    documents = [(d.name or "", d.text, d.title) for d in req.documents]
+    return StreamingResponse(
+        stream_zip(documents, req.formats),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{export_filename("zip", prefix="documents")}"'},
+    )
+
+
+def _require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Admin endpoints exist only with ADMIN_TOKEN set, and need it in the X-Admin-Token header."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest((x_admin_token or "").encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.get("/admin/profiler", dependencies=[Depends(_require_admin)])
+async def profiler_status() -> Dict[str, Any]:
+    return profiler.stats()
+
+
+@app.post("/admin/profiler", dependencies=[Depends(_require_admin)])
+async def profiler_start(req: ProfilerRequest) -> Dict[str, Any]:
+    """Profile a sample of this worker's requests; the stack samples are written under PROFILE_DIR."""
+    try:
+        profiler.start(req.rate, req.duration)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return profiler.stats()
+
+
+@app.delete("/admin/profiler", dependencies=[Depends(_require_admin)])
+async def profiler_stop() -> Dict[str, Any]:
+    """Stop profiling and write the profile; `last_dump` is its path on this server."""
+    await asyncio.to_thread(profiler.stop)
+    return profiler.stats()
+
+
+# Mount Gradio UI (imported only when enabled: gradio alone adds seconds and ~100 MB to every worker)
+if ENABLE_UI:
+    import gradio as gr
+
+    from legal_assistant import interface as gradio_interface
+
+    app = gr.mount_gradio_app(app, gradio_interface, path="/ui")
 
 # Run with: uvicorn app:app --reload
@@ -0,0 +1,279 @@
+"""Mock of Ollama's HTTP API for load tests and benchmarks without a GPU.
+
+Serves `/api/generate` (streaming JSONL or a single JSON body), `/api/tags` and `/api/ps` with configurable
+time to first token, decode speed, jitter, stalls, error rate, reasoning and text after the closing notice.
+Run it with:
+
+    python -m bench.mock_ollama --port 11500 --ttft 0.2 --tokens-per-sec 40 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from datetime import datetime
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+SECTION_TEXT = (
+    "The parties agree that each obligation in this section is binding upon execution of this agreement and "
+    "remains in force for the full term unless terminated in writing by either party with reasonable notice."
+)
+NOTICE = "Important Notice: This document is AI-generated and must be reviewed by a qualified attorney."
+REASONING_TEXT = "The user wants a contract. I should list the parties, then each clause, then the notice."
+TRAILING_TEXT = (
+    "Let me know if you would like any clause expanded, shortened or adapted to the law of a specific jurisdiction."
+)
+
+
+class MockSettings:
+    """Latency and failure profile of the mock model server."""
+
+    def __init__(
+        self,
+        ttft: float = 0.2,
+        tokens_per_sec: float = 40.0,
+        tokens: int = 400,
+        jitter: float = 0.1,
+        error_rate: float = 0.0,
+        load_time: float = 0.0,
+        keep_alive: float = 300.0,
+        stall_rate: float = 0.0,
+        stall_time: float = 60.0,
+        trailing: int = 0,
+        think_tokens: int = 0,
+        models: Optional[List[str]] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.ttft = ttft  # seconds before the first token (prompt eval)
+        self.tokens_per_sec = tokens_per_sec
+        self.tokens = tokens  # document length; a smaller num_predict cuts it off (done_reason "length")
+        self.jitter = jitter  # +/- fraction applied to ttft and per-token delay
+        self.error_rate = error_rate  # fraction of requests answered with HTTP 500
+        self.load_time = load_time  # delay on a request that finds its model unloaded (cold load)
+        self.stall_rate = stall_rate  # fraction of requests that hang for stall_time before the first token
+        self.stall_time = stall_time
+        self.trailing = trailing  # tokens of chatter after the closing notice, as models often add
+        self.think_tokens = think_tokens  # reasoning tokens before the document, unless the request sets think=false
+        self.keep_alive = keep_alive  # seconds a model stays loaded after its last request, unless it sets keep_alive
+        self.models = models or ["deepseek-r1"]
+        self.rng = random.Random(seed)
+
+
+def document_tokens(count: int, placeholders: Optional[List[str]] = None, trailing: int = 0) -> List[str]:
+    """Whitespace tokens of a contract-like document, ending with the notice when it fits.
+
+    Placeholders such as [[PARTY_1]] that the prompt asks for are echoed once, like a skeleton would be.
+    `trailing` more tokens of chatter follow the notice, on a new paragraph.
+    """
+    words: List[str] = ["Legal", "Agreement\n\n"]
+    if placeholders:
+        words += ["Parties ", "and ", "terms: "] + [p + " " for p in placeholders]
+        words[-1] = words[-1].rstrip() + "\n\n"
+    notice = [w + " " for w in NOTICE.split(" ")]
+    section = 1
+    while len(words) + len(notice) < count:
+        words.append(f"{section}.")
+        words.extend(w + " " for w in SECTION_TEXT.split(" "))
+        words[-1] = words[-1].rstrip() + "\n\n"
+        section += 1
+    body = words[: max(0, count - len(notice))]
+    tokens = (body + notice)[:count]
+    if trailing > 0 and tokens:
+        tokens[-1] = tokens[-1].rstrip() + "\n\n"
+        chatter = [w + " " for w in TRAILING_TEXT.split(" ")]
+        tokens += [chatter[i % len(chatter)] for i in range(trailing)]
+    return tokens
+
+
+def reasoning_tokens(count: int) -> List[str]:
+    """`count` reasoning tokens; inline they are wrapped in <think> tags, split across tokens like a tokenizer would."""
+    words = [w + " " for w in REASONING_TEXT.split(" ")]
+    return [words[i % len(words)] for i in range(count)]
+
+
+def keep_alive_seconds(value: Any, default: float) -> float:
+    """Ollama's keep_alive: seconds as a number, or a duration such as "30m"; negative means forever."""
+    if value is None or value == "":
+        return default
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        match = re.fullmatch(r"(-?\d+(?:\.\d+)?)(ms|s|m|h)?", str(value).strip())
+        if match is None:
+            return default
+        scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}.get(match.group(2) or "s", 1)
+        seconds = float(match.group(1)) * scale
+    return float("inf") if seconds < 0 else seconds
+
+
+def create_app(settings: MockSettings) -> FastAPI:
+    app = FastAPI(title="Mock Ollama")
+    stats: Dict[str, Any] = {"requests": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0, "tokens": 0,
+                             "stalls": 0}
+    loaded: Dict[str, float] = {}  # model -> time it is unloaded
+
+    def _iso(timestamp: float) -> str:
+        return datetime.fromtimestamp(timestamp).astimezone().isoformat()
+
+    def _vary(value: float) -> float:
+        if settings.jitter <= 0:
+            return value
+        return max(0.0, value * (1 + settings.rng.uniform(-settings.jitter, settings.jitter)))
+
+    def _done_line(model: str, count: int, load: float, prompt_eval: float, eval_time: float,
+                   reason: str) -> Dict[str, Any]:
+        return {
+            "model": model,
+            "response": "",
+            "done": True,
+            "done_reason": reason,
+            "context": [1, 2, 3],
+            "total_duration": int((load + prompt_eval + eval_time) * 1e9),
+            "load_duration": int(load * 1e9),
+            "prompt_eval_count": 64,
+            "prompt_eval_duration": int(prompt_eval * 1e9),
+            "eval_count": count,
+            "eval_duration": int(eval_time * 1e9),
+        }
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        model = body.get("model", settings.models[0])
+        stats["requests"] += 1
+        if settings.error_rate > 0 and settings.rng.random() < settings.error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"error": "mock failure"}, status_code=500)
+
+        now = time.time()
+        load = 0.0 if loaded.get(model, 0.0) > now else settings.load_time
+        loaded[model] = now + load + keep_alive_seconds(body.get("keep_alive"), settings.keep_alive)
+        if not body.get("prompt"):
+            # Empty prompt only loads the model, like the real server
+            await asyncio.sleep(load)
+            return {"model": model, "response": "", "done": True, "load_duration": int(load * 1e9)}
+
+        num_predict = int((body.get("options") or {}).get("num_predict") or 0)
+        placeholders = list(dict.fromkeys(re.findall(r"\[\[[A-Z0-9_]+\]\]", body["prompt"])))
+        # (field, token): reasoning goes inline in <think> tags unless the request sets think, like Ollama
+        think = body.get("think")
+        reasoning = reasoning_tokens(settings.think_tokens) if think is not False else []
+        if reasoning and think is None:
+            reasoning = ["<th", "ink>", "\n"] + reasoning + ["\n</", "think>", "\n\n"]
+        field = "thinking" if think else "response"
+        tokens = [(field, t) for t in reasoning]
+        tokens += [("response", t) for t in document_tokens(settings.tokens, placeholders, settings.trailing)]
+        reason = "length" if 0 < num_predict < len(tokens) else "stop"
+        if num_predict > 0:
+            tokens = tokens[:num_predict]
+        prompt_eval = _vary(settings.ttft)
+        if settings.stall_rate > 0 and settings.rng.random() < settings.stall_rate:
+            stats["stalls"] += 1
+            prompt_eval += settings.stall_time
+        step = 1.0 / settings.tokens_per_sec if settings.tokens_per_sec > 0 else 0.0
+
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+
+        if not body.get("stream", True):
+            try:
+                eval_time = sum(_vary(step) for _ in tokens)
+                await asyncio.sleep(load + prompt_eval + eval_time)
+                stats["tokens"] += len(tokens)
+                done = _done_line(model, len(tokens), load, prompt_eval, eval_time, reason)
+                done["response"] = "".join(t for f, t in tokens if f == "response")
+                if think:
+                    done["thinking"] = "".join(t for f, t in tokens if f == "thinking")
+                return done
+            finally:
+                stats["in_flight"] -= 1
+
+        async def lines() -> AsyncGenerator[str, None]:
+            try:
+                loop = asyncio.get_running_loop()
+                start = loop.time()
+                deadline = start + load + prompt_eval
+                for name, token in tokens:
+                    # Sleep to an absolute schedule so per-token overhead does not slow the stream down
+                    await asyncio.sleep(max(0.0, deadline - loop.time()))
+                    line = {"model": model, "response": "", "done": False}
+                    line[name] = token
+                    yield json.dumps(line) + "\n"
+                    stats["tokens"] += 1
+                    deadline += _vary(step)
+                eval_time = loop.time() - start - load - prompt_eval
+                yield json.dumps(_done_line(model, len(tokens), load, prompt_eval, eval_time, reason)) + "\n"
+            finally:
+                stats["in_flight"] -= 1
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": m, "model": m} for m in settings.models]}
+
+    @app.get("/api/ps")
+    async def ps():
+        now = time.time()
+        return {"models": [
+            {"name": f"{m}:latest", "model": f"{m}:latest",
+             "expires_at": None if expires == float("inf") else _iso(expires)}
+            for m, expires in loaded.items() if expires > now
+        ]}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--ttft", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0, help="decode speed per request")
+    parser.add_argument("--tokens", type=int, default=400, help="document length in tokens")
+    parser.add_argument("--trailing", type=int, default=0,
+                        help="tokens of chatter after the closing notice (what early stopping saves)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="+/- fraction applied to delays")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failing with 500")
+    parser.add_argument("--load-time", type=float, default=0.0, help="cold-load delay when a model is not loaded")
+    parser.add_argument("--stall-rate", type=float, default=0.0,
+                        help="fraction of requests that hang before their first token (a stalled backend)")
+    parser.add_argument("--stall-time", type=float, default=60.0, help="seconds a stalled request hangs")
+    parser.add_argument("--think-tokens", type=int, default=0,
+                        help="reasoning tokens before each document (none when the request sets think=false)")
+    parser.add_argument("--keep-alive", type=float, default=300.0,
+                        help="seconds a model stays loaded when the request sets no keep_alive")
+    parser.add_argument("--models", default="deepseek-r1", help="comma-separated model names to report")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    settings = MockSettings(
+        ttft=args.ttft,
+        tokens_per_sec=args.tokens_per_sec,
+        tokens=args.tokens,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        load_time=args.load_time,
+        keep_alive=args.keep_alive,
+        stall_rate=args.stall_rate,
+        stall_time=args.stall_time,
+        trailing=args.trailing,
+        think_tokens=args.think_tokens,
+        models=[m.strip() for m in args.models.split(",") if m.strip()],
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
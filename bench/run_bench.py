@@ -0,0 +1,570 @@
+"""Load-test the API, the Gradio UI and the exporters against a mock (or real) Ollama and record the results.
+
+Starts `bench.mock_ollama` and the FastAPI app in subprocesses, drives each scenario at every concurrency
+level, prints a summary and writes JSON that a later run can be compared against:
+
+    python -m bench.run_bench --concurrency 1,4,16 --requests 64 --output before.json
+    python -m bench.run_bench --concurrency 1,4,16 --requests 64 --baseline before.json --fail-on-regression
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("legal", "stream", "gradio", "export_pdf", "export_docx")
+# Opt-in scenarios, not run by default
+EXTRA_SCENARIOS = ("disconnect",)
+# Gradio handler replies that signal a failure rather than a document
+GRADIO_ERRORS = ("Input error:", "Generation error:", "The model is busy")
+
+# (latency seconds, time to first token seconds or None, succeeded)
+Sample = Tuple[float, Optional[float], bool]
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Linearly interpolated percentile, q in [0, 100]."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    pos = (len(ordered) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+def summarize(values: Sequence[float]) -> Optional[Dict[str, float]]:
+    """p50/p95/p99/mean/max in milliseconds."""
+    if not values:
+        return None
+    ms = [v * 1000.0 for v in values]
+    return {
+        "p50": round(percentile(ms, 50), 2),
+        "p95": round(percentile(ms, 95), 2),
+        "p99": round(percentile(ms, 99), 2),
+        "mean": round(sum(ms) / len(ms), 2),
+        "max": round(max(ms), 2),
+    }
+
+
+def rss_mb(pid: Optional[int]) -> Dict[str, Optional[float]]:
+    """Current (VmRSS) and peak (VmHWM) resident memory of a process, from /proc (Linux only)."""
+    result: Dict[str, Optional[float]] = {"rss": None, "peak": None}
+    if pid is None:
+        return result
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    result["rss"] = round(int(line.split()[1]) / 1024.0, 1)
+                elif line.startswith("VmHWM:"):
+                    result["peak"] = round(int(line.split()[1]) / 1024.0, 1)
+    except OSError:
+        pass
+    return result
+
+
+def free_port() -> int:
+    """A localhost port that is free right now."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, proc: Optional[subprocess.Popen], timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"Process for {url} exited with code {proc.returncode}")
+        try:
+            if httpx.get(url, timeout=2).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout:.0f}s")
+
+
+@contextmanager
+def server_process(cmd: List[str], ready_url: str, env: Optional[Dict[str, str]] = None,
+                   timeout: float = 120) -> Iterator[subprocess.Popen]:
+    """Run `cmd` from the repo root until the block exits, once `ready_url` answers; the tests use it too."""
+    proc = subprocess.Popen(cmd, cwd=ROOT, env={**os.environ, **(env or {})})
+    try:
+        _wait_ready(ready_url, proc, timeout)
+        yield proc
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def _payload(args: argparse.Namespace, tag: str, i: int) -> Dict[str, Any]:
+    # Unique party names defeat the response cache and single-flight unless --repeat asks for them
+    party = "Bench Tenant" if args.repeat else f"Bench Tenant {tag}-{i}"
+    return {
+        "doc_type": args.doc_type,
+        "party1": "Bench Landlord LLC",
+        "party2": party,
+        "duration": "12",
+        "salary": "$50,000",
+        "num_predict": args.num_predict,
+        "parallel_sections": args.parallel_sections,
+        "skeleton": args.skeleton,
+        "think": False if args.no_think else None,
+    }
+
+
+async def _drive_async(count: int, concurrency: int, call: Callable[[int], Any]) -> List[Sample]:
+    samples: List[Sample] = []
+    counter = itertools.count()
+
+    async def worker() -> None:
+        while True:
+            i = next(counter)
+            if i >= count:
+                return
+            samples.append(await call(i))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples
+
+
+def _drive_threads(count: int, concurrency: int, call: Callable[[Any, int], Sample],
+                   make_state: Callable[[], Any] = lambda: None) -> List[Sample]:
+    samples: List[Sample] = []
+    counter = itertools.count()
+    lock = threading.Lock()
+    states = [make_state() for _ in range(concurrency)]  # built before timing starts
+
+    def worker(state: Any) -> None:
+        while True:
+            with lock:
+                i = next(counter)
+            if i >= count:
+                return
+            sample = call(state, i)
+            with lock:
+                samples.append(sample)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, states))
+    return samples
+
+
+def run_legal(args: argparse.Namespace, base: str, count: int, concurrency: int, tag: str) -> List[Sample]:
+    async def main() -> List[Sample]:
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base, timeout=args.timeout, limits=limits) as client:
+            async def call(i: int) -> Sample:
+                started = time.perf_counter()
+                try:
+                    r = await client.post("/legal/", json=_payload(args, tag, i))
+                    ok = r.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                return time.perf_counter() - started, None, ok
+
+            return await _drive_async(count, concurrency, call)
+
+    return asyncio.run(main())
+
+
+def run_stream(args: argparse.Namespace, base: str, count: int, concurrency: int, tag: str) -> List[Sample]:
+    async def main() -> List[Sample]:
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base, timeout=args.timeout, limits=limits) as client:
+            async def call(i: int) -> Sample:
+                started = time.perf_counter()
+                ttft: Optional[float] = None
+                ok = False
+                try:
+                    async with client.stream("POST", "/legal/stream", json=_payload(args, tag, i)) as r:
+                        parts = []
+                        async for text in r.aiter_text():
+                            if text and ttft is None:
+                                ttft = time.perf_counter() - started
+                            parts.append(text)
+                        ok = r.status_code == 200 and "[STREAM ERROR]" not in "".join(parts)
+                except httpx.HTTPError:
+                    pass
+                return time.perf_counter() - started, ttft, ok
+
+            return await _drive_async(count, concurrency, call)
+
+    return asyncio.run(main())
+
+
+def run_disconnect(args: argparse.Namespace, base: str, count: int, concurrency: int, tag: str) -> List[Sample]:
+    """Clients read the first chunk of /legal/stream, linger `--disconnect-after` seconds and hang up."""
+    async def main() -> List[Sample]:
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base, timeout=args.timeout, limits=limits) as client:
+            async def call(i: int) -> Sample:
+                started = time.perf_counter()
+                ttft: Optional[float] = None
+                try:
+                    async with client.stream("POST", "/legal/stream", json=_payload(args, tag, i)) as r:
+                        async for text in r.aiter_text():
+                            if text:
+                                ttft = time.perf_counter() - started
+                                break
+                        await asyncio.sleep(args.disconnect_after)
+                except httpx.HTTPError:
+                    pass
+                return time.perf_counter() - started, ttft, ttft is not None
+
+            return await _drive_async(count, concurrency, call)
+
+    return asyncio.run(main())
+
+
+def cancellation_counters(base: str) -> Dict[str, float]:
+    """Sum the app's cancellation counters and its busy model slots."""
+    totals = {"tokens_saved": 0.0, "streams_cancelled": 0.0, "active_slots": 0.0}
+    prefixes = {"ollama_tokens_saved_total": "tokens_saved", "legal_streams_cancelled_total": "streams_cancelled"}
+    with httpx.Client(base_url=base, timeout=10) as client:
+        for line in client.get("/metrics").text.splitlines():
+            name = line.split("{", 1)[0].split(" ", 1)[0]
+            if name in prefixes and 'reason="early_stop"' not in line:
+                totals[prefixes[name]] += float(line.rsplit(" ", 1)[1])
+        scheduler = client.get("/health").json().get("scheduler") or {}
+        totals["active_slots"] = float(sum(m.get("active", 0) for m in scheduler.values()))
+    return totals
+
+
+def run_gradio(args: argparse.Namespace, base: str, count: int, concurrency: int, tag: str) -> List[Sample]:
+    from gradio_client import Client
+
+    labels = {"nda": "NDA", "rental agreement": "Rental Agreement", "employment contract": "Employment Contract"}
+    label = labels.get(args.doc_type, args.doc_type.title())
+
+    def call(client: Any, i: int) -> Sample:
+        p = _payload(args, tag, i)
+        started = time.perf_counter()
+        ttft: Optional[float] = None
+        last = ""
+        try:
+            job = client.submit(label, p["party1"], p["party2"], p["duration"], p["salary"], 0.3, 0.9,
+                                args.num_predict or 0, True, api_name="/generate")
+            for update in job:
+                if update and ttft is None:
+                    ttft = time.perf_counter() - started
+                last = update or last
+            ok = bool(last) and not last.startswith(GRADIO_ERRORS)
+        except Exception:
+            ok = False
+        return time.perf_counter() - started, ttft, ok
+
+    return _drive_threads(count, concurrency, call, lambda: Client(f"{base}/ui/", verbose=False))
+
+
+def _run_export(fmt: str, args: argparse.Namespace, count: int, concurrency: int) -> List[Sample]:
+    from bench.mock_ollama import document_tokens
+    from services.export_utils import EXPORT_FORMATS
+
+    renderer = EXPORT_FORMATS[fmt][0]
+    text = "".join(document_tokens(args.export_tokens))
+
+    def call(_: Any, i: int) -> Sample:
+        started = time.perf_counter()
+        try:
+            ok = bool(renderer(text, f"Benchmark Document {i}"))
+        except Exception:
+            ok = False
+        return time.perf_counter() - started, None, ok
+
+    return _drive_threads(count, concurrency, call)
+
+
+def run_export_pdf(args: argparse.Namespace, base: str, count: int, concurrency: int, tag: str) -> List[Sample]:
+    return _run_export("pdf", args, count, concurrency)
+
+
+def run_export_docx(args: argparse.Namespace, base: str, count: int, concurrency: int, tag: str) -> List[Sample]:
+    return _run_export("docx", args, count, concurrency)
+
+
+RUNNERS = {
+    "legal": run_legal,
+    "stream": run_stream,
+    "gradio": run_gradio,
+    "disconnect": run_disconnect,
+    "export_pdf": run_export_pdf,
+    "export_docx": run_export_docx,
+}
+
+
+def run_level(args: argparse.Namespace, scenario: str, base: str, concurrency: int,
+              server_pid: Optional[int]) -> Dict[str, Any]:
+    runner = RUNNERS[scenario]
+    # Exports run in this process, everything else in the app server
+    pid = os.getpid() if scenario.startswith("export_") else server_pid
+    if args.warmup:
+        runner(args, base, args.warmup, 1, "warmup-" + uuid.uuid4().hex[:8])
+    counters = cancellation_counters(base) if scenario == "disconnect" else None
+    before = rss_mb(pid)
+    started = time.perf_counter()
+    samples = runner(args, base, args.requests, concurrency, uuid.uuid4().hex[:8])
+    wall = time.perf_counter() - started
+    after = rss_mb(pid)
+
+    ok = [s for s in samples if s[2]]
+    ttfts = [s[1] for s in ok if s[1] is not None]
+    result: Dict[str, Any] = {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "ok": len(ok),
+        "errors": len(samples) - len(ok),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(ok) / wall, 3) if wall > 0 else 0.0,
+        "latency_ms": summarize([s[0] for s in ok]),
+        "ttft_ms": summarize(ttfts),
+        "rss_mb": {"start": before["rss"], "end": after["rss"], "peak": after["peak"]},
+    }
+    if counters is not None:
+        # Upstream calls should be closed and their slots freed shortly after the clients hang up
+        time.sleep(1.0)
+        end = cancellation_counters(base)
+        result["cancellation"] = {
+            "tokens_saved": end["tokens_saved"] - counters["tokens_saved"],
+            "streams_cancelled": end["streams_cancelled"] - counters["streams_cancelled"],
+            "active_slots_after": end["active_slots"],
+        }
+    return result
+
+
+# metric path -> True when a larger value is better
+COMPARED = {
+    ("throughput_rps",): True,
+    ("latency_ms", "p50"): False,
+    ("latency_ms", "p95"): False,
+    ("latency_ms", "p99"): False,
+    ("ttft_ms", "p50"): False,
+    ("ttft_ms", "p95"): False,
+    ("rss_mb", "peak"): False,
+}
+
+
+def _lookup(result: Dict[str, Any], path: Tuple[str, ...]) -> Optional[float]:
+    value: Any = result
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value if isinstance(value, (int, float)) else None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Relative change of every compared metric present in both runs; `regression` marks changes past threshold."""
+    base_index = {(r["scenario"], r["concurrency"]): r for r in baseline.get("results", [])}
+    rows = []
+    for result in current.get("results", []):
+        old = base_index.get((result["scenario"], result["concurrency"]))
+        if old is None:
+            continue
+        for path, higher_is_better in COMPARED.items():
+            before, after = _lookup(old, path), _lookup(result, path)
+            if before is None or after is None or before == 0:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            rows.append({
+                "scenario": result["scenario"],
+                "concurrency": result["concurrency"],
+                "metric": ".".join(path),
+                "baseline": before,
+                "current": after,
+                "change_pct": round(change * 100, 1),
+                "regression": worse > threshold,
+            })
+    return rows
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    header = f"{'scenario':<12} {'conc':>4} {'ok/err':>9} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} " \
+             f"{'ttft p50':>9} {'ttft p95':>9} {'rss MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        lat = r["latency_ms"] or {}
+        ttft = r["ttft_ms"] or {}
+
+        def fmt(v: Optional[float]) -> str:
+            return "-" if v is None else f"{v:.1f}"
+
+        print(f"{r['scenario']:<12} {r['concurrency']:>4} {str(r['ok']) + '/' + str(r['errors']):>9} "
+              f"{r['throughput_rps']:>8.2f} {fmt(lat.get('p50')):>9} {fmt(lat.get('p95')):>9} "
+              f"{fmt(lat.get('p99')):>9} {fmt(ttft.get('p50')):>9} {fmt(ttft.get('p95')):>9} "
+              f"{fmt(r['rss_mb']['peak']):>8}")
+        if "cancellation" in r:
+            c = r["cancellation"]
+            print(f"{'':<12} {'':>4} cancelled {c['streams_cancelled']:.0f}, tokens saved {c['tokens_saved']:.0f}, "
+                  f"busy slots after {c['active_slots_after']:.0f}")
+
+
+def print_comparison(rows: List[Dict[str, Any]]) -> None:
+    print(f"\n{'scenario':<12} {'conc':>4} {'metric':<16} {'baseline':>10} {'current':>10} {'change':>8}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['scenario']:<12} {row['concurrency']:>4} {row['metric']:<16} {row['baseline']:>10.2f} "
+              f"{row['current']:>10.2f} {row['change_pct']:>7.1f}%{flag}")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _parse_list(value: str) -> List[str]:
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma-separated, from: {', '.join(SCENARIOS + EXTRA_SCENARIOS)} "
+                             "('export' selects both exporters)")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="requests per scenario and level")
+    parser.add_argument("--warmup", type=int, default=2, help="unrecorded requests before each level")
+    parser.add_argument("--doc-type", default="rental agreement")
+    parser.add_argument("--num-predict", type=int, default=None)
+    parser.add_argument("--parallel-sections", action="store_true", help="request clause-parallel generation")
+    parser.add_argument("--skeleton", action="store_true", help="request placeholder-skeleton generation")
+    parser.add_argument("--no-think", action="store_true", help="send think=false (skip the reasoning phase)")
+    parser.add_argument("--repeat", action="store_true",
+                        help="send identical requests, exercising the response cache and single-flight")
+    parser.add_argument("--disconnect-after", type=float, default=0.2,
+                        help="seconds a disconnect-scenario client reads before hanging up")
+    parser.add_argument("--export-tokens", type=int, default=1500, help="words in the document exporters render")
+    parser.add_argument("--timeout", type=float, default=300.0, help="client timeout per request, seconds")
+    parser.add_argument("--app-url", default=None, help="benchmark a running app instead of starting one")
+    parser.add_argument("--ollama-url", default=None,
+                        help="generate endpoint for the started app (default: start the mock server)")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the started app, e.g. MODEL_CONCURRENCY=8")
+    parser.add_argument("--mock-ttft", type=float, default=0.2)
+    parser.add_argument("--mock-tokens-per-sec", type=float, default=40.0)
+    parser.add_argument("--mock-tokens", type=int, default=400)
+    parser.add_argument("--mock-jitter", type=float, default=0.1)
+    parser.add_argument("--mock-error-rate", type=float, default=0.0)
+    parser.add_argument("--mock-stall-rate", type=float, default=0.0,
+                        help="fraction of mock requests that hang before the first token")
+    parser.add_argument("--mock-stall-time", type=float, default=60.0)
+    parser.add_argument("--mock-think-tokens", type=int, default=0,
+                        help="reasoning tokens the mock writes before each document")
+    parser.add_argument("--mock-trailing", type=int, default=0,
+                        help="tokens the mock writes after the closing notice")
+    parser.add_argument("--output", default=None, help="results JSON (default: bench/results/<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 when a regression is found")
+    args = parser.parse_args(argv)
+
+    scenarios: List[str] = []
+    for name in _parse_list(args.scenarios):
+        expanded = ["export_pdf", "export_docx"] if name == "export" else [name]
+        for s in expanded:
+            if s not in RUNNERS:
+                parser.error(f"unknown scenario '{s}'")
+            scenarios.append(s)
+    args.scenarios = list(dict.fromkeys(scenarios))
+    args.concurrency = [int(c) for c in _parse_list(args.concurrency)]
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    sys.path.insert(0, ROOT)
+    needs_server = any(not s.startswith("export_") for s in args.scenarios)
+
+    with ExitStack() as stack:
+        base = args.app_url
+        server_pid: Optional[int] = None
+        ollama_url = args.ollama_url
+        if needs_server and base is None:
+            if ollama_url is None:
+                port = free_port()
+                stack.enter_context(server_process([
+                    sys.executable, "-m", "bench.mock_ollama", "--port", str(port),
+                    "--ttft", str(args.mock_ttft), "--tokens-per-sec", str(args.mock_tokens_per_sec),
+                    "--tokens", str(args.mock_tokens), "--jitter", str(args.mock_jitter),
+                    "--error-rate", str(args.mock_error_rate), "--stall-rate", str(args.mock_stall_rate),
+                    "--stall-time", str(args.mock_stall_time), "--trailing", str(args.mock_trailing),
+                    "--think-tokens", str(args.mock_think_tokens),
+                ], f"http://127.0.0.1:{port}/api/tags"))
+                ollama_url = f"http://127.0.0.1:{port}/api/generate"
+            port = free_port()
+            env = {"OLLAMA_URL": ollama_url, "OLLAMA_URLS": ollama_url}
+            env.update(kv.split("=", 1) for kv in args.env)
+            app_proc = stack.enter_context(server_process([
+                sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+                "--log-level", "warning",
+            ], f"http://127.0.0.1:{port}/health", env))
+            base = f"http://127.0.0.1:{port}"
+            server_pid = app_proc.pid
+
+        results = []
+        for scenario in args.scenarios:
+            for concurrency in args.concurrency:
+                print(f"running {scenario} at concurrency {concurrency} ...", file=sys.stderr)
+                results.append(run_level(args, scenario, base or "", concurrency, server_pid))
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "settings": {
+                k: v for k, v in vars(args).items()
+                if k not in ("output", "baseline", "fail_on_regression", "app_url")
+            },
+        },
+        "results": results,
+    }
+    print_results(results)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as fh:
+            rows = compare(report, json.load(fh), args.threshold)
+        report["comparison"] = {"baseline": args.baseline, "threshold": args.threshold, "rows": rows}
+        print_comparison(rows)
+        if args.fail_on_regression and any(r["regression"] for r in rows):
+            exit_code = 1
+
+    output = args.output or os.path.join(
+        ROOT, "bench", "results", datetime.now().strftime("%Y%m%d_%H%M%S") + ".json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nresults written to {output}", file=sys.stderr)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""Measure how long `import app` takes and how much memory a worker holds afterwards, with and without the UI.
+
+Each sample is a fresh interpreter, so module caches from earlier samples do not flatter the numbers:
+
+    python -m bench.startup_bench --runs 5 --output startup.json
+    python -m bench.startup_bench --runs 5 --baseline startup.json --fail-on-regression
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bench.run_bench import ROOT, git_commit, percentile
+
+HEAVY_MODULES = ("gradio", "docx", "reportlab")
+
+# Runs in the child interpreter; prints one JSON line
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+status = {}
+with open("/proc/self/status") as fh:
+    for line in fh:
+        if line.startswith(("VmRSS:", "VmHWM:")):
+            status[line.split(":")[0]] = int(line.split()[1]) / 1024.0
+print(json.dumps({
+    "import_s": elapsed,
+    "rss_mb": status.get("VmRSS"),
+    "peak_mb": status.get("VmHWM"),
+    "heavy_modules": [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def _probe(enable_ui: bool) -> Tuple[Dict[str, Any], str]:
+    env = {**os.environ, "ENABLE_UI": "true" if enable_ui else "false"}
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1]), out.stderr
+
+
+def slowest_imports(importtime_log: str, top: int) -> List[Dict[str, Any]]:
+    """Modules imported directly by a top-level import (e.g. by `app`), by cumulative time, from -X importtime."""
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        # one space before a top-level name, two more per nesting level
+        if len(name) - len(name.lstrip()) == 3:
+            rows.append({"module": name.strip(), "cumulative_ms": round(int(cumulative) / 1000.0, 1)})
+    rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+    return rows[:top]
+
+
+def measure(enable_ui: bool, runs: int, top: int) -> Dict[str, Any]:
+    samples = []
+    log = ""
+    for _ in range(runs):
+        sample, log = _probe(enable_ui)
+        samples.append(sample)
+
+    def stats(key: str, scale: float = 1.0) -> Optional[Dict[str, float]]:
+        values = [s[key] * scale for s in samples if s.get(key) is not None]
+        if not values:
+            return None
+        return {"p50": round(percentile(values, 50), 2), "max": round(max(values), 2)}
+
+    return {
+        "mode": "ui" if enable_ui else "api_only",
+        "runs": runs,
+        "import_ms": stats("import_s", 1000.0),
+        "rss_mb": stats("rss_mb"),
+        "peak_mb": stats("peak_mb"),
+        "heavy_modules": samples[-1]["heavy_modules"],
+        "slowest_imports": slowest_imports(log, top),
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    base_index = {r["mode"]: r for r in baseline.get("results", [])}
+    rows = []
+    for result in current["results"]:
+        old = base_index.get(result["mode"])
+        if old is None:
+            continue
+        for metric in ("import_ms", "rss_mb"):
+            before, after = (old.get(metric) or {}).get("p50"), (result.get(metric) or {}).get("p50")
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            rows.append({"mode": result["mode"], "metric": f"{metric}.p50", "baseline": before, "current": after,
+                         "change_pct": round(change * 100, 1), "regression": change > threshold})
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per mode")
+    parser.add_argument("--modes", default="api_only,ui", help="comma-separated: api_only, ui")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports made by app to list")
+    parser.add_argument("--output", default=None,
+                        help="results JSON (default: bench/results/startup_<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 when a regression is found")
+    args = parser.parse_args(argv)
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    for mode in modes:
+        if mode not in ("api_only", "ui"):
+            parser.error(f"unknown mode '{mode}'")
+
+    results = []
+    for mode in modes:
+        print(f"measuring {mode} ({args.runs} runs) ...", file=sys.stderr)
+        results.append(measure(mode == "ui", args.runs, args.top))
+    report: Dict[str, Any] = {
+        "meta": {"timestamp": datetime.now().isoformat(timespec="seconds"), "commit": git_commit(),
+                 "python": sys.version.split()[0]},
+        "results": results,
+    }
+
+    print(f"{'mode':<9} {'import p50 ms':>14} {'rss p50 MB':>11} {'peak MB':>8}  heavy modules")
+    for r in results:
+        print(f"{r['mode']:<9} {r['import_ms']['p50']:>14.1f} {(r['rss_mb'] or {}).get('p50', 0):>11.1f} "
+              f"{(r['peak_mb'] or {}).get('max', 0):>8.1f}  {', '.join(r['heavy_modules']) or '-'}")
+        for row in r["slowest_imports"][:5]:
+            print(f"    {row['module']:<40} {row['cumulative_ms']:>8.1f} ms")
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as fh:
+            rows = compare(report, json.load(fh), args.threshold)
+        report["comparison"] = {"baseline": args.baseline, "threshold": args.threshold, "rows": rows}
+        for row in rows:
+            flag = "  REGRESSION" if row["regression"] else ""
+            print(f"{row['mode']:<9} {row['metric']:<12} {row['baseline']:>9.1f} -> {row['current']:>9.1f} "
+                  f"({row['change_pct']:+.1f}%){flag}")
+        if args.fail_on_regression and any(r["regression"] for r in rows):
+            exit_code = 1
+
+    output = args.output or os.path.join(
+        ROOT, "bench", "results", "startup_" + datetime.now().strftime("%Y%m%d_%H%M%S") + ".json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nresults written to {output}", file=sys.stderr)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
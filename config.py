@@ -1,4 +1,6 @@
 import os
+from typing import Dict, List, Optional
+
 from dotenv import load_dotenv
 
 # Load environment variables from .env if present
@@ -9,7 +11,141 @@ OLLAMA_URL: str = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
 MODEL_NAME: str = os.getenv("MODEL_NAME", "deepseek-r1")
 REQUEST_TIMEOUT: float = float(os.getenv("REQUEST_TIMEOUT", "60"))  # seconds
 
+# Ollama backends (comma-separated); requests go to the healthy one with the fewest in-flight requests
+OLLAMA_URLS: List[str] = [u.strip() for u in (os.getenv("OLLAMA_URLS") or OLLAMA_URL).split(",") if u.strip()]
+BACKEND_FAILURE_THRESHOLD: int = int(os.getenv("BACKEND_FAILURE_THRESHOLD", "1"))  # consecutive failures
+BACKEND_HEALTH_INTERVAL: float = float(os.getenv("BACKEND_HEALTH_INTERVAL", "5"))  # seconds between probes
+
+# Connection pool of the shared async HTTP client (one per process)
+HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))  # seconds
+CONNECT_TIMEOUT: float = float(os.getenv("CONNECT_TIMEOUT", "5"))  # seconds
+READ_TIMEOUT: float = float(os.getenv("READ_TIMEOUT", str(REQUEST_TIMEOUT)))  # seconds
+WRITE_TIMEOUT: float = float(os.getenv("WRITE_TIMEOUT", "10"))  # seconds
+POOL_TIMEOUT: float = float(os.getenv("POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+
+# Deadlines per upstream call (0 disables). Connecting is bounded by CONNECT_TIMEOUT; the first token must arrive
+# within TTFT_TIMEOUT of sending (model load and prompt evaluation included) and each later one within IDLE_TIMEOUT
+TTFT_TIMEOUT: float = float(os.getenv("TTFT_TIMEOUT", "30"))  # seconds
+IDLE_TIMEOUT: float = float(os.getenv("IDLE_TIMEOUT", "10"))  # seconds between tokens
+# Retries on connection errors only (refused, connect timeout), after full-jitter exponential backoff
+RETRY_ATTEMPTS: int = int(os.getenv("RETRY_ATTEMPTS", "2"))  # extra attempts; 0 disables
+RETRY_BACKOFF_BASE: float = float(os.getenv("RETRY_BACKOFF_BASE", "0.1"))  # seconds, doubled per attempt
+RETRY_BACKOFF_MAX: float = float(os.getenv("RETRY_BACKOFF_MAX", "2"))  # seconds
+# Hedging: with no first token after the HEDGE_PERCENTILE of recent first-token times, send a duplicate call
+# (to another backend if there is one), keep whichever streams first and cancel the other
+HEDGE_REQUESTS: bool = os.getenv("HEDGE_REQUESTS", "false").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE: float = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES: int = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))  # first-token times needed per model
+HEDGE_DEFAULT_DELAY: float = float(os.getenv("HEDGE_DEFAULT_DELAY", "2"))  # seconds, until there are enough
+HEDGE_MIN_DELAY: float = float(os.getenv("HEDGE_MIN_DELAY", "0.2"))  # seconds; floor for the percentile
+
 # Model option defaults (Ollama options)
 DEFAULT_TEMPERATURE: float = float(os.getenv("TEMPERATURE", "0.3"))
 DEFAULT_TOP_P: float = float(os.getenv("TOP_P", "0.9"))
 DEFAULT_NUM_PREDICT: int = int(os.getenv("NUM_PREDICT", "512"))
+# Reasoning models (deepseek-r1): Ollama's "think" flag for every call ("" sends none, the model's default), and
+# whether inline <think> blocks are removed before text reaches clients, caches and exports
+THINK: Optional[bool] = {"true": True, "false": False}.get(os.getenv("THINK", "").lower())
+STRIP_THINKING: bool = os.getenv("STRIP_THINKING", "true").lower() in ("1", "true", "yes")
+
+# Token budgets: stop once the closing Important Notice is written, and size num_predict per doc_type from
+# recent completions when the caller sets none (NUM_PREDICT until there are enough of them)
+EARLY_STOP: bool = os.getenv("EARLY_STOP", "true").lower() in ("1", "true", "yes")
+TOKEN_BUDGET_ADAPTIVE: bool = os.getenv("TOKEN_BUDGET_ADAPTIVE", "true").lower() in ("1", "true", "yes")
+TOKEN_BUDGET_WINDOW: int = int(os.getenv("TOKEN_BUDGET_WINDOW", "100"))  # recent documents per doc_type and model
+TOKEN_BUDGET_MIN_SAMPLES: int = int(os.getenv("TOKEN_BUDGET_MIN_SAMPLES", "5"))
+TOKEN_BUDGET_PERCENTILE: float = float(os.getenv("TOKEN_BUDGET_PERCENTILE", "95"))  # of recent document lengths
+TOKEN_BUDGET_HEADROOM: float = float(os.getenv("TOKEN_BUDGET_HEADROOM", "1.2"))  # multiplier on that percentile
+TOKEN_BUDGET_MIN: int = int(os.getenv("TOKEN_BUDGET_MIN", "256"))
+TOKEN_BUDGET_MAX: int = int(os.getenv("TOKEN_BUDGET_MAX", "8192"))
+
+# In-process response cache for finished documents
+RESPONSE_CACHE_SIZE: int = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))  # entries; 0 disables
+RESPONSE_CACHE_TTL: float = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))  # seconds
+CACHE_REPLAY_CHUNK_SIZE: int = int(os.getenv("CACHE_REPLAY_CHUNK_SIZE", "512"))  # chars per replayed chunk
+
+# Skeleton mode: one generation per (doc_type, term/salary bucket, options) with party placeholders, names filled in
+SKELETON_MODE: bool = os.getenv("SKELETON_MODE", "false").lower() in ("1", "true", "yes")  # default per request
+SKELETON_MAX_TEMPERATURE: float = float(os.getenv("SKELETON_MAX_TEMPERATURE", "0.5"))  # hotter requests generate
+SKELETON_CACHE_SIZE: int = int(os.getenv("SKELETON_CACHE_SIZE", "128"))  # entries; 0 disables reuse
+SKELETON_CACHE_TTL: float = float(os.getenv("SKELETON_CACHE_TTL", "86400"))  # seconds
+
+# Stream flushing: coalesce token chunks into larger writes (0 disables a trigger)
+STREAM_FLUSH_BYTES: int = int(os.getenv("STREAM_FLUSH_BYTES", "256"))
+STREAM_FLUSH_INTERVAL: float = float(os.getenv("STREAM_FLUSH_INTERVAL", "0.05"))  # seconds
+UI_UPDATE_INTERVAL: float = float(os.getenv("UI_UPDATE_INTERVAL", "0.1"))  # seconds between Gradio UI refreshes
+UI_ABANDON_TIMEOUT: float = float(os.getenv("UI_ABANDON_TIMEOUT", "30"))  # seconds unread before a UI stream stops
+# formats the UI builds while streaming, so its downloads are ready when the stream ends ("" = on click only)
+UI_EXPORT_FORMATS: List[str] = [f.strip() for f in os.getenv("UI_EXPORT_FORMATS", "pdf,docx").split(",") if f.strip()]
+
+# Gradio UI at /ui; false runs API-only and never imports gradio, for faster, leaner workers
+ENABLE_UI: bool = os.getenv("ENABLE_UI", "true").lower() in ("1", "true", "yes")
+# Gradio queue: concurrent UI events (model concurrency is still capped by the scheduler)
+GRADIO_CONCURRENCY: int = int(os.getenv("GRADIO_CONCURRENCY", "16"))
+
+# /legal/batch
+BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", "4"))  # default concurrent generations per batch
+BATCH_MAX_CONCURRENCY: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))  # upper bound a caller may request
+BATCH_MAX_ITEMS: int = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+
+# Background jobs (POST /legal/jobs): state and output go to the document store so clients can reconnect and
+# resume through any worker; with the store disabled they stay in the process that accepted them
+JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "4"))  # concurrent background generations per process
+JOB_QUEUE_MAX: int = int(os.getenv("JOB_QUEUE_MAX", "256"))  # jobs waiting for a worker before 429
+JOB_TTL: float = float(os.getenv("JOB_TTL", "3600"))  # seconds a finished job stays readable
+JOB_MAX_JOBS: int = int(os.getenv("JOB_MAX_JOBS", "1000"))  # retained jobs, oldest finished evicted first
+JOB_POLL_INTERVAL: float = float(os.getenv("JOB_POLL_INTERVAL", "0.25"))  # seconds; reads of other workers' jobs
+
+# Admission control in front of the model
+MODEL_CONCURRENCY: int = int(os.getenv("MODEL_CONCURRENCY", "4"))  # concurrent generations per model
+# Per-model overrides, e.g. "deepseek-r1=8,llama3=2"
+MODEL_CONCURRENCY_LIMITS: Dict[str, int] = {
+    name.strip(): int(limit)
+    for name, limit in (
+        item.split("=", 1) for item in os.getenv("MODEL_CONCURRENCY_LIMITS", "").split(",") if "=" in item
+    )
+}
+QUEUE_MAX_SIZE: int = int(os.getenv("QUEUE_MAX_SIZE", "64"))  # waiting requests per model before 429
+QUEUE_TIMEOUT: float = float(os.getenv("QUEUE_TIMEOUT", "30"))  # seconds a request may wait before 503
+
+# Model warm-up: load models at startup and keep them resident so requests do not pay the load time
+WARMUP_MODELS: List[str] = [
+    m.strip() for m in (os.getenv("WARMUP_MODELS") or ",".join([MODEL_NAME, *MODEL_CONCURRENCY_LIMITS])).split(",")
+    if m.strip()
+]  # loaded on every backend; defaults to MODEL_NAME plus the models in MODEL_CONCURRENCY_LIMITS
+WARMUP_ON_STARTUP: bool = os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+# Ollama keep_alive sent with every call, e.g. "30m" or "-1" (forever); empty leaves the server default (5m)
+KEEP_ALIVE: str = os.getenv("KEEP_ALIVE", "")
+KEEP_ALIVE_INTERVAL: float = float(os.getenv("KEEP_ALIVE_INTERVAL", "120"))  # seconds between checks; 0 disables
+COLD_START_THRESHOLD: float = float(os.getenv("COLD_START_THRESHOLD", "0.5"))  # load seconds counted as a cold start
+
+# Clause-parallel generation (LegalRequest.parallel_sections)
+CLAUSE_CONCURRENCY: int = int(os.getenv("CLAUSE_CONCURRENCY", "4"))  # concurrent section sub-prompts per document
+CLAUSE_MIN_NUM_PREDICT: int = int(os.getenv("CLAUSE_MIN_NUM_PREDICT", "128"))  # token floor per section
+
+# Prompt context reuse: evaluate each doc_type's fixed prompt prefix once and send only the party details after it
+PROMPT_CONTEXT_REUSE: bool = os.getenv("PROMPT_CONTEXT_REUSE", "false").lower() in ("1", "true", "yes")
+CONTEXT_CACHE_SIZE: int = int(os.getenv("CONTEXT_CACHE_SIZE", "32"))  # (model, prefix) entries
+CONTEXT_CACHE_TTL: float = float(os.getenv("CONTEXT_CACHE_TTL", "1800"))  # seconds
+CONTEXT_RETRY_AFTER: float = float(os.getenv("CONTEXT_RETRY_AFTER", "300"))  # seconds without priming after a failure
+
+# Document export
+EXPORT_WORKERS: int = int(os.getenv("EXPORT_WORKERS", "4"))  # threads rendering DOCX/PDF off the event loop
+EXPORT_TMP_TTL: float = float(os.getenv("EXPORT_TMP_TTL", "3600"))  # seconds before UI export files are removed
+BULK_EXPORT_WORKERS: int = int(os.getenv("BULK_EXPORT_WORKERS", "0"))  # processes for bulk ZIP exports; 0 = all cores
+BULK_EXPORT_MAX_DOCS: int = int(os.getenv("BULK_EXPORT_MAX_DOCS", "1000"))
+
+# Document store: generated documents and rendered exports by id, in SQLite (WAL) shared by all workers
+DOCUMENT_STORE_PATH: str = os.getenv("DOCUMENT_STORE_PATH", "data/documents.db")  # empty disables the store
+DOCUMENT_STORE_MAX_DOCS: int = int(os.getenv("DOCUMENT_STORE_MAX_DOCS", "10000"))  # 0 = unbounded
+DOCUMENT_STORE_TTL: float = float(os.getenv("DOCUMENT_STORE_TTL", "2592000"))  # seconds since last stored; 0 = forever
+DOCUMENT_STORE_PRUNE_INTERVAL: float = float(os.getenv("DOCUMENT_STORE_PRUNE_INTERVAL", "300"))  # seconds
+DOCUMENT_STORE_BUSY_TIMEOUT: float = float(os.getenv("DOCUMENT_STORE_BUSY_TIMEOUT", "5"))  # seconds a writer waits
+
+# Request tracing and profiling
+SERVER_TIMING: bool = os.getenv("SERVER_TIMING", "true").lower() in ("1", "true", "yes")  # Server-Timing headers
+ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")  # X-Admin-Token for /admin endpoints; empty disables them
+PROFILE_DIR: str = os.getenv("PROFILE_DIR", "data/profiles")  # where sampled profiles are written
+PROFILE_INTERVAL: float = float(os.getenv("PROFILE_INTERVAL", "0.005"))  # seconds between stack samples
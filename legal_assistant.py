@@ -1,14 +1,26 @@
-import asyncio
+from typing import Any, AsyncGenerator, Dict, Optional, Tuple
+
+import logging
+import sqlite3
+
 import gradio as gr
 
 from services.legal_generator import (
+    document_title,
     generate_legal_document,
     normalize_doc_type,
-    stream_legal_document_sync,
+    stream_legal_document,
 )
-from services.export_utils import export_docx, export_pdf
+from services.document_store import store_document
+from services.export_utils import EXPORT_FORMATS, incremental_export, render_stored, write_export_file
+from services.scheduler import AdmissionError, PRIORITY_INTERACTIVE
+from services.metrics import STREAMS_CANCELLED
+from services.streaming import close_when_abandoned, coalesce
+from config import UI_ABANDON_TIMEOUT, UI_EXPORT_FORMATS, UI_UPDATE_INTERVAL, GRADIO_CONCURRENCY
 
 
+logger = logging.getLogger("legal-assistant.ui")
+
 DOC_OPTIONS = [
     "Rental Agreement",
     "Employment Contract",
@@ -33,44 +45,73 @@ def _normalize_label_to_key(label: str) -> str:
     return (label or "").strip().lower()
 
 
-def sync_generate(doc_type_label: str, party1: str, party2: str, duration: str, salary: str,
-                  temperature: float, top_p: float, num_predict: int, stream: bool) -> str:
+async def generate_document(doc_type_label: str, party1: str, party2: str, duration: str, salary: str,
+                            temperature: float, top_p: float, num_predict: int,
+                            stream: bool) -> AsyncGenerator[Tuple[str, Optional[Dict[str, Any]]], None]:
+    """Gradio handler. Runs on the serving event loop, so it shares the API's HTTP clients, caches and scheduler.
+
+    Yields (text, document); the document is kept in session state for the download buttons, so an export never
+    sends the text back from the browser. A streamed document has its UI_EXPORT_FORMATS built as it arrives.
+    """
+    doc_type = _normalize_label_to_key(doc_type_label)
+    kwargs = dict(
+        doc_type=doc_type,
+        party1=party1,
+        party2=party2,
+        duration=duration,
+        salary=salary,
+        temperature=temperature,
+        top_p=top_p,
+        num_predict=int(num_predict) or None,  # 0: size the budget from recent documents of this type
+        priority=PRIORITY_INTERACTIVE,
+    )
+    title = document_title(doc_type)
+    exports = None
     try:
-        doc_type_key = _normalize_label_to_key(doc_type_label)
         if stream:
-            # yield progressively for Gradio streaming support
-            accumulated = ""
-            for chunk in stream_legal_document_sync(
-                doc_type=doc_type_key,
-                party1=party1,
-                party2=party2,
-                duration=duration,
-                salary=salary,
-                temperature=temperature,
-                top_p=top_p,
-                num_predict=num_predict,
-            ):
-                accumulated += chunk
-                yield accumulated
-            return
-        else:
-            # Run the async generator within Gradio's sync fn
-            return asyncio.run(
-                generate_legal_document(
-                    doc_type=doc_type_key,
-                    party1=party1,
-                    party2=party2,
-                    duration=duration,
-                    salary=salary,
-                    temperature=temperature,
-                    top_p=top_p,
-                    num_predict=num_predict,
-                )
+            # yield progressively for Gradio streaming support, refreshing at most every UI_UPDATE_INTERVAL
+            parts = []
+            # Gradio stops pulling, without closing us, when the tab closes; stop the model once nobody reads
+            chunks = close_when_abandoned(
+                coalesce(stream_legal_document(**kwargs), max_interval=UI_UPDATE_INTERVAL),
+                UI_ABANDON_TIMEOUT,
+                on_abandon=STREAMS_CANCELLED.labels(source="ui").inc,
             )
+            exports = incremental_export(UI_EXPORT_FORMATS, title)
+            async for batch in chunks:
+                parts.append(batch)
+                if exports is not None:
+                    exports.feed(batch)
+                yield "".join(parts), None
+            text = "".join(parts)
+        else:
+            text = await generate_legal_document(**kwargs)
+        doc_id = await store_document(text, normalize_doc_type(doc_type) or doc_type, title)
+        if exports is not None:
+            await exports.save(doc_id)
+        yield text, {"id": doc_id, "text": text, "title": title}
     except ValueError as e:
-        return f"Input error: {e}"
+        yield f"Input error: {e}", None
+    except AdmissionError as e:
+        yield f"The model is busy, please try again in {int(e.retry_after)}s.", None
     except Exception as e:
-        return f"Generation error: {e}"
+        yield f"Generation error: {e}", None
+    finally:
+        if exports is not None:
+            exports.close()
+
+
+def _export_file(fmt: str, document: Dict[str, Any]) -> str:
+    """Export the shown document by id, so a file built while streaming (or a repeat download) is a lookup."""
+    data = None
+    if document["id"] is not None:
+        try:
+            data = render_stored(document["id"], fmt)
+        except sqlite3.Error:
+            logger.exception("Document store unavailable; rendering export directly")
+    if data is None:
+        data = EXPORT_FORMATS[fmt][0](document["text"], document["title"])
+    return write_export_file(fmt, data)
 
 
 def build_interface() -> gr.Blocks:
@@ -106,7 +147,7 @@ def build_interface() -> gr.Blocks:
                 temperature = gr.Slider(0.0, 1.5, value=0.3, step=0.05, label="Temperature")
                 top_p = gr.Slider(0.1, 1.0, value=0.9, step=0.05, label="Top-p")
             with gr.Accordion("Length", open=False):
-                num_predict = gr.Slider(64, 4096, value=512, step=64, label="Max tokens")
+                num_predict = gr.Slider(0, 4096, value=0, step=64, label="Max tokens (0 = auto)")
 
         with gr.Row():
             party1 = gr.Textbox(label="Party 1 Name")
@@ -121,6 +162,7 @@ def build_interface() -> gr.Blocks:
 
         generate_btn = gr.Button("Generate Document")
         output = gr.Textbox(label="Generated Legal Document")
+        document = gr.State(None)  # the shown document ({"id", "text", "title"}), kept server-side
         with gr.Row():
             download_docx = gr.Button("Download DOCX")
             download_pdf = gr.Button("Download PDF")
@@ -128,36 +170,50 @@ def build_interface() -> gr.Blocks:
         file_pdf = gr.File(label="PDF File", visible=False)
 
         generate_btn.click(
-            fn=sync_generate,
+            fn=generate_document,
             inputs=[doc_type, party1, party2, duration, salary, temperature, top_p, num_predict, stream_chk],
-            outputs=[output],
+            outputs=[output, document],
             api_name="generate",
         )
 
-        def _do_export_docx(text: str):
-            if not text:
-                return gr.update(visible=False), None
-            path = export_docx(text)
-            return gr.update(visible=True, value=path), path
+        def _do_export_docx(shown: Optional[Dict[str, Any]]):
+            if not shown:
+                return gr.update(visible=False, value=None)
+            return gr.update(visible=True, value=_export_file("docx", shown))
 
-        def _do_export_pdf(text: str):
-            if not text:
-                return gr.update(visible=False), None
-            path = export_pdf(text)
-            return gr.update(visible=True, value=path), path
+        def _do_export_pdf(shown: Optional[Dict[str, Any]]):
+            if not shown:
+                return gr.update(visible=False, value=None)
+            return gr.update(visible=True, value=_export_file("pdf", shown))
 
-        download_docx.click(_do_export_docx, inputs=[output], outputs=[file_docx])
-        download_pdf.click(_do_export_pdf, inputs=[output], outputs=[file_pdf])
+        download_docx.click(_do_export_docx, inputs=[document], outputs=[file_docx])
+        download_pdf.click(_do_export_pdf, inputs=[document], outputs=[file_pdf])
 
+    demo.queue(default_concurrency_limit=GRADIO_CONCURRENCY)
     return demo
 
 
-# Create Gradio interface (used standalone and can be mounted by FastAPI)
-interface = build_interface()
+_interface: Optional[gr.Blocks] = None
+
+
+def get_interface() -> gr.Blocks:
+    """Build the Gradio interface on first use (used standalone and mounted by FastAPI)."""
+    global _interface
+    if _interface is None:
+        _interface = build_interface()
+    return _interface
+
+
+def __getattr__(name: str):
+    # `legal_assistant.interface` stays importable, but importing this module no longer builds the UI
+    if name == "interface":
+        return get_interface()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # Launch standalone only when executed directly
 if __name__ == "__main__":
-    interface.launch()
+    get_interface().launch()
 
 
 
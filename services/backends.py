@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import httpx
+
+logger = logging.getLogger("legal-assistant.backends")
+
+GENERATE_PATH = "/api/generate"
+
+
+class NoBackendError(Exception):
+    pass
+
+
+class Backend:
+    """One Ollama host, with its routing state and counters."""
+
+    def __init__(self, url: str) -> None:
+        url = url.strip().rstrip("/")
+        if url.endswith(GENERATE_PATH):
+            self.base_url = url[: -len(GENERATE_PATH)]
+        else:
+            self.base_url = url
+        self.generate_url = self.base_url + GENERATE_PATH
+        self.in_flight = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.last_failure_at: Optional[float] = None
+        self.last_probe_at: Optional[float] = None
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.base_url,
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "last_failure_at": self.last_failure_at,
+            "last_probe_at": self.last_probe_at,
+        }
+
+
+class BackendPool:
+    """Routes each request to the healthy backend with the fewest in-flight requests.
+
+    A backend is taken out of rotation after `failure_threshold` consecutive failures and returns once a
+    health probe succeeds. If every backend is down, requests are still routed rather than refused.
+    """
+
+    def __init__(self, urls: Iterable[str], failure_threshold: int = 1) -> None:
+        self.backends: List[Backend] = [Backend(u) for u in urls if u.strip()]
+        if not self.backends:
+            raise ValueError("At least one Ollama backend URL is required")
+        self.failure_threshold = max(1, failure_threshold)
+        self._lock = threading.Lock()
+        self._turn = 0
+
+    def pick(self, exclude: Iterable[Backend] = ()) -> Backend:
+        excluded = set(map(id, exclude))
+        with self._lock:
+            candidates = [b for b in self.backends if id(b) not in excluded]
+            if not candidates:
+                raise NoBackendError("No Ollama backend available")
+            healthy = [b for b in candidates if b.healthy] or candidates
+            # Rotate the starting point so ties spread across backends
+            self._turn = (self._turn + 1) % len(healthy)
+            ordered = healthy[self._turn:] + healthy[:self._turn]
+            return min(ordered, key=lambda b: b.in_flight)
+
+    @contextmanager
+    def lease(self, exclude: Iterable[Backend] = (), backend: Optional[Backend] = None) -> Iterator[Backend]:
+        """Pick a backend (or take `backend`) and count the request against it for the duration of the block."""
+        backend = backend or self.pick(exclude)
+        with self._lock:
+            backend.in_flight += 1
+            backend.requests += 1
+        try:
+            yield backend
+        finally:
+            with self._lock:
+                backend.in_flight -= 1
+
+    def mark_success(self, backend: Backend) -> None:
+        with self._lock:
+            backend.consecutive_failures = 0
+
+    def mark_failure(self, backend: Backend, error: Any) -> None:
+        with self._lock:
+            backend.errors += 1
+            backend.consecutive_failures += 1
+            backend.last_error = str(error)
+            backend.last_failure_at = time.time()
+            if backend.healthy and backend.consecutive_failures >= self.failure_threshold:
+                backend.healthy = False
+                logger.warning("Ollama backend %s taken out of rotation: %s", backend.base_url, error)
+
+    async def probe(self, client: httpx.AsyncClient, backend: Backend, timeout: float = 5.0) -> bool:
+        try:
+            resp = await client.get(backend.url("/api/tags"), timeout=timeout)
+            ok = resp.status_code == 200
+            error: Any = f"health probe returned {resp.status_code}"
+        except httpx.RequestError as e:
+            ok, error = False, e
+        backend.last_probe_at = time.time()
+        if ok:
+            with self._lock:
+                if not backend.healthy:
+                    logger.info("Ollama backend %s back in rotation", backend.base_url)
+                backend.healthy = True
+                backend.consecutive_failures = 0
+        elif backend.healthy:
+            self.mark_failure(backend, error)
+        return ok
+
+    async def probe_all(self, client: httpx.AsyncClient) -> None:
+        await asyncio.gather(*(self.probe(client, b) for b in self.backends))
+
+    def healthy_count(self) -> int:
+        return sum(1 for b in self.backends if b.healthy)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [b.stats() for b in self.backends]
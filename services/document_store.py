@@ -0,0 +1,336 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from config import (
+    DOCUMENT_STORE_PATH,
+    DOCUMENT_STORE_MAX_DOCS,
+    DOCUMENT_STORE_TTL,
+    DOCUMENT_STORE_BUSY_TIMEOUT,
+)
+
+logger = logging.getLogger("legal-assistant.store")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,
+    doc_type TEXT NOT NULL,
+    title TEXT NOT NULL,
+    text TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_updated_at ON documents (updated_at);
+CREATE TABLE IF NOT EXISTS exports (
+    document_id TEXT NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    format TEXT NOT NULL,
+    data BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (document_id, format)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    doc_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    document_id TEXT,
+    exports TEXT NOT NULL DEFAULT '',
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS job_output (
+    job_id TEXT NOT NULL REFERENCES jobs (id) ON DELETE CASCADE,
+    start INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (job_id, start)
+);
+"""
+
+# Job columns update_job() may set
+_JOB_FIELDS = ("status", "error", "document_id", "exports", "started_at", "finished_at")
+
+
+class StoredDocument(NamedTuple):
+    id: str
+    doc_type: str
+    title: str
+    text: str
+    created_at: float
+    updated_at: float
+
+
+class StoredJob(NamedTuple):
+    id: str
+    doc_type: str
+    status: str
+    error: Optional[str]
+    document_id: Optional[str]
+    exports: List[str]
+    cancel_requested: bool
+    created_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+    size: int  # bytes of output so far
+
+
+def document_id(text: str) -> str:
+    """Documents are addressed by content hash, so identical text is stored once."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+class DocumentStore:
+    """Generated documents, their rendered exports and background job state in one SQLite database (WAL mode).
+
+    WAL lets readers proceed while another process writes, so every uvicorn worker can open the same file;
+    writers wait up to `busy_timeout` seconds for each other. Each thread gets its own connection. Retention
+    keeps at most `max_docs` documents and drops those not regenerated within `ttl` seconds (0 disables a bound);
+    jobs have their own bounds (see prune_jobs).
+    """
+
+    def __init__(self, path: str, max_docs: int = 0, ttl: float = 0, busy_timeout: float = 5.0) -> None:
+        self.path = path
+        self.max_docs = max_docs
+        self.ttl = ttl
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self.dedupe_hits = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # Autocommit: every statement is its own short transaction, so writers hold the lock only briefly
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        with self._lock:
+            if not self._schema_ready:
+                conn.executescript(_SCHEMA)
+                self._schema_ready = True
+            self._connections.append(conn)
+        self._local.conn = conn
+        return conn
+
+    def put(self, text: str, doc_type: str = "", title: str = "AI Legal Document") -> Optional[str]:
+        """Store a document and return its id; storing the same text again only refreshes its retention."""
+        if not self.enabled:
+            return None
+        doc_id = document_id(text)
+        now = time.time()
+        conn = self._conn()
+        inserted = conn.execute(
+            "INSERT OR IGNORE INTO documents (id, doc_type, title, text, size, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (doc_id, doc_type, title, text, len(text.encode("utf-8")), now, now),
+        ).rowcount
+        if not inserted:
+            self.dedupe_hits += 1
+            conn.execute("UPDATE documents SET updated_at = ? WHERE id = ?", (now, doc_id))
+        return doc_id
+
+    def get(self, doc_id: str) -> Optional[StoredDocument]:
+        if not self.enabled:
+            return None
+        row = self._conn().execute(
+            "SELECT id, doc_type, title, text, created_at, updated_at FROM documents WHERE id = ?", (doc_id,)
+        ).fetchone()
+        return StoredDocument(*row) if row else None
+
+    def get_export(self, doc_id: str, fmt: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        row = self._conn().execute(
+            "SELECT data FROM exports WHERE document_id = ? AND format = ?", (doc_id, fmt)
+        ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def put_export(self, doc_id: str, fmt: str, data: bytes) -> None:
+        if not self.enabled:
+            return
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO exports (document_id, format, data, created_at) VALUES (?, ?, ?, ?)",
+                (doc_id, fmt, sqlite3.Binary(data), time.time()),
+            )
+        except sqlite3.IntegrityError:
+            pass  # the document was pruned meanwhile
+
+    def put_job(self, job_id: str, doc_type: str, status: str, created_at: float) -> None:
+        if not self.enabled:
+            return
+        self._conn().execute(
+            "INSERT INTO jobs (id, doc_type, status, created_at) VALUES (?, ?, ?, ?)",
+            (job_id, doc_type, status, created_at),
+        )
+
+    def update_job(self, job_id: str, **fields: Any) -> None:
+        """Set some of a job's columns (see _JOB_FIELDS); `exports` is a list of formats."""
+        if not self.enabled or not fields:
+            return
+        unknown = set(fields) - set(_JOB_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+        if "exports" in fields:
+            fields["exports"] = ",".join(fields["exports"])
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self._conn().execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def append_job_output(self, job_id: str, start: int, data: bytes) -> None:
+        """Store the output bytes of a job that begin at byte offset `start`."""
+        if not self.enabled:
+            return
+        self._conn().execute(
+            "INSERT OR REPLACE INTO job_output (job_id, start, data) VALUES (?, ?, ?)",
+            (job_id, start, sqlite3.Binary(data)),
+        )
+
+    def get_job(self, job_id: str) -> Optional[StoredJob]:
+        if not self.enabled:
+            return None
+        row = self._conn().execute(
+            "SELECT id, doc_type, status, error, document_id, exports, cancel_requested, created_at, started_at, "
+            "finished_at, (SELECT COALESCE(SUM(length(data)), 0) FROM job_output WHERE job_id = jobs.id) "
+            "FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if not row:
+            return None
+        exports = [fmt for fmt in row[5].split(",") if fmt]
+        return StoredJob(*row[:5], exports, bool(row[6]), *row[7:])
+
+    def job_output(self, job_id: str, offset: int = 0) -> bytes:
+        """A job's output from byte `offset` on."""
+        if not self.enabled:
+            return b""
+        rows = self._conn().execute(
+            "SELECT start, data FROM job_output WHERE job_id = ? AND start + length(data) > ? ORDER BY start",
+            (job_id, offset),
+        ).fetchall()
+        if not rows:
+            return b""
+        return b"".join(bytes(data) for _, data in rows)[max(0, offset - rows[0][0]):]
+
+    def request_job_cancel(self, job_id: str) -> bool:
+        """Flag an unfinished job for its owning worker to cancel; False if it already finished."""
+        if not self.enabled:
+            return False
+        return self._conn().execute(
+            "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND finished_at IS NULL", (job_id,)
+        ).rowcount > 0
+
+    def cancel_requested_jobs(self, job_ids: List[str]) -> List[str]:
+        """Those of `job_ids` that a worker asked to cancel and that have not finished."""
+        if not self.enabled or not job_ids:
+            return []
+        marks = ", ".join("?" for _ in job_ids)
+        rows = self._conn().execute(
+            f"SELECT id FROM jobs WHERE cancel_requested = 1 AND finished_at IS NULL AND id IN ({marks})",
+            job_ids,
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def prune_jobs(self, finished_before: float, max_finished: int = 0) -> int:
+        """Drop jobs that finished before `finished_before`, then all but the newest `max_finished` finished ones."""
+        if not self.enabled:
+            return 0
+        conn = self._conn()
+        removed = conn.execute(
+            "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (finished_before,)
+        ).rowcount
+        if max_finished > 0:
+            removed += conn.execute(
+                "DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE finished_at IS NOT NULL "
+                "ORDER BY finished_at DESC LIMIT -1 OFFSET ?)",
+                (max_finished,),
+            ).rowcount
+        return removed
+
+    def prune(self) -> int:
+        """Apply the retention bounds; returns how many documents were removed."""
+        if not self.enabled:
+            return 0
+        conn = self._conn()
+        removed = 0
+        if self.ttl > 0:
+            removed += conn.execute("DELETE FROM documents WHERE updated_at < ?", (time.time() - self.ttl,)).rowcount
+        if self.max_docs > 0:
+            removed += conn.execute(
+                "DELETE FROM documents WHERE id IN "
+                "(SELECT id FROM documents ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_docs,),
+            ).rowcount
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        if not self.enabled:
+            return {"enabled": False}
+        conn = self._conn()
+        return {
+            "enabled": True,
+            "documents": conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0],
+            "exports": conn.execute("SELECT COUNT(*) FROM exports").fetchone()[0],
+            "jobs": conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0],
+            "dedupe_hits": self.dedupe_hits,
+            "max_docs": self.max_docs,
+            "ttl": self.ttl,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections = []
+        self._local = threading.local()
+
+
+document_store = DocumentStore(
+    DOCUMENT_STORE_PATH,
+    max_docs=DOCUMENT_STORE_MAX_DOCS,
+    ttl=DOCUMENT_STORE_TTL,
+    busy_timeout=DOCUMENT_STORE_BUSY_TIMEOUT,
+)
+
+
+async def store_document(text: str, doc_type: str, title: str) -> Optional[str]:
+    """put() off the event loop; a store failure is logged and never fails the generation that produced the text."""
+    if not document_store.enabled:
+        return None
+    try:
+        return await asyncio.to_thread(document_store.put, text, doc_type, title)
+    except sqlite3.Error:
+        logger.exception("Could not store generated document")
+        return None
+
+
+async def run_retention(interval: float) -> None:
+    """Prune the store forever; each worker may run this, deletes are idempotent."""
+    while True:
+        try:
+            removed = await asyncio.to_thread(document_store.prune)
+            if removed:
+                logger.info("Pruned %d stored documents", removed)
+        except Exception:
+            logger.exception("Document store retention failed")
+        await asyncio.sleep(interval)
@@ -1,65 +1,449 @@
+import asyncio
+import atexit
+import io
+import logging
+import multiprocessing
 import os
+import re
+import shutil
 import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
-from typing import Tuple
+from typing import Any, AsyncGenerator, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
-from docx import Document
-from reportlab.lib.pagesizes import LETTER
-from reportlab.pdfgen import canvas
+from config import EXPORT_WORKERS, EXPORT_TMP_TTL, BULK_EXPORT_WORKERS
+from .document_store import document_store
+from .metrics import EXPORT_FINISH_LATENCY, EXPORT_LATENCY
+from .tracing import record, span
 
+logger = logging.getLogger("legal-assistant.export")
 
-def _timestamped(prefix: str, ext: str) -> str:
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+PDF_MEDIA_TYPE = "application/pdf"
+
+
+essentials = [
+    ("Important Notice:", "This document is AI-generated and must be reviewed by a qualified attorney."),
+]
+
+
+def export_filename(ext: str, prefix: str = "document") -> str:
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    tmpdir = tempfile.mkdtemp(prefix="legal_assistant_")
-    return os.path.join(tmpdir, f"{prefix}_{ts}.{ext}")
+    return f"{prefix}_{ts}.{ext}"
 
 
-def export_docx(text: str, title: str = "AI Legal Document") -> str:
-    """Create a DOCX file from text and return the file path."""
-    path = _timestamped("document", "docx")
-    doc = Document()
-    if title:
-        doc.add_heading(title, level=1)
-    for para in text.split("\n\n"):
-        doc.add_paragraph(para)
-    doc.save(path)
+class DocxBuilder:
+    """DOCX document built from text as it arrives; every completed paragraph is added at once."""
+
+    def __init__(self, title: str = "AI Legal Document") -> None:
+        from docx import Document  # imported on first export to keep worker startup light
+
+        self._doc = Document()
+        self._pending = ""
+        if title:
+            self._doc.add_heading(title, level=1)
+
+    def feed(self, text: str) -> None:
+        *paragraphs, self._pending = (self._pending + text).split("\n\n")
+        for para in paragraphs:
+            self._doc.add_paragraph(para)
+
+    def finish(self) -> bytes:
+        self._doc.add_paragraph(self._pending)
+        buf = io.BytesIO()
+        self._doc.save(buf)
+        return buf.getvalue()
+
+
+class PdfBuilder:
+    """Simple PDF built from text as it arrives; every completed line is drawn at once. Long lines wrap."""
+
+    def __init__(self, title: str = "AI Legal Document") -> None:
+        from reportlab.lib.pagesizes import LETTER
+        from reportlab.pdfgen import canvas
+
+        self._buf = io.BytesIO()
+        self._canvas = canvas.Canvas(self._buf, pagesize=LETTER)
+        self._width, self._height = LETTER
+        self._margin = 72
+        self._y = self._height - self._margin
+        self._pending = ""
+        self._draw(title, "Helvetica-Bold", 16, 24)
+
+    def _draw(self, line: str, font: str, size: int, leading: int) -> None:
+        from reportlab.lib.utils import simpleSplit
+
+        for wrapped in simpleSplit(line, font, size, self._width - 2 * self._margin) or [""]:
+            if self._y < self._margin:
+                self._canvas.showPage()
+                self._y = self._height - self._margin
+            self._canvas.setFont(font, size)
+            self._canvas.drawString(self._margin, self._y, wrapped)
+            self._y -= leading
+
+    def feed(self, text: str) -> None:
+        lines = (self._pending + text).splitlines(keepends=True)
+        # The last line may be incomplete, and a trailing "\r" may be the first half of "\r\n"
+        last = lines[-1] if lines else ""
+        self._pending = lines.pop() if last and (last.endswith("\r") or last.splitlines()[0] == last) else ""
+        for line in lines:
+            self._draw(line.splitlines()[0], "Helvetica", 11, 14)
+
+    def finish(self) -> bytes:
+        for line in self._pending.splitlines():
+            self._draw(line, "Helvetica", 11, 14)
+        # Footer notice
+        if self._y < 100:
+            self._canvas.showPage()
+            self._y = self._height - self._margin
+        self._draw(essentials[0][0], "Helvetica-Bold", 11, 14)
+        self._draw(essentials[0][1], "Helvetica", 11, 14)
+        self._canvas.save()
+        return self._buf.getvalue()
+
+
+def render_docx(text: str, title: str = "AI Legal Document") -> bytes:
+    """Render text as a DOCX document in memory and return its bytes."""
+    builder = DocxBuilder(title)
+    builder.feed(text)
+    return builder.finish()
+
+
+def render_pdf(text: str, title: str = "AI Legal Document") -> bytes:
+    """Render text as a simple PDF in memory and return its bytes. Long lines wrap to the page width."""
+    builder = PdfBuilder(title)
+    builder.feed(text)
+    return builder.finish()
+
+
+# format -> (renderer, media type, file extension)
+EXPORT_FORMATS: Dict[str, Tuple[Callable[[str, str], bytes], str, str]] = {
+    "docx": (render_docx, DOCX_MEDIA_TYPE, "docx"),
+    "pdf": (render_pdf, PDF_MEDIA_TYPE, "pdf"),
+}
+
+# format -> incremental builder class (feed(text), then finish() -> bytes)
+EXPORT_BUILDERS: Dict[str, Callable[[str], Any]] = {
+    "docx": DocxBuilder,
+    "pdf": PdfBuilder,
+}
+
+_export_pool: Optional[ThreadPoolExecutor] = None
+_export_pool_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _export_pool
+    with _export_pool_lock:
+        if _export_pool is None:
+            _export_pool = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export")
+        return _export_pool
+
+
+async def render_async(fmt: str, text: str, title: str = "AI Legal Document") -> bytes:
+    """Render in the export worker pool so the event loop keeps serving requests."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}'. Choose from: {', '.join(EXPORT_FORMATS)}.")
+    data, elapsed = await asyncio.get_running_loop().run_in_executor(_pool(), _timed_render, fmt, text, title)
+    EXPORT_LATENCY.labels(format=fmt).observe(elapsed)
+    record(f"render_{fmt}", elapsed)
+    return data
+
+
+def _timed_render(fmt: str, text: str, title: str) -> Tuple[bytes, float]:
+    """Render and measure inside the worker, so pool queueing is not counted as render time."""
+    started = time.perf_counter()
+    data = EXPORT_FORMATS[fmt][0](text, title)
+    return data, time.perf_counter() - started
+
+
+def render_stored(doc_id: str, fmt: str) -> Optional[bytes]:
+    """Rendered file for a stored document, or None if there is no such document.
+
+    The first request renders and keeps the bytes in the store; repeat downloads (from any worker) are a lookup.
+    """
+    doc = document_store.get(doc_id)
+    if doc is None:
+        return None
+    data = document_store.get_export(doc_id, fmt)
+    if data is None:
+        data, elapsed = _timed_render(fmt, doc.text, doc.title)
+        EXPORT_LATENCY.labels(format=fmt).observe(elapsed)
+        document_store.put_export(doc_id, fmt, data)
+    return data
+
+
+async def render_stored_async(doc_id: str, fmt: str) -> Optional[bytes]:
+    """render_stored in the export worker pool, so neither SQLite nor rendering blocks the event loop."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}'. Choose from: {', '.join(EXPORT_FORMATS)}.")
+    with span(f"export_{fmt}"):
+        return await asyncio.get_running_loop().run_in_executor(_pool(), render_stored, doc_id, fmt)
+
+
+class IncrementalExport:
+    """Export files built from a document while it streams, so they are ready when its last chunk lands.
+
+    feed() only queues text. One task at a time hands everything queued so far to the format builders in the
+    export pool, so building never blocks the event loop and never falls behind by more than one batch. finish()
+    only has to flush the last line and save; there is no second pass over the finished text.
+    """
+
+    def __init__(self, formats: Iterable[str], title: str = "AI Legal Document") -> None:
+        self.formats = list(dict.fromkeys(formats))
+        for fmt in self.formats:
+            if fmt not in EXPORT_BUILDERS:
+                raise ValueError(f"Unsupported export format '{fmt}'. Choose from: {', '.join(EXPORT_BUILDERS)}.")
+        self.title = title
+        self._builders: Optional[Dict[str, Any]] = None
+        self._queued: List[str] = []
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self._task = asyncio.ensure_future(self._run())
+
+    def feed(self, text: str) -> None:
+        if text and not self._closed:
+            self._queued.append(text)
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # Text and finish() may both arrive during one render, setting the event only once between them
+            while self._queued:
+                text, self._queued = "".join(self._queued), []
+                await loop.run_in_executor(_pool(), self._feed_builders, text)
+            if self._closed:
+                return
+
+    def _feed_builders(self, text: str) -> None:
+        # Runs in the export pool, one call at a time, so the builders need no lock
+        if self._builders is None:
+            self._builders = {fmt: EXPORT_BUILDERS[fmt](self.title) for fmt in self.formats}
+        for builder in self._builders.values():
+            builder.feed(text)
+
+    def _finish_builders(self) -> Dict[str, bytes]:
+        self._feed_builders("")
+        assert self._builders is not None
+        return {fmt: builder.finish() for fmt, builder in self._builders.items()}
+
+    async def finish(self) -> Dict[str, bytes]:
+        """Wait for the queued text and return {format: file bytes}."""
+        started = time.perf_counter()
+        self._closed = True
+        self._wakeup.set()
+        await self._task
+        files = await asyncio.get_running_loop().run_in_executor(_pool(), self._finish_builders)
+        elapsed = time.perf_counter() - started
+        for fmt in files:
+            EXPORT_FINISH_LATENCY.labels(format=fmt).observe(elapsed)
+        record("export_finish", elapsed, started)
+        return files
+
+    async def save(self, doc_id: Optional[str]) -> List[str]:
+        """finish() and keep the files with stored document `doc_id`; returns the formats saved.
+
+        A failure is logged and never fails the generation that produced the document.
+        """
+        if doc_id is None:
+            self.close()
+            return []
+        try:
+            files = await self.finish()
+            loop = asyncio.get_running_loop()
+            for fmt, data in files.items():
+                await loop.run_in_executor(_pool(), document_store.put_export, doc_id, fmt, data)
+        except Exception:
+            logger.exception("Could not build exports for document %s", doc_id)
+            return []
+        return list(files)
+
+    def close(self) -> None:
+        """Stop building and drop the partial files (the stream failed or was abandoned)."""
+        self._closed = True
+        self._queued = []
+        if self._task.done() and not self._task.cancelled():
+            self._task.exception()  # nobody awaits a builder error now; do not report it as unhandled
+        self._task.cancel()
+
+
+def incremental_export(formats: Iterable[str], title: str = "AI Legal Document") -> Optional[IncrementalExport]:
+    """An IncrementalExport for `formats`, or None when none were asked for or there is no store to keep them in."""
+    formats = list(formats)
+    if not formats or not document_store.enabled:
+        return None
+    return IncrementalExport(formats, title)
+
+
+def shutdown_export_pool() -> None:
+    global _export_pool, _bulk_pool
+    with _export_pool_lock:
+        if _export_pool is not None:
+            _export_pool.shutdown(wait=False, cancel_futures=True)
+        _export_pool = None
+        if _bulk_pool is not None:
+            _bulk_pool.shutdown(wait=False, cancel_futures=True)
+        _bulk_pool = None
+
+
+# Bulk exports render in separate processes so they use every core
+_bulk_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _bulk_workers() -> int:
+    return BULK_EXPORT_WORKERS or os.cpu_count() or 1
+
+
+def _get_bulk_pool() -> ProcessPoolExecutor:
+    global _bulk_pool
+    with _export_pool_lock:
+        if _bulk_pool is None:
+            # spawn: forking a process that runs an event loop and worker threads is not safe
+            _bulk_pool = ProcessPoolExecutor(
+                max_workers=_bulk_workers(), mp_context=multiprocessing.get_context("spawn")
+            )
+        return _bulk_pool
+
+
+class _ZipSink(io.RawIOBase):
+    """Write-only, unseekable buffer that the ZIP writer appends to and the response drains."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._parts: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:  # type: ignore[override]
+        self._parts.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def _archive_names(names: Sequence[str], formats: Sequence[str]) -> Iterator[Tuple[int, str, str]]:
+    """Yield (document index, format, unique archive name) for every document/format pair."""
+    seen: Set[str] = set()
+    for index, name in enumerate(names):
+        stem = re.sub(r"[^A-Za-z0-9._-]+", "_", os.path.basename(name or "")).strip("._") or f"document_{index + 1:04d}"
+        for fmt in formats:
+            arcname = f"{stem}.{EXPORT_FORMATS[fmt][2]}"
+            suffix = 2
+            while arcname in seen:
+                arcname = f"{stem}_{suffix}.{EXPORT_FORMATS[fmt][2]}"
+                suffix += 1
+            seen.add(arcname)
+            yield index, fmt, arcname
+
+
+async def stream_zip(
+    documents: Sequence[Tuple[str, str, str]],
+    formats: Iterable[str] = ("pdf", "docx"),
+) -> AsyncGenerator[bytes, None]:
+    """Render (name, text, title) documents in the process pool and stream a ZIP archive as entries finish.
+
+    At most two renders per worker are outstanding and every finished entry is flushed to the caller at once,
+    so memory stays flat however many documents are exported. Entries appear in completion order.
+    """
+    formats = list(dict.fromkeys(formats))
+    for fmt in formats:
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format '{fmt}'. Choose from: {', '.join(EXPORT_FORMATS)}.")
+
+    pool = _get_bulk_pool()
+    window = 2 * _bulk_workers()
+    jobs = _archive_names([name for name, _, _ in documents], formats)
+    pending: Dict["asyncio.Future[Tuple[bytes, float]]", Tuple[str, str]] = {}
+
+    def submit_next() -> bool:
+        job = next(jobs, None)
+        if job is None:
+            return False
+        index, fmt, arcname = job
+        _, text, title = documents[index]
+        cf: Future = pool.submit(_timed_render, fmt, text, title)
+        pending[asyncio.wrap_future(cf)] = (arcname, fmt)
+        return True
+
+    sink = _ZipSink()
+    # PDF and DOCX are already compressed; deflating again would only burn event-loop CPU
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as zf:
+        try:
+            while len(pending) < window and submit_next():
+                pass
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for fut in done:
+                    arcname, fmt = pending.pop(fut)
+                    data, elapsed = fut.result()
+                    EXPORT_LATENCY.labels(format=fmt).observe(elapsed)
+                    zf.writestr(arcname, data)
+                    submit_next()
+                yield sink.drain()
+        finally:
+            for fut in pending:
+                fut.cancel()
+    yield sink.drain()
+
+
+# Files handed to the Gradio UI live in one per-process directory and expire after EXPORT_TMP_TTL seconds
+_tmpdir: Optional[str] = None
+_tmpdir_lock = threading.Lock()
+
+
+def _export_dir() -> str:
+    global _tmpdir
+    with _tmpdir_lock:
+        if _tmpdir is None or not os.path.isdir(_tmpdir):
+            _tmpdir = tempfile.mkdtemp(prefix="legal_assistant_")
+            atexit.register(shutil.rmtree, _tmpdir, True)
+        return _tmpdir
+
+
+def cleanup_export_files(max_age: float = EXPORT_TMP_TTL) -> int:
+    """Delete exported files older than `max_age` seconds; returns how many were removed."""
+    removed = 0
+    cutoff = time.time() - max_age
+    with os.scandir(_export_dir()) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def write_export_file(fmt: str, data: bytes) -> str:
+    """Write rendered bytes to a fresh file in the export directory and return its path (for the Gradio UI)."""
+    cleanup_export_files()
+    ext = EXPORT_FORMATS[fmt][2]
+    stem = export_filename(ext).rsplit(".", 1)[0]
+    fd, path = tempfile.mkstemp(dir=_export_dir(), prefix=f"{stem}_", suffix=f".{ext}")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(data)
     return path
 
 
-essentials = [
-    ("Important Notice:", "This document is AI-generated and must be reviewed by a qualified attorney."),
-]
+def _write_export(fmt: str, text: str, title: str) -> str:
+    return write_export_file(fmt, EXPORT_FORMATS[fmt][0](text, title))
+
+
+def export_docx(text: str, title: str = "AI Legal Document") -> str:
+    """Create a DOCX file from text and return the file path (for the Gradio UI)."""
+    return _write_export("docx", text, title)
 
 
 def export_pdf(text: str, title: str = "AI Legal Document") -> str:
-    """Create a simple PDF file from text and return the file path."""
-    path = _timestamped("document", "pdf")
-    c = canvas.Canvas(path, pagesize=LETTER)
-    width, height = LETTER
-
-    y = height - 72
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(72, y, title)
-    y -= 24
-
-    c.setFont("Helvetica", 11)
-    for line in text.splitlines():
-        if y < 72:
-            c.showPage()
-            y = height - 72
-            c.setFont("Helvetica", 11)
-        c.drawString(72, y, line[:1000])  # safety trim
-        y -= 14
-
-    # Footer notice
-    if y < 100:
-        c.showPage()
-        y = height - 72
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(72, y, essentials[0][0])
-    y -= 14
-    c.setFont("Helvetica", 11)
-    c.drawString(72, y, essentials[0][1])
-
-    c.save()
-    return path
+    """Create a simple PDF file from text and return the file path (for the Gradio UI)."""
+    return _write_export("pdf", text, title)
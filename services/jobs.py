@@ -0,0 +1,360 @@
+import asyncio
+import contextvars
+import logging
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple
+
+from config import (
+    JOB_WORKERS,
+    JOB_QUEUE_MAX,
+    JOB_TTL,
+    JOB_MAX_JOBS,
+    JOB_POLL_INTERVAL,
+    STREAM_FLUSH_BYTES,
+    STREAM_FLUSH_INTERVAL,
+)
+from .document_store import StoredJob, document_store, store_document
+from .export_utils import EXPORT_BUILDERS, incremental_export
+from .legal_generator import build_prompt, document_title, normalize_doc_type, stream_legal_document
+from .metrics import STREAMS_CANCELLED
+from .scheduler import QueueFullError
+from .streaming import coalesce
+
+logger = logging.getLogger("legal-assistant.jobs")
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+# Seconds DELETE waits for the worker running a job to stop it
+REMOTE_CANCEL_WAIT = 5.0
+
+
+class Job:
+    """One background generation; its output is kept as UTF-8 bytes so readers can resume at any offset.
+
+    The worker process that runs a job owns it. Other workers see a copy loaded from the document store, which
+    refresh() brings up to date.
+    """
+
+    def __init__(self, kwargs: Dict[str, Any], export: Sequence[str] = (), job_id: Optional[str] = None) -> None:
+        self.id = job_id or uuid.uuid4().hex
+        self.kwargs = kwargs
+        self.export = list(export)  # formats to build while generating
+        self.exports: List[str] = []  # formats stored with the document
+        self.status = JOB_QUEUED
+        self.error: Optional[str] = None
+        self.document_id: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.output = bytearray()
+        self.task: Optional["asyncio.Task[None]"] = None
+        self.cancel_requested = False
+        self.owned = job_id is None
+        self._changed = asyncio.Event()
+
+    @classmethod
+    def from_stored(cls, stored: StoredJob, output: bytes) -> "Job":
+        """Another worker's job as last written to the document store."""
+        job = cls({"doc_type": stored.doc_type}, job_id=stored.id)
+        job.output += output
+        job._load(stored)
+        return job
+
+    def _load(self, stored: StoredJob) -> None:
+        self.status = stored.status
+        self.error = stored.error
+        self.document_id = stored.document_id
+        self.exports = stored.exports
+        self.cancel_requested = stored.cancel_requested
+        self.created_at = stored.created_at
+        self.started_at = stored.started_at
+        self.finished_at = stored.finished_at
+
+    async def refresh(self) -> None:
+        """Catch up with the store; the row is read before the output, which its owner writes first."""
+        stored = await asyncio.to_thread(document_store.get_job, self.id)
+        if stored is None:
+            # Pruned meanwhile: end live readers with what they have
+            if not self.finished:
+                self.finish(JOB_FAILED, "Job expired")
+            return
+        output = await asyncio.to_thread(document_store.job_output, self.id, len(self.output))
+        self.output += output
+        self._load(stored)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def append(self, text: str) -> None:
+        self.output += text.encode("utf-8")
+        self._notify()
+
+    def finish(self, status: str, error: Optional[str] = None) -> None:
+        self.status = status
+        self.error = error
+        self.finished_at = time.time()
+        self._notify()
+
+    def text(self) -> str:
+        return self.output.decode("utf-8", errors="replace")
+
+    async def read(self, offset: int = 0) -> AsyncIterator[Tuple[int, bytes]]:
+        """Yield (end offset, bytes) from `offset` on, live, until the job finishes. Never re-runs the model.
+
+        Another worker's job is followed by polling the store every JOB_POLL_INTERVAL seconds.
+        """
+        while True:
+            changed = self._changed
+            if offset < len(self.output):
+                data = bytes(self.output[offset:])
+                offset = len(self.output)
+                yield offset, data
+                continue
+            if self.finished:
+                return
+            if self.owned:
+                await changed.wait()
+            else:
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+                await self.refresh()
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "doc_type": self.kwargs.get("doc_type"),
+            "bytes": len(self.output),
+            "error": self.error,
+            "document_id": self.document_id,
+            "exports": self.exports,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """Background generation jobs served by a fixed pool of worker tasks.
+
+    Jobs run in the process that accepted them. With the document store enabled, their state and output are
+    written to it as they change, so any uvicorn worker can report, stream or cancel them; otherwise they are
+    only visible in that process. Finished jobs are kept for `ttl` seconds, and at most `max_jobs` are retained
+    (oldest finished first); their documents also go to the document store.
+    """
+
+    def __init__(self, workers: int, max_queue: int, ttl: float, max_jobs: int) -> None:
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional["asyncio.Queue[Job]"] = None
+        self._tasks: List["asyncio.Task[None]"] = []
+
+    @property
+    def shared(self) -> bool:
+        """Whether other workers can see this process's jobs."""
+        return document_store.enabled
+
+    def _ensure_workers(self) -> "asyncio.Queue[Job]":
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            # A fresh context: workers outlive the request that started them and must not record into its trace
+            self._tasks = [asyncio.create_task(self._worker(), context=contextvars.Context())
+                           for _ in range(self.workers)]
+            if self.shared:
+                self._tasks.append(asyncio.create_task(self._watch_cancels(), context=contextvars.Context()))
+        return self._queue
+
+    async def _store(self, job: Job, write: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        """Run a store write off the event loop; a failure is logged and never fails the job itself."""
+        if not self.shared:
+            return
+        try:
+            await asyncio.to_thread(write, *args, **kwargs)
+        except sqlite3.Error:
+            logger.exception("Could not store the state of job %s", job.id)
+
+    async def _save(self, job: Job) -> None:
+        await self._store(
+            job, document_store.update_job, job.id, status=job.status, error=job.error,
+            document_id=job.document_id, exports=job.exports, started_at=job.started_at,
+            finished_at=job.finished_at,
+        )
+
+    async def submit(self, export: Sequence[str] = (), **kwargs: Any) -> Job:
+        """Queue a generation and return at once; raises ValueError for a bad request, QueueFullError when full.
+
+        `export` formats are built while the job runs and stored with its document.
+        """
+        build_prompt(kwargs["doc_type"], kwargs["party1"], kwargs["party2"],
+                     kwargs.get("duration", ""), kwargs.get("salary", ""))
+        for fmt in export:
+            if fmt not in EXPORT_BUILDERS:
+                raise ValueError(f"Unsupported export format '{fmt}'. Choose from: {', '.join(EXPORT_BUILDERS)}.")
+        queue = self._ensure_workers()
+        if queue.qsize() >= self.max_queue:
+            raise QueueFullError("Job queue is full", float(max(1, queue.qsize() // self.workers)))
+        await self._prune()
+        job = Job(kwargs, export)
+        self._jobs[job.id] = job
+        await self._store(job, document_store.put_job, job.id, kwargs["doc_type"], job.status, job.created_at)
+        queue.put_nowait(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        """This process's job, or another worker's as last stored."""
+        job = self._jobs.get(job_id)
+        if job is not None or not self.shared:
+            return job
+        try:
+            stored = await asyncio.to_thread(document_store.get_job, job_id)
+            if stored is None:
+                return None
+            output = await asyncio.to_thread(document_store.job_output, job_id)
+        except sqlite3.Error:
+            logger.exception("Could not load job %s", job_id)
+            return None
+        return Job.from_stored(stored, output)
+
+    async def cancel(self, job: Job) -> None:
+        """Stop a queued or running job and wait for it; a running one closes its upstream call and frees its
+        model slot. Another worker's job is flagged in the store for that worker to cancel."""
+        if job.finished:
+            return
+        if not job.owned:
+            await self._store(job, document_store.request_job_cancel, job.id)
+            deadline = time.monotonic() + REMOTE_CANCEL_WAIT
+            while not job.finished and time.monotonic() < deadline:
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+                await job.refresh()
+            return
+        if not job.cancel_requested:
+            job.cancel_requested = True
+            STREAMS_CANCELLED.labels(source="job").inc()
+            if job.task is None:
+                job.finish(JOB_CANCELLED, "Cancelled")
+                await self._save(job)
+                return
+            job.task.cancel()
+        if job.task is not None and not job.task.done():
+            await asyncio.wait({job.task})
+
+    async def _watch_cancels(self) -> None:
+        """Cancel this process's jobs that another worker was asked to cancel."""
+        while True:
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            pending = [job.id for job in self._jobs.values() if not job.finished]
+            if not pending:
+                continue
+            try:
+                requested = await asyncio.to_thread(document_store.cancel_requested_jobs, pending)
+            except sqlite3.Error:
+                logger.exception("Could not check jobs for cancel requests")
+                continue
+            for job_id in requested:
+                job = self._jobs.get(job_id)
+                if job is not None and not job.cancel_requested:
+                    asyncio.ensure_future(self.cancel(job))
+
+    async def _worker(self) -> None:
+        assert self._queue is not None
+        while True:
+            job = await self._queue.get()
+            try:
+                if not job.finished:
+                    job.task = asyncio.ensure_future(self._run(job))
+                    await job.task
+            except asyncio.CancelledError:
+                # A cancelled job only ends that job; cancelling this worker (shutdown) propagates
+                task = asyncio.current_task()
+                if task is not None and task.cancelling():
+                    raise
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        await self._save(job)
+        doc_type = job.kwargs["doc_type"]
+        exports = incremental_export(job.export, document_title(doc_type))
+        try:
+            chunks = stream_legal_document(**job.kwargs)
+            async for batch in coalesce(chunks, STREAM_FLUSH_BYTES, STREAM_FLUSH_INTERVAL):
+                start = len(job.output)
+                job.append(batch)
+                if exports is not None:
+                    exports.feed(batch)
+                await self._store(job, document_store.append_job_output, job.id, start, bytes(job.output[start:]))
+            job.document_id = await store_document(
+                job.text(), normalize_doc_type(doc_type) or doc_type, document_title(doc_type)
+            )
+            if exports is not None:
+                job.exports = await exports.save(job.document_id)
+        except asyncio.CancelledError:
+            if job.cancel_requested:
+                job.finish(JOB_CANCELLED, "Cancelled")
+            else:
+                job.finish(JOB_FAILED, "Server shutting down")
+            await self._save(job)
+            raise
+        except Exception as e:
+            logger.exception("Job %s failed", job.id)
+            job.finish(JOB_FAILED, str(e))
+            await self._save(job)
+            return
+        finally:
+            if exports is not None:
+                exports.close()
+        job.finish(JOB_DONE)
+        await self._save(job)
+
+    async def _prune(self) -> None:
+        cutoff = time.time() - self.ttl
+        finished = [j for j in self._jobs.values() if j.finished]
+        excess = max(0, len(self._jobs) - self.max_jobs + 1)
+        for job in finished:
+            if job.finished_at is not None and (job.finished_at < cutoff or excess > 0):
+                excess -= 1
+                del self._jobs[job.id]
+        if self.shared:
+            try:
+                await asyncio.to_thread(document_store.prune_jobs, cutoff, self.max_jobs)
+            except sqlite3.Error:
+                logger.exception("Could not prune stored jobs")
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "jobs": counts,
+            # False: jobs are only visible in the worker that accepted them (run one worker or enable the store)
+            "shared": self.shared,
+        }
+
+    async def shutdown(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+
+job_manager = JobManager(JOB_WORKERS, max_queue=JOB_QUEUE_MAX, ttl=JOB_TTL, max_jobs=JOB_MAX_JOBS)
@@ -1,11 +1,50 @@
-from typing import Dict, Optional, AsyncGenerator, Generator
+from typing import Any, Dict, List, Optional, AsyncGenerator, Generator, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
 
-from config import MODEL_NAME, DEFAULT_TEMPERATURE, DEFAULT_TOP_P, DEFAULT_NUM_PREDICT
-from .ollama_client import generate, stream_generate, stream_generate_sync, OllamaError
+from config import (
+    MODEL_NAME,
+    DEFAULT_TEMPERATURE,
+    DEFAULT_TOP_P,
+    DEFAULT_NUM_PREDICT,
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_TTL,
+    CACHE_REPLAY_CHUNK_SIZE,
+    MODEL_CONCURRENCY,
+    MODEL_CONCURRENCY_LIMITS,
+    QUEUE_MAX_SIZE,
+    QUEUE_TIMEOUT,
+    CLAUSE_CONCURRENCY,
+    CLAUSE_MIN_NUM_PREDICT,
+    PROMPT_CONTEXT_REUSE,
+    CONTEXT_CACHE_SIZE,
+    CONTEXT_CACHE_TTL,
+    CONTEXT_RETRY_AFTER,
+    SKELETON_MODE,
+    SKELETON_MAX_TEMPERATURE,
+    SKELETON_CACHE_SIZE,
+    SKELETON_CACHE_TTL,
+    EARLY_STOP,
+    TOKEN_BUDGET_ADAPTIVE,
+)
+from .cache import LRUTTLCache
+from .metrics import DOCUMENTS_TRUNCATED, GENERATION_LATENCY, SKELETON_RESULTS, TIME_TO_FIRST_TOKEN
+from .scheduler import Scheduler, PRIORITY_BATCH
+from .singleflight import SingleFlight, StreamSingleFlight
+from .ollama_client import generate, generate_raw, stream_generate, OllamaError
+from .token_budget import token_budgets
+from .tracing import record, span
+
+logger = logging.getLogger("legal-assistant.generator")
 
 # Centralized legal templates with required fields metadata
 LEGAL_TEMPLATES: Dict[str, Dict[str, str]] = {
     "rental agreement": {
+        "title": "Residential Rental Agreement",
         "template": (
             "Generate a comprehensive residential rental agreement between {party1} (tenant) "
             "and {party2} (landlord) for a term of {duration} months. Include: premises, term, rent, "
@@ -14,6 +53,7 @@ LEGAL_TEMPLATES: Dict[str, Dict[str, str]] = {
         ),
     },
     "employment contract": {
+        "title": "Employment Contract",
         "template": (
             "Draft an employment contract between {party2} (employer) and {party1} (employee) with an annual "
             "salary of {salary}. Include: position, duties, compensation, benefits, working hours, probation, "
@@ -21,6 +61,7 @@ LEGAL_TEMPLATES: Dict[str, Dict[str, str]] = {
         ),
     },
     "business partnership agreement": {
+        "title": "Business Partnership Agreement",
         "template": (
             "Draft a business partnership agreement between {party1} and {party2}. Include: contributions, ownership percentages, "
             "management and decision-making, profit/loss allocation, withdrawals/distributions, dispute resolution, "
@@ -28,6 +69,7 @@ LEGAL_TEMPLATES: Dict[str, Dict[str, str]] = {
         ),
     },
     "nda": {
+        "title": "Mutual Non-Disclosure Agreement",
         "template": (
             "Generate a mutual non-disclosure agreement between {party1} and {party2} to protect confidential information. "
             "Include: definitions, obligations, exclusions, term, permitted disclosures, remedies, and governing law."
@@ -51,67 +93,460 @@ DOC_ALIASES = {
 }
 
 
+IMPORTANT_NOTICE = "Important Notice: This document is AI-generated and must be reviewed by a qualified attorney."
+
+# Compliance and formatting instruction footer shared by every prompt
+CONSTRAINTS_FOOTER = (
+    "\n\nConstraints: Use clear headings and bullet points where helpful. Avoid hallucinating facts. "
+    f"Add a final section: '{IMPORTANT_NOTICE}'"
+)
+
+# Appended to a doc_type's fixed prefix when priming the model context (see build_prompt_parts)
+PRIME_INSTRUCTION = "\n\nThe party details follow in the next message. Until then, reply only with OK."
+
+SECTION_INSTRUCTION = (
+    "\n\nWrite only section {index} of {total} of this document: {section}. Begin with the heading "
+    "'{index}. {heading}' and write that section in full, in clear legal language. Do not write a title, "
+    "any other section or a closing notice."
+)
+
+# Skeleton mode: values the model must leave as placeholders, filled in per request (see fill_skeleton)
+PLACEHOLDERS = {"party1": "[[PARTY_1]]", "party2": "[[PARTY_2]]", "duration": "[[DURATION]]", "salary": "[[SALARY]]"}
+
+SKELETON_INSTRUCTION = (
+    "\n\nThis is a reusable template. Write the placeholders {placeholders} exactly as shown wherever those "
+    "values belong, and never replace them with names, numbers or amounts of your own.{hints}"
+)
+
+_PLACEHOLDER_RE = re.compile(r"\[\[(PARTY_1|PARTY_2|DURATION|SALARY)\]\]")
+# Anything that looks like an attempt at one of our placeholders: [PARTY_1], {party1}, [[Party 2]], [[DURATION] ...
+_PLACEHOLDER_LIKE_RE = re.compile(r"[\[{]+\s*(?:party[\s_-]*\d+|duration|salary)\s*[\]}]*", re.IGNORECASE)
+_DOUBLE_BRACKET_RE = re.compile(r"\[\[[^\]\n]*\]\]?")
+
+
+def _notice_words(text: str) -> str:
+    """Lowercase words of `text`, ignoring punctuation and markdown: how the closing notice is recognised."""
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+# Early stop: the closing notice as the words the model was told to write
+_NOTICE_WORDS = _notice_words(IMPORTANT_NOTICE)
+# ...which only closes a document once it has a body: a numbered/"Section"/"Article" heading or this many words
+_HEADING_RE = re.compile(r"^\s*(?:#+\s*)?(?:\*\*)?\s*(?:\d+[.)]|(?:article|section)\b)", re.IGNORECASE)
+_MIN_BODY_WORDS = 40
+
+
+class SkeletonError(Exception):
+    """A generated skeleton has missing or malformed placeholders and must not be reused."""
+
+
+class NoticeStop:
+    """Stop check for ollama_client that ends a document once its closing Important Notice is written.
+
+    The notice is complete at the end of the line that finishes the exact IMPORTANT_NOTICE text, compared word
+    by word so bold markers, quotes or a heading on a line of its own do not matter; whatever the model would
+    write after that line is not generated. A body clause that merely mentions an important notice or an
+    attorney is not the notice, and neither is a notice written as a disclaimer before the document's body.
+    """
+
+    def __init__(self) -> None:
+        self._line = ""  # the current, unfinished line
+        self._recent = ""  # words of the last finished lines, enough to hold the whole notice
+        self._body_words = 0
+        self._body = False  # a section heading or _MIN_BODY_WORDS words seen
+
+    def __call__(self, chunk: str) -> Optional[int]:
+        start = 0
+        while True:
+            newline = chunk.find("\n", start)
+            if newline < 0:
+                self._line += chunk[start:]
+                return None
+            line, self._line = self._line + chunk[start:newline], ""
+            words = _notice_words(line)
+            if words:
+                self._recent = f"{self._recent} {words}"[-2 * len(_NOTICE_WORDS):]
+                if _NOTICE_WORDS in self._recent:
+                    if self._body:
+                        return newline
+                    self._recent = ""  # a leading disclaimer: keep generating
+                else:
+                    self._body_words += words.count(" ") + 1
+                    if self._body_words >= _MIN_BODY_WORDS or _HEADING_RE.match(line):
+                        self._body = True
+            start = newline + 1
+
+
 def normalize_doc_type(doc_type: str) -> Optional[str]:
     key = doc_type.strip().lower()
     return DOC_ALIASES.get(key) or (key if key in LEGAL_TEMPLATES else None)
 
 
-async def generate_legal_document(
-    *,
-    doc_type: str,
-    party1: str,
-    party2: str,
-    duration: Optional[str] = "",
-    salary: Optional[str] = "",
-    model: Optional[str] = None,
-    temperature: Optional[float] = DEFAULT_TEMPERATURE,
-    top_p: Optional[float] = DEFAULT_TOP_P,
-    num_predict: Optional[int] = DEFAULT_NUM_PREDICT,
-) -> str:
+def document_title(doc_type: str) -> str:
+    """Heading used for a document type in exports and the document store."""
+    canonical = normalize_doc_type(doc_type)
+    return LEGAL_TEMPLATES[canonical]["title"] if canonical else "AI Legal Document"
+
+
+def template_sections(canonical: str) -> List[str]:
+    """Section names listed after 'Include:' in a template, in document order."""
+    match = re.search(r"Include:\s*(.+?)\.(?:\s|$)", LEGAL_TEMPLATES[canonical]["template"])
+    if not match:
+        return []
+    sections = []
+    for item in match.group(1).split(","):
+        item = re.sub(r"^and\s+", "", item.strip())
+        if item:
+            sections.append(item)
+    return sections
+
+
+def _canonical_doc_type(doc_type: str) -> str:
     canonical = normalize_doc_type(doc_type)
     if not canonical:
         raise ValueError(
             "Invalid document type. Choose from rental agreement, employment contract, business partnership agreement, or NDA."
         )
+    return canonical
 
-    template = LEGAL_TEMPLATES[canonical]["template"]
+
+def build_prompt(doc_type: str, party1: str, party2: str, duration: Optional[str] = "", salary: Optional[str] = "") -> str:
+    template = LEGAL_TEMPLATES[_canonical_doc_type(doc_type)]["template"]
     prompt = template.format(party1=party1, party2=party2, duration=duration or "",
                              salary=salary or "")
+    prompt += CONSTRAINTS_FOOTER
+    return prompt
 
-    # Add a compliance and formatting instruction footer
-    prompt += (
-        "\n\nConstraints: Use clear headings and bullet points where helpful. Avoid hallucinating facts. "
-        "Add a final section: 'Important Notice: This document is AI-generated and must be reviewed by a qualified attorney.'"
-    )
 
-    response = await generate(
-        prompt,
-        model=model or MODEL_NAME,
-        temperature=temperature,
-        top_p=top_p,
-        num_predict=num_predict,
-        stream=False,
-    )
-    return response
+def build_prompt_parts(
+    doc_type: str, party1: str, party2: str, duration: Optional[str] = "", salary: Optional[str] = ""
+) -> Tuple[str, str]:
+    """Split the prompt into a prefix shared by every request of the doc_type and a party-specific suffix."""
+    template = LEGAL_TEMPLATES[_canonical_doc_type(doc_type)]["template"]
+    prefix = template.format(party1="Party 1", party2="Party 2", duration="the stated number of",
+                             salary="the stated amount")
+    prefix += CONSTRAINTS_FOOTER
 
+    details = [f"- Party 1: {party1}", f"- Party 2: {party2}"]
+    if "{duration}" in template:
+        details.append(f"- Term: {duration} months" if duration else "- Term: not specified")
+    if "{salary}" in template:
+        details.append(f"- Annual salary: {salary}" if salary else "- Annual salary: not specified")
+    suffix = "\n\nDetails:\n" + "\n".join(details) + "\n\nWrite the complete document now using these details."
+    return prefix, suffix
 
-def build_prompt(doc_type: str, party1: str, party2: str, duration: Optional[str] = "", salary: Optional[str] = "") -> str:
+
+def _duration_bucket(duration: Optional[str]) -> Optional[str]:
+    value = (duration or "").strip()
+    if not value:
+        return "not specified"
+    if not value.isdigit():
+        return None  # free text such as "one year" does not fit the "[[DURATION]] months" wording
+    months = int(value)
+    if months < 12:
+        return "under 12 months"
+    return "12 to 35 months" if months < 36 else "36 months or more"
+
+
+def _salary_bucket(salary: Optional[str]) -> Optional[str]:
+    value = (salary or "").strip()
+    if not value:
+        return "not specified"
+    match = re.fullmatch(r"\$?\s*([\d,]+(?:\.\d+)?)\s*(k)?(?:\s*(?:per year|/\s*year|annually))?", value, re.IGNORECASE)
+    if not match:
+        return None
+    amount = float(match.group(1).replace(",", "")) * (1000 if match.group(2) else 1)
+    if amount < 50000:
+        return "under 50,000 per year"
+    return "50,000 to 149,999 per year" if amount < 150000 else "150,000 per year or more"
+
+
+def build_skeleton_prompt(
+    doc_type: str, duration: Optional[str] = "", salary: Optional[str] = ""
+) -> Optional[Tuple[str, List[str]]]:
+    """Prompt for a placeholder skeleton and the placeholders it must contain.
+
+    Returns None when the request's values cannot be expressed as placeholders. The prompt depends on the
+    duration/salary bucket rather than the exact value, so nearby requests share one skeleton.
+    """
+    template = LEGAL_TEMPLATES[_canonical_doc_type(doc_type)]["template"]
+    required = [PLACEHOLDERS["party1"], PLACEHOLDERS["party2"]]
+    hints = []
+    if "{duration}" in template:
+        bucket = _duration_bucket(duration)
+        if bucket is None:
+            return None
+        required.append(PLACEHOLDERS["duration"])
+        hints.append(f" The term is {bucket}.")
+    if "{salary}" in template:
+        bucket = _salary_bucket(salary)
+        if bucket is None:
+            return None
+        required.append(PLACEHOLDERS["salary"])
+        hints.append(f" The salary is {bucket}.")
+    prompt = template.format(**PLACEHOLDERS) + CONSTRAINTS_FOOTER
+    prompt += SKELETON_INSTRUCTION.format(placeholders=", ".join(required), hints="".join(hints))
+    return prompt, required
+
+
+def validate_skeleton(text: str, required: List[str]) -> None:
+    """Raise SkeletonError unless every required placeholder appears and nothing resembles a broken one."""
+    for placeholder in required:
+        if placeholder not in text:
+            raise SkeletonError(f"missing placeholder {placeholder}")
+    allowed = set(required)
+    for match in _PLACEHOLDER_LIKE_RE.finditer(text):
+        if match.group(0).strip() not in allowed:
+            raise SkeletonError(f"malformed placeholder {match.group(0).strip()!r}")
+    for match in _DOUBLE_BRACKET_RE.finditer(text):
+        if match.group(0) not in allowed:
+            raise SkeletonError(f"unknown placeholder {match.group(0)!r}")
+
+
+def fill_skeleton(
+    skeleton: str, party1: str, party2: str, duration: Optional[str] = "", salary: Optional[str] = ""
+) -> str:
+    """Substitute the real values in one pass, so names that contain placeholder text are left alone."""
+    values = {
+        "PARTY_1": party1,
+        "PARTY_2": party2,
+        "DURATION": (duration or "").strip(),
+        "SALARY": (salary or "").strip(),
+    }
+    return _PLACEHOLDER_RE.sub(lambda m: values[m.group(1)], skeleton)
+
+
+# Finished documents keyed by (prompt, model, options)
+response_cache: LRUTTLCache[str] = LRUTTLCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+
+# Identical concurrent requests share one upstream generation (same key as the cache)
+generate_flights = SingleFlight()
+stream_flights = StreamSingleFlight()
+
+# Admission control: every upstream model call holds a slot for its model
+scheduler = Scheduler(MODEL_CONCURRENCY, QUEUE_MAX_SIZE, QUEUE_TIMEOUT, limits=MODEL_CONCURRENCY_LIMITS)
+
+# Ollama token context for each doc_type's fixed prompt prefix, keyed by (model, prefix hash)
+context_cache: LRUTTLCache[List[int]] = LRUTTLCache(CONTEXT_CACHE_SIZE, CONTEXT_CACHE_TTL)
+# Prefixes whose priming failed recently: they get the full prompt without another priming call until expiry
+context_failures: LRUTTLCache[bool] = LRUTTLCache(CONTEXT_CACHE_SIZE, CONTEXT_RETRY_AFTER)
+prefix_flights = SingleFlight()
+
+# Validated placeholder skeletons keyed by (skeleton prompt, model, options)
+skeleton_cache: LRUTTLCache[str] = LRUTTLCache(SKELETON_CACHE_SIZE, SKELETON_CACHE_TTL)
+skeleton_flights = SingleFlight()
+
+
+def _cache_key(prompt: str, model: str, options: Dict[str, Any]) -> str:
+    raw = json.dumps([prompt, model, options], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def _prefix_context(prefix: str, model: str, priority: str) -> Optional[List[int]]:
+    """Return the model context for a prompt prefix, priming and caching it on first use.
+
+    None means send the full prompt; a failed priming is not retried for CONTEXT_RETRY_AFTER seconds.
+    """
+    key = (model, hashlib.sha256(prefix.encode("utf-8")).hexdigest())
+    context = context_cache.get(key)
+    if context is not None or context_failures.get(key):
+        return context
+
+    async def _prime() -> Optional[List[int]]:
+        async with scheduler.slot(model, priority):
+            data = await generate_raw(prefix + PRIME_INSTRUCTION, model=model, temperature=0.0, num_predict=4,
+                                      think=False)
+        primed = data.get("context")
+        if not isinstance(primed, list) or not primed:
+            logger.warning("Ollama returned no %s prompt context, sending the full prompt", model)
+            context_failures.set(key, True)
+            return None
+        # A reply that is all reasoning (stripped to nothing) or still holds a <think> tag would leave every
+        # request that reuses this context continuing inside an unclosed reasoning block
+        reply = data.get("response") or ""
+        if not reply.strip() or "<think>" in reply:
+            logger.warning("Priming the %s prompt context produced reasoning, sending the full prompt", model)
+            context_failures.set(key, True)
+            return None
+        context_cache.set(key, primed)
+        return primed
+
+    try:
+        return await prefix_flights.do(key, _prime)
+    except OllamaError as e:
+        logger.warning("Priming prompt context failed, sending the full prompt: %s", e)
+        context_failures.set(key, True)
+        return None
+
+
+async def _model_input(
+    doc_type: str, party1: str, party2: str, duration: Optional[str], salary: Optional[str], model: str, priority: str
+) -> Tuple[str, Optional[List[int]]]:
+    """Prompt and optional context to send upstream.
+
+    With PROMPT_CONTEXT_REUSE the fixed per-doc_type prefix is evaluated once and only the party-specific
+    suffix is sent alongside the cached context.
+    """
+    if not PROMPT_CONTEXT_REUSE:
+        return build_prompt(doc_type, party1, party2, duration, salary), None
+    prefix, suffix = build_prompt_parts(doc_type, party1, party2, duration, salary)
+    with span("prefix_context"):
+        context = await _prefix_context(prefix, model, priority)
+    if context is None:
+        return prefix + suffix, None
+    return suffix, context
+
+
+def _early_stop() -> Optional[NoticeStop]:
+    return NoticeStop() if EARLY_STOP else None
+
+
+def _token_budget(canonical: str, model: str, num_predict: Optional[int]) -> Tuple[int, str]:
+    """num_predict for a whole-document call and where it came from: caller, learned or default."""
+    if num_predict is not None:
+        return num_predict, "caller"
+    learned = token_budgets.budget(canonical, model) if TOKEN_BUDGET_ADAPTIVE else None
+    return (learned, "learned") if learned is not None else (DEFAULT_NUM_PREDICT, "default")
+
+
+def _observe_length(canonical: str, model: str, data: Dict[str, Any], source: str) -> None:
+    """Learn from a finished document's length; one cut off at a budget the caller chose says little."""
+    tokens = data.get("eval_count")
+    if not isinstance(tokens, int):
+        return
+    truncated = data.get("done_reason") == "length"
+    if truncated:
+        DOCUMENTS_TRUNCATED.labels(doc_type=canonical, budget=source).inc()
+        if source == "caller":
+            return
+    token_budgets.observe(canonical, model, tokens, truncated=truncated)
+
+
+def _use_skeleton(skeleton: Optional[bool], temperature: Optional[float]) -> bool:
+    enabled = SKELETON_MODE if skeleton is None else skeleton
+    return enabled and (DEFAULT_TEMPERATURE if temperature is None else temperature) <= SKELETON_MAX_TEMPERATURE
+
+
+async def _skeleton_document(
+    doc_type: str,
+    party1: str,
+    party2: str,
+    duration: Optional[str],
+    salary: Optional[str],
+    *,
+    model: str,
+    temperature: Optional[float],
+    top_p: Optional[float],
+    num_predict: Optional[int],
+    priority: str,
+    use_cache: bool,
+    keep_alive: Optional[str] = None,
+    think: Optional[bool] = None,
+) -> Optional[str]:
+    """The document filled in from a cached (or freshly generated) skeleton; None means generate it normally."""
+    spec = build_skeleton_prompt(doc_type, duration, salary)
+    if spec is None:
+        return None
+    prompt, required = spec
     canonical = normalize_doc_type(doc_type)
-    if not canonical:
-        raise ValueError(
-            "Invalid document type. Choose from rental agreement, employment contract, business partnership agreement, or NDA."
-        )
-    template = LEGAL_TEMPLATES[canonical]["template"]
-    prompt = template.format(party1=party1, party2=party2, duration=duration or "",
-                             salary=salary or "")
-    prompt += (
-        "\n\nConstraints: Use clear headings and bullet points where helpful. Avoid hallucinating facts. "
-        "Add a final section: 'Important Notice: This document is AI-generated and must be reviewed by a qualified attorney.'"
+    options: Dict[str, Any] = {"temperature": temperature, "top_p": top_p, "num_predict": num_predict}
+    if think is not None:
+        options["think"] = think
+    key = _cache_key(prompt, model, options)
+    if use_cache:
+        skeleton = skeleton_cache.get(key)
+        if skeleton is not None:
+            SKELETON_RESULTS.labels(doc_type=canonical, result="hit").inc()
+            return fill_skeleton(skeleton, party1, party2, duration, salary)
+
+    async def _generate_skeleton() -> Optional[str]:
+        started = time.perf_counter()
+        budget, source = _token_budget(canonical, model, num_predict)
+        async with scheduler.slot(model, priority):
+            data = await generate_raw(prompt, model=model, temperature=temperature, top_p=top_p,
+                                      num_predict=budget, keep_alive=keep_alive, think=think,
+                                      stop=_early_stop())
+        GENERATION_LATENCY.labels(doc_type=canonical, model=model).observe(time.perf_counter() - started)
+        _observe_length(canonical, model, data, source)
+        try:
+            validate_skeleton(data["response"], required)
+        except SkeletonError as e:
+            logger.warning("Rejected %s skeleton, generating the document directly: %s", canonical, e)
+            SKELETON_RESULTS.labels(doc_type=canonical, result="rejected").inc()
+            return None
+        SKELETON_RESULTS.labels(doc_type=canonical, result="generated").inc()
+        skeleton_cache.set(key, data["response"])
+        return data["response"]
+
+    skeleton = await (skeleton_flights.do(key, _generate_skeleton) if use_cache else _generate_skeleton())
+    return None if skeleton is None else fill_skeleton(skeleton, party1, party2, duration, salary)
+
+
+def _replay_chunks(text: str) -> Generator[str, None, None]:
+    for i in range(0, len(text), CACHE_REPLAY_CHUNK_SIZE):
+        yield text[i:i + CACHE_REPLAY_CHUNK_SIZE]
+
+
+async def _section_stream(
+    canonical: str,
+    party1: str,
+    party2: str,
+    duration: Optional[str],
+    salary: Optional[str],
+    *,
+    model: str,
+    temperature: Optional[float],
+    top_p: Optional[float],
+    num_predict: Optional[int],
+    priority: str,
+    keep_alive: Optional[str] = None,
+    think: Optional[bool] = None,
+) -> AsyncGenerator[str, None]:
+    """Generate each template section as a concurrent sub-prompt and yield the sections in document order.
+
+    Every sub-prompt starts with the same preamble so the model host can reuse its prompt prefix. The title
+    and the final notice are fixed text and are not generated.
+    """
+    sections = template_sections(canonical)
+    preamble = LEGAL_TEMPLATES[canonical]["template"].format(
+        party1=party1, party2=party2, duration=duration or "", salary=salary or ""
     )
-    return prompt
+    # The whole-document budget (the caller's, learned or default), split across the sections
+    budget, _ = _token_budget(canonical, model, num_predict)
+    section_budget = max(CLAUSE_MIN_NUM_PREDICT, -(-budget // max(1, len(sections))))
+    limit = asyncio.Semaphore(CLAUSE_CONCURRENCY)
+
+    async def _one(index: int, section: str) -> str:
+        prompt = preamble + SECTION_INSTRUCTION.format(
+            index=index, total=len(sections), section=section, heading=section[:1].upper() + section[1:]
+        )
+        async with limit:
+            async with scheduler.slot(model, priority):
+                text = await generate(
+                    prompt,
+                    model=model,
+                    temperature=temperature,
+                    top_p=top_p,
+                    num_predict=section_budget,
+                    keep_alive=keep_alive,
+                    think=think,
+                )
+        return text.strip()
 
+    tasks = [asyncio.ensure_future(_one(i, section)) for i, section in enumerate(sections, 1)]
+    try:
+        yield LEGAL_TEMPLATES[canonical]["title"]
+        for task in tasks:
+            yield "\n\n" + await task
+        yield "\n\n" + IMPORTANT_NOTICE
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Retrieve their errors and let them leave their scheduler slots before we return
+        await asyncio.gather(*tasks, return_exceptions=True)
 
-async def stream_legal_document(
+
+async def generate_legal_document(
     *,
     doc_type: str,
     party1: str,
@@ -121,20 +556,84 @@ async def stream_legal_document(
     model: Optional[str] = None,
     temperature: Optional[float] = DEFAULT_TEMPERATURE,
     top_p: Optional[float] = DEFAULT_TOP_P,
-    num_predict: Optional[int] = DEFAULT_NUM_PREDICT,
-) -> AsyncGenerator[str, None]:
-    prompt = build_prompt(doc_type, party1, party2, duration, salary)
-    async for chunk in stream_generate(
-        prompt,
-        model=model or MODEL_NAME,
-        temperature=temperature,
-        top_p=top_p,
-        num_predict=num_predict,
-    ):
-        yield chunk
+    num_predict: Optional[int] = None,
+    use_cache: bool = True,
+    priority: str = PRIORITY_BATCH,
+    parallel_sections: bool = False,
+    skeleton: Optional[bool] = None,
+    keep_alive: Optional[str] = None,
+    think: Optional[bool] = None,
+) -> str:
+    with span("prompt"):
+        prompt = build_prompt(doc_type, party1, party2, duration, salary)
+    model = model or MODEL_NAME
+    options: Dict[str, Any] = {"temperature": temperature, "top_p": top_p, "num_predict": num_predict}
+    if parallel_sections:
+        options["parallel_sections"] = True
+    if think is not None:
+        options["think"] = think
+    key = _cache_key(prompt, model, options)
+    if use_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            record("cache_hit", 0.0)
+            return cached
 
+    if _use_skeleton(skeleton, temperature):
+        with span("skeleton"):
+            filled = await _skeleton_document(
+                doc_type, party1, party2, duration, salary, model=model, temperature=temperature, top_p=top_p,
+                num_predict=num_predict, priority=priority, use_cache=use_cache, keep_alive=keep_alive,
+                think=think,
+            )
+        if filled is not None:
+            return filled
 
-def stream_legal_document_sync(
+    canonical = normalize_doc_type(doc_type)
+
+    async def _generate() -> str:
+        started = time.perf_counter()
+        if parallel_sections:
+            parts = [chunk async for chunk in _section_stream(
+                canonical, party1, party2, duration, salary, model=model,
+                temperature=temperature, top_p=top_p, num_predict=num_predict, priority=priority,
+                keep_alive=keep_alive, think=think,
+            )]
+            response = "".join(parts)
+            GENERATION_LATENCY.labels(doc_type=canonical, model=model).observe(time.perf_counter() - started)
+            response_cache.set(key, response)
+            return response
+
+        model_prompt, context = await _model_input(doc_type, party1, party2, duration, salary, model, priority)
+        budget, source = _token_budget(canonical, model, num_predict)
+        async with scheduler.slot(model, priority):
+            admitted = time.perf_counter()
+            data = await generate_raw(
+                model_prompt,
+                model=model,
+                temperature=temperature,
+                top_p=top_p,
+                num_predict=budget,
+                context=context,
+                keep_alive=keep_alive,
+                think=think,
+                stop=_early_stop(),
+            )
+        _observe_length(canonical, model, data, source)
+        response = data["response"]
+        # Not streamed: first-token time is the wait for a slot plus Ollama's load and prompt-eval time
+        server_ttft = (data.get("load_duration") or 0) / 1e9 + (data.get("prompt_eval_duration") or 0) / 1e9
+        TIME_TO_FIRST_TOKEN.labels(doc_type=canonical, model=model).observe(admitted - started + server_ttft)
+        GENERATION_LATENCY.labels(doc_type=canonical, model=model).observe(time.perf_counter() - started)
+        response_cache.set(key, response)
+        return response
+
+    if not use_cache:
+        return await _generate()
+    return await generate_flights.do(key, _generate)
+
+
+async def stream_legal_document(
     *,
     doc_type: str,
     party1: str,
@@ -144,13 +643,84 @@ def stream_legal_document_sync(
     model: Optional[str] = None,
     temperature: Optional[float] = DEFAULT_TEMPERATURE,
     top_p: Optional[float] = DEFAULT_TOP_P,
-    num_predict: Optional[int] = DEFAULT_NUM_PREDICT,
-) -> Generator[str, None, None]:
-    prompt = build_prompt(doc_type, party1, party2, duration, salary)
-    yield from stream_generate_sync(
-        prompt,
-        model=model or MODEL_NAME,
-        temperature=temperature,
-        top_p=top_p,
-        num_predict=num_predict,
-    )
+    num_predict: Optional[int] = None,
+    use_cache: bool = True,
+    priority: str = PRIORITY_BATCH,
+    parallel_sections: bool = False,
+    skeleton: Optional[bool] = None,
+    keep_alive: Optional[str] = None,
+    think: Optional[bool] = None,
+) -> AsyncGenerator[str, None]:
+    with span("prompt"):
+        prompt = build_prompt(doc_type, party1, party2, duration, salary)
+    model = model or MODEL_NAME
+    options: Dict[str, Any] = {"temperature": temperature, "top_p": top_p, "num_predict": num_predict}
+    if parallel_sections:
+        options["parallel_sections"] = True
+    if think is not None:
+        options["think"] = think
+    key = _cache_key(prompt, model, options)
+    if use_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            record("cache_hit", 0.0)
+            for chunk in _replay_chunks(cached):
+                yield chunk
+            return
+
+    if _use_skeleton(skeleton, temperature):
+        # A skeleton must be validated whole before use, so a miss is generated before anything is streamed
+        with span("skeleton"):
+            filled = await _skeleton_document(
+                doc_type, party1, party2, duration, salary, model=model, temperature=temperature, top_p=top_p,
+                num_predict=num_predict, priority=priority, use_cache=use_cache, keep_alive=keep_alive,
+                think=think,
+            )
+        if filled is not None:
+            for chunk in _replay_chunks(filled):
+                yield chunk
+            return
+
+    canonical = normalize_doc_type(doc_type)
+
+    async def _upstream() -> AsyncGenerator[str, None]:
+        parts = []
+        started = time.perf_counter()
+        if parallel_sections:
+            async for chunk in _section_stream(
+                canonical, party1, party2, duration, salary, model=model,
+                temperature=temperature, top_p=top_p, num_predict=num_predict, priority=priority,
+                keep_alive=keep_alive, think=think,
+            ):
+                parts.append(chunk)
+                yield chunk
+            GENERATION_LATENCY.labels(doc_type=canonical, model=model).observe(time.perf_counter() - started)
+            response_cache.set(key, "".join(parts))
+            return
+
+        model_prompt, context = await _model_input(doc_type, party1, party2, duration, salary, model, priority)
+        budget, source = _token_budget(canonical, model, num_predict)
+        async with scheduler.slot(model, priority):
+            async for chunk in stream_generate(
+                model_prompt,
+                model=model,
+                temperature=temperature,
+                top_p=top_p,
+                num_predict=budget,
+                context=context,
+                keep_alive=keep_alive,
+                think=think,
+                stop=_early_stop(),
+                on_done=lambda data: _observe_length(canonical, model, data, source),
+            ):
+                if not parts:
+                    TIME_TO_FIRST_TOKEN.labels(doc_type=canonical, model=model).observe(time.perf_counter() - started)
+                parts.append(chunk)
+                yield chunk
+        GENERATION_LATENCY.labels(doc_type=canonical, model=model).observe(time.perf_counter() - started)
+        # Only a fully consumed stream is a complete document
+        response_cache.set(key, "".join(parts))
+
+    source = _upstream() if not use_cache else stream_flights.stream(key, _upstream)
+    async for chunk in source:
+        yield chunk
@@ -0,0 +1,222 @@
+import math
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+RATE_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 40, 60, 80, 120, 200)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List["_Metric"] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: "_Metric") -> None:
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        return "".join(m.render() for m in metrics)
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _new_child(self) -> object:
+        raise NotImplementedError
+
+    def labels(self, **labels: str):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+            return child
+
+    def _samples(self, values: Tuple[str, ...], child: object) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in children:
+            lines.extend(self._samples(values, child))
+        return "\n".join(lines) + "\n"
+
+
+class _Value:
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def _samples(self, values: Tuple[str, ...], child: object) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class _HistogramValue:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    return
+            self.counts[-1] += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS, registry: Registry = REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def _samples(self, values: Tuple[str, ...], child: object) -> List[str]:
+        with child._lock:
+            counts, total = list(child.counts), child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(list(self.buckets) + [math.inf], counts):
+            cumulative += count
+            le = (("le", _format_value(bound)),)
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+# Request level (app.py)
+REQUEST_LATENCY = Histogram(
+    "legal_request_duration_seconds", "End-to-end request latency.", ["endpoint", "doc_type", "model"]
+)
+REQUESTS_IN_FLIGHT = Gauge("legal_requests_in_flight", "Requests currently being served.", ["endpoint"])
+REQUEST_ERRORS = Counter("legal_request_errors_total", "Failed requests by cause.", ["endpoint", "doc_type", "kind"])
+
+# Generation level (services/legal_generator.py)
+TIME_TO_FIRST_TOKEN = Histogram(
+    "legal_time_to_first_token_seconds", "Time from upstream call to the first text a reader gets.",
+    ["doc_type", "model"],
+)
+GENERATION_LATENCY = Histogram(
+    "legal_generation_duration_seconds", "Upstream generation time (cache hits excluded).", ["doc_type", "model"]
+)
+SKELETON_RESULTS = Counter(
+    "legal_skeleton_results_total", "Skeleton lookups: hit, generated or rejected.", ["doc_type", "result"]
+)
+TOKEN_BUDGET = Gauge("legal_token_budget", "Learned num_predict per doc_type and model.", ["doc_type", "model"])
+DOCUMENTS_TRUNCATED = Counter(
+    "legal_documents_truncated_total", "Documents cut off at num_predict, by budget: caller, learned or default.",
+    ["doc_type", "budget"],
+)
+STREAMS_CANCELLED = Counter(
+    "legal_streams_cancelled_total", "Generations stopped because nobody will read the rest: api, ui or job.",
+    ["source"],
+)
+
+# Model level, from the timings Ollama reports (services/ollama_client.py)
+MODEL_TOKENS_PER_SECOND = Histogram(
+    "ollama_tokens_per_second", "Decode throughput reported by Ollama.", ["model"], buckets=RATE_BUCKETS
+)
+MODEL_TIME_TO_FIRST_TOKEN = Histogram(
+    "ollama_time_to_first_token_seconds", "Time from sending a call to its first token, reasoning included or not.",
+    ["model", "reasoning"],
+)
+MODEL_REASONING_TOKENS = Counter("ollama_reasoning_tokens_total", "Reasoning tokens kept from clients.", ["model"])
+MODEL_PROMPT_EVAL = Histogram("ollama_prompt_eval_seconds", "Prompt evaluation time reported by Ollama.", ["model"])
+MODEL_LOAD = Histogram("ollama_load_seconds", "Model load time reported by Ollama.", ["model"])
+MODEL_PROMPT_TOKENS = Counter("ollama_prompt_tokens_total", "Prompt tokens evaluated.", ["model"])
+MODEL_EVAL_TOKENS = Counter("ollama_eval_tokens_total", "Tokens generated.", ["model"])
+MODEL_COLD_STARTS = Counter(
+    "ollama_cold_starts_total", "Calls that had to load the model first, by warm-up or request.", ["model", "source"]
+)
+MODEL_COLD_START_SECONDS = Histogram(
+    "ollama_cold_start_seconds", "Model load time of cold starts.", ["model", "source"]
+)
+MODEL_RESIDENT = Gauge("ollama_model_resident", "1 if the model was loaded at the last check.", ["backend", "model"])
+UPSTREAM_DEADLINES = Counter(
+    "ollama_deadline_exceeded_total", "Upstream calls abandoned at a deadline: connect, ttft or idle.",
+    ["model", "kind"],
+)
+UPSTREAM_RETRIES = Counter("ollama_retries_total", "Upstream calls retried after a connection error.", ["model"])
+UPSTREAM_HEDGES = Counter("ollama_hedges_total", "Hedged duplicate calls: fired, and won by the duplicate.",
+                          ["model", "result"])
+UPSTREAM_CANCELLED = Counter("ollama_cancelled_total", "Calls cancelled before Ollama finished them.", ["model"])
+TOKENS_SAVED = Counter(
+    "ollama_tokens_saved_total", "Unspent num_predict budget of calls ended early: cancelled or early_stop.",
+    ["model", "reason"],
+)
+EARLY_STOPS = Counter("ollama_early_stops_total", "Calls stopped once the closing notice was complete.", ["model"])
+
+# Scheduling and export
+QUEUE_WAIT = Histogram("scheduler_queue_wait_seconds", "Time spent waiting for a model slot.", ["model", "priority"])
+EXPORT_LATENCY = Histogram("export_duration_seconds", "Document render time.", ["format"])
+EXPORT_FINISH_LATENCY = Histogram(
+    "export_finish_seconds", "Time from a document's last streamed chunk to its built files being ready.", ["format"]
+)
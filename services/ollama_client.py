@@ -1,33 +1,228 @@
-from typing import Any, Dict, Optional, AsyncGenerator, Generator
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, AsyncGenerator
+from collections import deque
+from contextlib import asynccontextmanager
+import asyncio
 import json
+import logging
+import random
+import time
+
 import httpx
 
-from config import OLLAMA_URL, REQUEST_TIMEOUT
+from config import (
+    OLLAMA_URLS,
+    BACKEND_FAILURE_THRESHOLD,
+    CONNECT_TIMEOUT,
+    READ_TIMEOUT,
+    WRITE_TIMEOUT,
+    POOL_TIMEOUT,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    KEEP_ALIVE,
+    COLD_START_THRESHOLD,
+    TTFT_TIMEOUT,
+    IDLE_TIMEOUT,
+    RETRY_ATTEMPTS,
+    RETRY_BACKOFF_BASE,
+    RETRY_BACKOFF_MAX,
+    HEDGE_REQUESTS,
+    HEDGE_PERCENTILE,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_DEFAULT_DELAY,
+    HEDGE_MIN_DELAY,
+    THINK,
+    STRIP_THINKING,
+)
+from .backends import Backend, BackendPool
+from .streaming import ThinkFilter
+from .tracing import record
+from .metrics import (
+    EARLY_STOPS,
+    MODEL_COLD_STARTS,
+    MODEL_COLD_START_SECONDS,
+    MODEL_EVAL_TOKENS,
+    MODEL_LOAD,
+    MODEL_PROMPT_EVAL,
+    MODEL_PROMPT_TOKENS,
+    MODEL_REASONING_TOKENS,
+    MODEL_TIME_TO_FIRST_TOKEN,
+    MODEL_TOKENS_PER_SECOND,
+    UPSTREAM_DEADLINES,
+    UPSTREAM_HEDGES,
+    UPSTREAM_RETRIES,
+    UPSTREAM_CANCELLED,
+    TOKENS_SAVED,
+)
+
+
+logger = logging.getLogger("legal-assistant.ollama")
+
+# Called with each generated chunk; returns how much of the chunk to keep when generation should end there
+StopCheck = Callable[[str], Optional[int]]
 
 
 class OllamaError(Exception):
     pass
 
 
-async def generate(
+class OllamaConnectError(OllamaError):
+    """No connection could be made; nothing was sent, so the call is safe to retry."""
+
+
+class OllamaTimeout(OllamaError):
+    """The backend missed the first-token or inter-token deadline."""
+
+
+backend_pool = BackendPool(OLLAMA_URLS, failure_threshold=BACKEND_FAILURE_THRESHOLD)
+
+# Process-wide client, bound to the event loop that created it.
+_async_client: Optional[httpx.AsyncClient] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+# Closes a lazily created client before its loop closes; aclose() cannot run once the loop is gone
+_async_client_closer: "Optional[asyncio.Task[None]]" = None
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(connect=CONNECT_TIMEOUT, read=READ_TIMEOUT, write=WRITE_TIMEOUT, pool=POOL_TIMEOUT)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+async def open_clients() -> None:
+    """Create the shared async client. Call once at application startup."""
+    global _async_client, _async_client_loop
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(timeout=_timeout(), limits=_limits())
+        _async_client_loop = asyncio.get_running_loop()
+
+
+async def close_clients() -> None:
+    """Close the shared client. Call once at application shutdown."""
+    global _async_client, _async_client_loop, _async_client_closer
+    if _async_client is not None:
+        await _async_client.aclose()
+    if _async_client_closer is not None:
+        _async_client_closer.cancel()
+    _async_client = None
+    _async_client_loop = None
+    _async_client_closer = None
+
+
+async def run_health_checks(interval: float) -> None:
+    """Probe every backend forever; failed backends rejoin the rotation once a probe succeeds."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with _async_client_ctx() as client:
+                await backend_pool.probe_all(client)
+        except Exception:
+            logger.exception("Backend health check failed")
+
+
+async def _close_on_shutdown(client: httpx.AsyncClient) -> None:
+    """Close `client` once this task is cancelled: asyncio.run() cancels leftover tasks before closing its loop."""
+    try:
+        await asyncio.get_running_loop().create_future()
+    finally:
+        await client.aclose()
+
+
+@asynccontextmanager
+async def _async_client_ctx() -> AsyncIterator[httpx.AsyncClient]:
+    """Yield the shared async client.
+
+    The shared client is created lazily when none exists (e.g. standalone Gradio) and is then closed when its
+    loop shuts down. Connections cannot cross event loops, so callers on a different, still-running loop get a
+    short-lived client instead.
+    """
+    global _async_client, _async_client_loop, _async_client_closer
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.is_closed or (
+        _async_client_loop is not None and _async_client_loop.is_closed()
+    ):
+        _async_client = httpx.AsyncClient(timeout=_timeout(), limits=_limits())
+        _async_client_loop = loop
+        _async_client_closer = asyncio.ensure_future(_close_on_shutdown(_async_client))
+
+    if _async_client_loop is loop:
+        yield _async_client
+        return
+
+    async with httpx.AsyncClient(timeout=_timeout()) as client:
+        yield client
+
+
+def observe_cold_start(model: str, data: Dict[str, Any], source: str) -> bool:
+    """Count a cold start when Ollama had to load the model first; returns whether it did."""
+    load = data.get("load_duration")
+    if not isinstance(load, (int, float)) or load / 1e9 < COLD_START_THRESHOLD:
+        return False
+    MODEL_COLD_STARTS.labels(model=model, source=source).inc()
+    MODEL_COLD_START_SECONDS.labels(model=model, source=source).observe(load / 1e9)
+    return True
+
+
+def _observe_timings(model: str, data: Dict[str, Any]) -> None:
+    """Record the timing fields Ollama reports on a finished generation (durations are in nanoseconds)."""
+    if isinstance(data.get("load_duration"), (int, float)):
+        MODEL_LOAD.labels(model=model).observe(data["load_duration"] / 1e9)
+        record("model_load", data["load_duration"] / 1e9)
+        observe_cold_start(model, data, "request")
+    if isinstance(data.get("prompt_eval_duration"), (int, float)):
+        MODEL_PROMPT_EVAL.labels(model=model).observe(data["prompt_eval_duration"] / 1e9)
+        record("prompt_eval", data["prompt_eval_duration"] / 1e9)
+    if isinstance(data.get("prompt_eval_count"), int):
+        MODEL_PROMPT_TOKENS.labels(model=model).inc(data["prompt_eval_count"])
+    eval_count, eval_duration = data.get("eval_count"), data.get("eval_duration")
+    if isinstance(eval_count, int):
+        MODEL_EVAL_TOKENS.labels(model=model).inc(eval_count)
+        if isinstance(eval_duration, (int, float)) and eval_duration > 0:
+            MODEL_TOKENS_PER_SECOND.labels(model=model).observe(eval_count / (eval_duration / 1e9))
+
+
+def _keep_alive(value: Optional[str]) -> Optional[Any]:
+    """How long Ollama keeps the model loaded after a call: a duration ("10m"), or seconds (-1 = forever)."""
+    value = value if value is not None else (KEEP_ALIVE or None)
+    if value is None:
+        return None
+    return int(value) if value.lstrip("-").isdigit() else value
+
+
+def _build_payload(
     prompt: str,
     *,
     model: str,
+    stream: bool,
     temperature: Optional[float] = None,
     top_p: Optional[float] = None,
     num_predict: Optional[int] = None,
-    stream: bool = False,
     extra_options: Optional[Dict[str, Any]] = None,
-) -> str:
-    """Call Ollama's /api/generate and return the 'response' text.
-
-    Raises OllamaError on non-200 or malformed responses.
-    """
+    context: Optional[List[int]] = None,
+    keep_alive: Optional[str] = None,
+    think: Optional[bool] = None,
+) -> Dict[str, Any]:
     payload: Dict[str, Any] = {
         "model": model,
         "prompt": prompt,
         "stream": stream,
     }
+    # Token context returned by an earlier call; the prompt continues from it
+    if context:
+        payload["context"] = context
+    keep_alive = _keep_alive(keep_alive)
+    if keep_alive is not None:
+        payload["keep_alive"] = keep_alive
+    # Reasoning on or off for models that support it; sending it to other models is an error, so unset sends none
+    think = think if think is not None else THINK
+    if think is not None:
+        payload["think"] = think
 
     # Ollama accepts additional options under 'options'
     options: Dict[str, Any] = {}
@@ -37,35 +232,38 @@ async def generate(
         options["top_p"] = top_p
     if num_predict is not None:
         options["num_predict"] = num_predict
-
     if extra_options:
         options.update(extra_options)
-
     if options:
         payload["options"] = options
+    return payload
 
-    try:
-        async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as client:
-            resp = await client.post(OLLAMA_URL, json=payload)
-    except httpx.RequestError as e:
-        raise OllamaError(f"Request to Ollama failed: {e}") from e
 
-    if resp.status_code != 200:
-        raise OllamaError(f"Ollama error {resp.status_code}: {resp.text}")
-
-    try:
-        data = resp.json()
-    except ValueError as e:
-        raise OllamaError(f"Invalid JSON from Ollama: {e}") from e
-
-    response_text = data.get("response")
-    if not isinstance(response_text, str):
-        raise OllamaError("Missing 'response' in Ollama output")
+async def generate(
+    prompt: str,
+    *,
+    model: str,
+    temperature: Optional[float] = None,
+    top_p: Optional[float] = None,
+    num_predict: Optional[int] = None,
+    stream: bool = False,
+    extra_options: Optional[Dict[str, Any]] = None,
+    context: Optional[List[int]] = None,
+    keep_alive: Optional[str] = None,
+    think: Optional[bool] = None,
+) -> str:
+    """Call Ollama's /api/generate and return the 'response' text.
 
-    return response_text
+    Raises OllamaError on non-200 or malformed responses.
+    """
+    data = await generate_raw(
+        prompt, model=model, temperature=temperature, top_p=top_p, num_predict=num_predict,
+        extra_options=extra_options, context=context, keep_alive=keep_alive, think=think,
+    )
+    return data["response"]
 
 
-async def stream_generate(
+async def generate_raw(
     prompt: str,
     *,
     model: str,
@@ -73,46 +271,33 @@ async def stream_generate(
     top_p: Optional[float] = None,
     num_predict: Optional[int] = None,
     extra_options: Optional[Dict[str, Any]] = None,
-) -> AsyncGenerator[str, None]:
-    """Async generator yielding text chunks from Ollama streaming JSONL."""
-    payload: Dict[str, Any] = {
-        "model": model,
-        "prompt": prompt,
-        "stream": True,
-    }
-    options: Dict[str, Any] = {}
-    if temperature is not None:
-        options["temperature"] = temperature
-    if top_p is not None:
-        options["top_p"] = top_p
-    if num_predict is not None:
-        options["num_predict"] = num_predict
-    if extra_options:
-        options.update(extra_options)
-    if options:
-        payload["options"] = options
+    context: Optional[List[int]] = None,
+    keep_alive: Optional[str] = None,
+    think: Optional[bool] = None,
+    stop: Optional[StopCheck] = None,
+) -> Dict[str, Any]:
+    """Like generate(), but return Ollama's whole response object (context, token counts, durations).
 
-    try:
-        async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as client:
-            async with client.stream("POST", OLLAMA_URL, json=payload) as resp:
-                if resp.status_code != 200:
-                    text = await resp.aread()
-                    raise OllamaError(f"Ollama error {resp.status_code}: {text.decode(errors='ignore')}")
-                async for line in resp.aiter_lines():
-                    if not line:
-                        continue
-                    try:
-                        data = json.loads(line)
-                    except json.JSONDecodeError:
-                        continue
-                    chunk = data.get("response")
-                    if isinstance(chunk, str) and chunk:
-                        yield chunk
-    except httpx.RequestError as e:
-        raise OllamaError(f"Request to Ollama failed: {e}") from e
+    The call is streamed and aggregated, so the first-token and idle deadlines apply to it as well. Reasoning
+    is removed as in stream_generate(), and `stop` can end the call early (see _stream_lines).
+    """
+    payload = _build_payload(
+        prompt, model=model, stream=True, temperature=temperature, top_p=top_p,
+        num_predict=num_predict, extra_options=extra_options, context=context, keep_alive=keep_alive, think=think,
+    )
+
+    parts: List[str] = []
+    async for data in _stream_lines(payload, model, stop):
+        chunk = data.get("response")
+        if isinstance(chunk, str):
+            parts.append(chunk)
+        if data.get("done"):
+            _observe_timings(model, data)
+            return {**data, "response": "".join(parts)}
+    raise OllamaError("Ollama stream ended without a final response")
 
 
-def stream_generate_sync(
+async def stream_generate(
     prompt: str,
     *,
     model: str,
@@ -120,36 +305,309 @@ def stream_generate_sync(
     top_p: Optional[float] = None,
     num_predict: Optional[int] = None,
     extra_options: Optional[Dict[str, Any]] = None,
-) -> Generator[str, None, None]:
-    """Synchronous generator for streaming, useful for Gradio sync UI."""
-    payload: Dict[str, Any] = {
-        "model": model,
-        "prompt": prompt,
-        "stream": True,
-    }
-    options: Dict[str, Any] = {}
-    if temperature is not None:
-        options["temperature"] = temperature
-    if top_p is not None:
-        options["top_p"] = top_p
-    if num_predict is not None:
-        options["num_predict"] = num_predict
-    if extra_options:
-        options.update(extra_options)
-    if options:
-        payload["options"] = options
+    context: Optional[List[int]] = None,
+    keep_alive: Optional[str] = None,
+    think: Optional[bool] = None,
+    stop: Optional[StopCheck] = None,
+    on_done: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> AsyncGenerator[str, None]:
+    """Async generator yielding text chunks from Ollama streaming JSONL.
 
-    with httpx.Client(timeout=REQUEST_TIMEOUT) as client:
-        with client.stream("POST", OLLAMA_URL, json=payload) as resp:
-            if resp.status_code != 200:
-                raise OllamaError(f"Ollama error {resp.status_code}: {resp.text}")
-            for line in resp.iter_lines():
-                if not line:
-                    continue
+    With STRIP_THINKING, <think> reasoning blocks are removed (and the separate "thinking" field is never
+    passed on). `on_done` receives the final line (token counts, done_reason); `stop` can end the call early.
+    """
+    payload = _build_payload(
+        prompt, model=model, stream=True, temperature=temperature, top_p=top_p,
+        num_predict=num_predict, extra_options=extra_options, context=context, keep_alive=keep_alive, think=think,
+    )
+
+    async for data in _stream_lines(payload, model, stop):
+        if data.get("done"):
+            _observe_timings(model, data)
+            if on_done is not None:
+                on_done(data)
+        chunk = data.get("response")
+        if isinstance(chunk, str) and chunk:
+            yield chunk
+
+
+class _FirstTokenTimes:
+    """Recent send-to-first-line times per model; the hedge delay is a percentile of them."""
+
+    def __init__(self, size: int = 200) -> None:
+        self.size = size
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def observe(self, model: str, seconds: float) -> None:
+        samples = self._samples.get(model)
+        if samples is None:
+            samples = self._samples[model] = deque(maxlen=self.size)
+        samples.append(seconds)
+
+    def hedge_delay(self, model: str) -> float:
+        samples = self._samples.get(model)
+        if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE / 100.0))
+        return max(HEDGE_MIN_DELAY, ordered[index])
+
+
+first_token_times = _FirstTokenTimes()
+
+
+def _observe_saved(model: str, payload: Dict[str, Any], generated: int, reason: str) -> None:
+    """Count the tokens an unfinished call was still allowed to generate."""
+    budget = (payload.get("options") or {}).get("num_predict")
+    if isinstance(budget, int) and budget > generated:
+        TOKENS_SAVED.labels(model=model, reason=reason).inc(budget - generated)
+
+
+def _observe_cancel(model: str, payload: Dict[str, Any], generated: int, finished: bool) -> None:
+    """Count a call abandoned before Ollama finished it, and the tokens it was still allowed to generate."""
+    if finished:
+        return
+    UPSTREAM_CANCELLED.labels(model=model).inc()
+    _observe_saved(model, payload, generated, "cancelled")
+
+
+def _strip_thinking(data: Dict[str, Any], think: Optional[ThinkFilter], model: str) -> Dict[str, Any]:
+    """One of Ollama's lines with inline reasoning removed by `think`, which carries tags across lines."""
+    raw = data.get("response")
+    raw = raw if isinstance(raw, str) else ""
+    text, reasoning = raw, bool(data.get("thinking"))
+    if think is not None:
+        inside = think.inside
+        text = think.feed(raw) if raw else ""
+        reasoning = reasoning or (bool(raw) and (inside or think.inside))
+        if data.get("done"):
+            text += think.flush()
+    if reasoning:
+        MODEL_REASONING_TOKENS.labels(model=model).inc()
+    return data if text == raw else {**data, "response": text}
+
+
+def _backoff(attempt: int) -> float:
+    """Full jitter: uniform between 0 and the exponential bound, so retrying clients do not move in step."""
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** attempt))
+
+
+async def _stream_lines(
+    payload: Dict[str, Any], model: str, stop: Optional[StopCheck] = None
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """Ollama's JSON lines for one call, hedged if enabled, retried after connection errors only.
+
+    Closing or cancelling the consumer closes the HTTP stream, so Ollama stops generating for it. Reasoning is
+    stripped before `stop` sees the text; when it asks to end at a chunk, the kept part is yielded, then a final
+    line with done_reason "early_stop", and the stream is closed the same way. Time to first token is recorded
+    with reasoning included and excluded (the first text a reader gets).
+    """
+    attempt = 0
+    generated, finished = 0, False
+    think = ThinkFilter() if STRIP_THINKING else None
+    loop = asyncio.get_running_loop()
+    started, answered = loop.time(), False
+    while True:
+        lines = _hedged(payload, model) if HEDGE_REQUESTS else _attempt(backend_pool.pick(), payload, model)
+        try:
+            async for data in lines:
+                if data.get("response") or data.get("thinking"):
+                    generated += 1
+                    if generated == 1:
+                        MODEL_TIME_TO_FIRST_TOKEN.labels(model=model, reasoning="included").observe(
+                            loop.time() - started
+                        )
+                data = _strip_thinking(data, think, model)
+                chunk = data.get("response")
+                if chunk:
+                    if not answered:
+                        answered = True
+                        MODEL_TIME_TO_FIRST_TOKEN.labels(model=model, reasoning="excluded").observe(
+                            loop.time() - started
+                        )
+                    cut = stop(chunk) if stop is not None else None
+                    if cut is not None:
+                        finished = True
+                        EARLY_STOPS.labels(model=model).inc()
+                        _observe_saved(model, payload, generated, "early_stop")
+                        if cut > 0:
+                            yield {**data, "response": chunk[:cut]}
+                        yield {"model": data.get("model", model), "response": "", "done": True,
+                               "done_reason": "early_stop", "eval_count": generated}
+                        return
+                finished = finished or bool(data.get("done"))
+                yield data
+            return
+        except (asyncio.CancelledError, GeneratorExit):
+            _observe_cancel(model, payload, generated, finished)
+            raise
+        except OllamaConnectError as e:
+            # Nothing was sent yet, so another attempt cannot duplicate output
+            if attempt >= RETRY_ATTEMPTS:
+                raise
+            error = e
+        finally:
+            await lines.aclose()
+        delay = _backoff(attempt)
+        attempt += 1
+        UPSTREAM_RETRIES.labels(model=model).inc()
+        logger.warning("Retrying Ollama call in %.2fs (attempt %d): %s", delay, attempt + 1, error)
+        record("retry_backoff", delay, time.perf_counter())
+        await asyncio.sleep(delay)
+
+
+async def _hedged(payload: Dict[str, Any], model: str) -> AsyncGenerator[Dict[str, Any], None]:
+    """Start the call on one backend; with no first line within the hedge delay, start a duplicate on another.
+
+    Whichever produces a line first is streamed through and the other is cancelled, which closes its
+    connection so Ollama stops generating. If one fails, the other can still win.
+    """
+    primary = backend_pool.pick()
+    streams = [_attempt(primary, payload, model)]
+    pending = {asyncio.ensure_future(streams[0].__anext__()): streams[0]}
+    delay: Optional[float] = first_token_times.hedge_delay(model)
+    winner: Optional[AsyncGenerator[Dict[str, Any], None]] = None
+    first: Optional[Dict[str, Any]] = None
+    error: Optional[BaseException] = None
+    try:
+        while pending and winner is None:
+            done, _ = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                exclude = [primary] if len(backend_pool.backends) > 1 else []
+                hedge = _attempt(backend_pool.pick(exclude), payload, model)
+                streams.append(hedge)
+                pending[asyncio.ensure_future(hedge.__anext__())] = hedge
+                UPSTREAM_HEDGES.labels(model=model, result="fired").inc()
+                record("hedge_delay", delay or 0.0, time.perf_counter() - (delay or 0.0))
+                delay = None
+                continue
+            for task in done:
+                stream = pending.pop(task)
                 try:
-                    data = json.loads(line)
-                except json.JSONDecodeError:
+                    first = task.result()
+                except StopAsyncIteration:
+                    first = None
+                except OllamaError as e:
+                    error = e
                     continue
-                chunk = data.get("response")
-                if isinstance(chunk, str) and chunk:
-                    yield chunk
+                winner = stream
+                break
+        if winner is None:
+            assert error is not None
+            raise error
+        if winner is not streams[0]:
+            UPSTREAM_HEDGES.labels(model=model, result="won").inc()
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        pending = {}
+        if first is not None:
+            yield first
+            async for data in winner:
+                yield data
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for stream in streams:
+            await stream.aclose()
+
+
+async def _attempt(backend: Backend, payload: Dict[str, Any], model: str) -> AsyncGenerator[Dict[str, Any], None]:
+    """One streamed call to `backend`, yielding Ollama's JSON lines.
+
+    The first line must arrive within TTFT_TIMEOUT of sending and each later one within IDLE_TIMEOUT of the
+    previous (time spent by the consumer is not counted). A missed deadline counts against the backend.
+    Traced as "connect" (until the response headers), "first_token" (from sending) and "decode" (first line to
+    the end of the stream, including time the consumer takes).
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    sent = time.perf_counter()
+    first_line: Optional[float] = None
+    deadline = started + TTFT_TIMEOUT if TTFT_TIMEOUT > 0 else None
+    kind = "ttft"
+    with backend_pool.lease(backend=backend):
+        try:
+            async with _async_client_ctx() as client:
+                request = client.build_request("POST", backend.generate_url, json=payload)
+                async with asyncio.timeout_at(deadline):
+                    resp = await client.send(request, stream=True)
+                record("connect", time.perf_counter() - sent, sent)
+                try:
+                    if resp.status_code != 200:
+                        text = await resp.aread()
+                        if resp.status_code >= 500:
+                            backend_pool.mark_failure(backend, f"HTTP {resp.status_code}")
+                        raise OllamaError(f"Ollama error {resp.status_code}: {text.decode(errors='ignore')}")
+                    lines = resp.aiter_lines()
+                    while True:
+                        async with asyncio.timeout_at(deadline):
+                            try:
+                                line = await lines.__anext__()
+                            except StopAsyncIteration:
+                                break
+                        if not line:
+                            continue
+                        try:
+                            data = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        if isinstance(data.get("error"), str):
+                            raise OllamaError(f"Ollama error: {data['error']}")
+                        if kind == "ttft":
+                            first_token_times.observe(model, loop.time() - started)
+                            first_line = time.perf_counter()
+                            record("first_token", first_line - sent, sent)
+                            # A stream the consumer abandons (cancel, early stop) still proves the backend works
+                            backend_pool.mark_success(backend)
+                            kind = "idle"
+                        yield data
+                        deadline = loop.time() + IDLE_TIMEOUT if IDLE_TIMEOUT > 0 else None
+                finally:
+                    await resp.aclose()
+                    if first_line is not None:
+                        record("decode", time.perf_counter() - first_line, first_line)
+        except TimeoutError as e:
+            UPSTREAM_DEADLINES.labels(model=model, kind=kind).inc()
+            limit = TTFT_TIMEOUT if kind == "ttft" else IDLE_TIMEOUT
+            backend_pool.mark_failure(backend, f"{kind} deadline of {limit}s exceeded")
+            raise OllamaTimeout(
+                f"No {'first token' if kind == 'ttft' else 'token'} from {backend.base_url} within {limit}s"
+            ) from e
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            if isinstance(e, httpx.ConnectTimeout):
+                UPSTREAM_DEADLINES.labels(model=model, kind="connect").inc()
+            backend_pool.mark_failure(backend, e)
+            raise OllamaConnectError(f"Could not connect to Ollama at {backend.base_url}: {e}") from e
+        except httpx.RequestError as e:
+            backend_pool.mark_failure(backend, e)
+            raise OllamaError(f"Request to Ollama failed: {e}") from e
+
+
+async def load_model(backend: Backend, model: str, keep_alive: Optional[str] = None) -> Dict[str, Any]:
+    """Load `model` on one backend (an empty prompt only loads it) and return Ollama's reply."""
+    payload = _build_payload("", model=model, stream=False, keep_alive=keep_alive)
+    try:
+        async with _async_client_ctx() as client:
+            resp = await client.post(backend.generate_url, json=payload)
+    except httpx.RequestError as e:
+        raise OllamaError(f"Request to Ollama failed: {e}") from e
+    if resp.status_code != 200:
+        raise OllamaError(f"Ollama error {resp.status_code}: {resp.text}")
+    try:
+        return resp.json()
+    except ValueError as e:
+        raise OllamaError(f"Invalid JSON from Ollama: {e}") from e
+
+
+async def running_models(backend: Backend) -> List[str]:
+    """Names of the models currently loaded on one backend (GET /api/ps)."""
+    try:
+        async with _async_client_ctx() as client:
+            resp = await client.get(backend.url("/api/ps"))
+        resp.raise_for_status()
+        models = resp.json().get("models") or []
+    except (httpx.HTTPError, ValueError, AttributeError) as e:
+        raise OllamaError(f"Could not list running models: {e}") from e
+    return [m.get("name") or m.get("model") for m in models if isinstance(m, dict)]
@@ -0,0 +1,138 @@
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config import PROFILE_DIR, PROFILE_INTERVAL
+
+logger = logging.getLogger("legal-assistant.profiler")
+
+
+def _frame_name(name: str) -> str:
+    # The folded format separates frames with ";" and the count with a space
+    return re.sub(r"[\s;]+", "_", name)
+
+
+def _collapse(frame: Any) -> str:
+    """One stack in collapsed ("folded") form, root first: `file:function;file:function`."""
+    names: List[str] = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(_frame_name(f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """Statistical profiler for a sample of requests, switched on and off at runtime.
+
+    While on, each request is picked with probability `rate`. As long as a picked request is in flight, a
+    background thread records the stack of every other thread (the event loop and the export pool) every
+    `interval` seconds via sys._current_frames(). Stopping writes the counts in collapsed-stack format, ready for
+    flamegraph.pl or speedscope, to a file in `directory`. Profiles are per process.
+    """
+
+    def __init__(self, directory: str, interval: float) -> None:
+        self.directory = directory
+        self.interval = max(0.001, interval)
+        self.rate = 0.0
+        self.started_at: Optional[float] = None
+        self.until: Optional[float] = None
+        self.sampled_requests = 0
+        self.last_dump: Optional[str] = None
+        self._active = 0
+        self._samples: "Counter[str]" = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, rate: float, duration: float = 0.0) -> None:
+        """Profile a `rate` fraction of requests, for `duration` seconds (0 = until stop())."""
+        with self._lock:
+            if self.running:
+                raise ValueError("The profiler is already running")
+            self.rate = rate
+            self.started_at = time.time()
+            self.until = time.monotonic() + duration if duration > 0 else None
+            self.sampled_requests = 0
+            self._samples = Counter()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait until the profile is written (to `last_dump`)."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join()
+
+    def enter(self) -> bool:
+        """Called as a request starts; returns whether it is profiled (then leave() must follow)."""
+        if self.rate <= 0 or not self.running or random.random() >= self.rate:
+            return False
+        with self._lock:
+            self._active += 1
+            self.sampled_requests += 1
+        return True
+
+    def leave(self) -> None:
+        with self._lock:
+            self._active -= 1
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if self.until is not None and time.monotonic() >= self.until:
+                break
+            if self._active <= 0:
+                continue
+            names = {t.ident: _frame_name(t.name) for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    self._samples[f"{names.get(ident, ident)};{_collapse(frame)}"] += 1
+        self.rate = 0.0
+        self.last_dump = self._dump()
+        self._thread = None
+
+    def _dump(self) -> Optional[str]:
+        if not self._samples:
+            return None
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.directory, f"profile_{stamp}_{os.getpid()}.folded")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as fh:
+                for stack, count in self._samples.most_common():
+                    fh.write(f"{stack} {count}\n")
+        except OSError:
+            logger.exception("Could not write profile to %s", path)
+            return None
+        logger.info("Wrote %d stack samples to %s", sum(self._samples.values()), path)
+        return path
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "rate": self.rate,
+            "interval": self.interval,
+            "started_at": self.started_at,
+            "sampled_requests": self.sampled_requests,
+            "active_requests": self._active,
+            "samples": sum(self._samples.values()),
+            "last_dump": self.last_dump,
+        }
+
+
+profiler = SamplingProfiler(PROFILE_DIR, PROFILE_INTERVAL)
@@ -0,0 +1,154 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional, Tuple
+
+from .metrics import QUEUE_WAIT
+from .tracing import record
+
+# Priority classes, lower value is served first
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+PRIORITIES: Dict[str, int] = {PRIORITY_INTERACTIVE: 0, PRIORITY_BATCH: 1}
+
+
+class AdmissionError(Exception):
+    """The request was not admitted to the model; clients should retry after `retry_after` seconds."""
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueFullError(AdmissionError):
+    status_code = 429
+
+
+class QueueTimeoutError(AdmissionError):
+    status_code = 503
+
+
+class _ModelQueue:
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.active = 0
+        self.waiters: List[Tuple[int, int, "asyncio.Future[None]"]] = []
+        self.avg_hold = 1.0  # EWMA of seconds a slot is held, for Retry-After estimates
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+
+class Scheduler:
+    """Per-model concurrency cap with a bounded, priority-ordered wait queue.
+
+    Requests beyond the cap wait in priority order (FIFO within a class). A full queue is rejected at once
+    with QueueFullError; a request that waits longer than `queue_timeout` fails with QueueTimeoutError.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+        limits: Optional[Mapping[str, int]] = None,
+    ) -> None:
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.limits = dict(limits or {})
+        self._queues: Dict[str, _ModelQueue] = {}
+        self._seq = itertools.count()
+
+    def _queue(self, model: str) -> _ModelQueue:
+        q = self._queues.get(model)
+        if q is None:
+            q = self._queues[model] = _ModelQueue(max(1, self.limits.get(model, self.concurrency)))
+        return q
+
+    def _retry_after(self, q: _ModelQueue) -> float:
+        return float(max(1, math.ceil((len(q.waiters) + 1) / q.limit * q.avg_hold)))
+
+    async def acquire(self, model: str, priority: str = PRIORITY_BATCH) -> float:
+        """Wait for a slot on `model` and return the seconds spent queued."""
+        q = self._queue(model)
+        if q.active < q.limit and not q.waiters:
+            q.active += 1
+            q.admitted += 1
+            QUEUE_WAIT.labels(model=model, priority=priority).observe(0.0)
+            return 0.0
+        if len(q.waiters) >= self.max_queue:
+            q.rejected += 1
+            raise QueueFullError(f"Model '{model}' is at capacity; queue is full", self._retry_after(q))
+
+        started = time.monotonic()
+        fut: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        entry = (PRIORITIES.get(priority, PRIORITIES[PRIORITY_BATCH]), next(self._seq), fut)
+        heapq.heappush(q.waiters, entry)
+        try:
+            await asyncio.wait({fut}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release(model)
+            else:
+                self._abandon(q, entry)
+            raise
+        if not fut.done():
+            self._abandon(q, entry)
+            q.timed_out += 1
+            raise QueueTimeoutError(
+                f"Timed out after {self.queue_timeout:.0f}s waiting for model '{model}'", self._retry_after(q)
+            )
+        q.admitted += 1
+        waited = time.monotonic() - started
+        QUEUE_WAIT.labels(model=model, priority=priority).observe(waited)
+        return waited
+
+    def release(self, model: str, held: Optional[float] = None) -> None:
+        q = self._queue(model)
+        q.active -= 1
+        if held is not None:
+            q.avg_hold = 0.8 * q.avg_hold + 0.2 * held
+        while q.waiters and q.active < q.limit:
+            _, _, fut = heapq.heappop(q.waiters)
+            if fut.done():
+                continue
+            q.active += 1
+            fut.set_result(None)
+
+    def _abandon(self, q: _ModelQueue, entry: Tuple[int, int, "asyncio.Future[None]"]) -> None:
+        entry[2].cancel()
+        try:
+            q.waiters.remove(entry)
+            heapq.heapify(q.waiters)
+        except ValueError:
+            pass
+
+    @asynccontextmanager
+    async def slot(self, model: str, priority: str = PRIORITY_BATCH) -> AsyncIterator[float]:
+        """Hold a model slot for the duration of the block; yields the queue wait in seconds."""
+        waited = await self.acquire(model, priority)
+        record("queue", waited, time.perf_counter() - waited)
+        started = time.monotonic()
+        try:
+            yield waited
+        finally:
+            self.release(model, time.monotonic() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            model: {
+                "limit": q.limit,
+                "active": q.active,
+                "queued": len(q.waiters),
+                "admitted": q.admitted,
+                "rejected": q.rejected,
+                "timed_out": q.timed_out,
+            }
+            for model, q in self._queues.items()
+        }
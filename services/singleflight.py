@@ -0,0 +1,134 @@
+import asyncio
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers with the same key share its result.
+
+    The shared call is cancelled only once every waiter has gone away.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], "asyncio.Task[Any]"] = {}
+        self._waiters: Dict["asyncio.Task[Any]", int] = {}
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        # Futures cannot be awaited across event loops, so flights are scoped per loop
+        slot = (asyncio.get_running_loop(), key)
+        task = self._inflight.get(slot)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[slot] = task
+            task.add_done_callback(lambda t: self._forget(slot, t))
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            remaining = self._waiters.get(task, 1) - 1
+            if remaining > 0:
+                self._waiters[task] = remaining
+            else:
+                self._waiters.pop(task, None)
+                if not task.done():
+                    task.cancel()
+                    self._forget(slot, task)
+
+    def _forget(self, slot: Tuple[asyncio.AbstractEventLoop, Hashable], task: "asyncio.Task[Any]") -> None:
+        if self._inflight.get(slot) is task:
+            del self._inflight[slot]
+
+
+class _Broadcast:
+    """Chunks produced so far by one upstream stream, replayable by any number of subscribers."""
+
+    def __init__(self) -> None:
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional["asyncio.Task[None]"] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def publish(self, chunk: str) -> None:
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.error = error
+        self.done = True
+        self._notify()
+
+    async def subscribe(self) -> AsyncGenerator[str, None]:
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+class StreamSingleFlight:
+    """Share one upstream text stream among concurrent subscribers with the same key.
+
+    A subscriber that joins late first receives everything generated so far, then the live tail.
+    The upstream stream is cancelled once its last subscriber disconnects.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], _Broadcast] = {}
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    async def stream(self, key: Hashable, factory: Callable[[], AsyncIterator[str]]) -> AsyncGenerator[str, None]:
+        slot = (asyncio.get_running_loop(), key)
+        broadcast = self._inflight.get(slot)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            self._inflight[slot] = broadcast
+            broadcast.task = asyncio.ensure_future(self._pump(slot, broadcast, factory))
+
+        broadcast.subscribers += 1
+        try:
+            async for chunk in broadcast.subscribe():
+                yield chunk
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.done and broadcast.task is not None:
+                broadcast.task.cancel()
+                self._forget(slot, broadcast)
+
+    async def _pump(
+        self,
+        slot: Tuple[asyncio.AbstractEventLoop, Hashable],
+        broadcast: _Broadcast,
+        factory: Callable[[], AsyncIterator[str]],
+    ) -> None:
+        try:
+            async for chunk in factory():
+                broadcast.publish(chunk)
+        except asyncio.CancelledError:
+            broadcast.finish(asyncio.CancelledError())
+            raise
+        except Exception as e:
+            broadcast.finish(e)
+        else:
+            broadcast.finish()
+        finally:
+            self._forget(slot, broadcast)
+
+    def _forget(self, slot: Tuple[asyncio.AbstractEventLoop, Hashable], broadcast: _Broadcast) -> None:
+        if self._inflight.get(slot) is broadcast:
+            del self._inflight[slot]
@@ -0,0 +1,206 @@
+import asyncio
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, List, Optional
+
+
+class StreamAbandoned(Exception):
+    """The consumer went away; the source stream was closed."""
+
+
+async def _close_source(source: AsyncIterator[str], pending: Optional["asyncio.Future[str]"]) -> None:
+    """Cancel an outstanding read of `source` and close it.
+
+    The read is awaited first: a generator left to the garbage collector while that read still unwinds is closed
+    while it is running, which fails and can skip closing its upstream connection. The caller is usually being
+    cancelled itself (the client went away), so the close runs shielded: a second cancellation would interrupt
+    it halfway and leave the upstream connection generating.
+    """
+    async def close() -> None:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        if hasattr(source, "aclose"):
+            await source.aclose()
+
+    await asyncio.shield(close())
+
+
+async def coalesce(
+    chunks: AsyncIterator[str],
+    max_bytes: int = 0,
+    max_interval: float = 0.0,
+) -> AsyncGenerator[str, None]:
+    """Group small text chunks into fewer, larger writes.
+
+    A batch is flushed once it holds `max_bytes` UTF-8 bytes or `max_interval` seconds after the previous flush,
+    whichever comes first; the interval fires even while the source is idle. A zero disables that trigger, and
+    with both disabled every chunk passes straight through.
+    """
+    if max_bytes <= 0 and max_interval <= 0:
+        async for chunk in chunks:
+            yield chunk
+        return
+
+    loop = asyncio.get_running_loop()
+    source = chunks.__aiter__()
+    buf: List[str] = []
+    size = 0
+    last_flush = loop.time()
+    pending: Optional["asyncio.Future[str]"] = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(source.__anext__())
+            timeout = None
+            if max_interval > 0 and buf:
+                timeout = max(0.0, last_flush + max_interval - loop.time())
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                yield "".join(buf)
+                buf, size, last_flush = [], 0, loop.time()
+                continue
+            fut, pending = pending, None
+            try:
+                chunk = fut.result()
+            except StopAsyncIteration:
+                break
+            buf.append(chunk)
+            size += len(chunk.encode("utf-8"))
+            if (max_bytes > 0 and size >= max_bytes) or (
+                max_interval > 0 and loop.time() - last_flush >= max_interval
+            ):
+                yield "".join(buf)
+                buf, size, last_flush = [], 0, loop.time()
+        if buf:
+            yield "".join(buf)
+    finally:
+        await _close_source(source, pending)
+
+
+async def stop_on(chunks: AsyncIterator[str], stop: Awaitable[Any]) -> AsyncGenerator[str, None]:
+    """Pass chunks through until `stop` completes (e.g. the client disconnected), then raise StreamAbandoned.
+
+    The source is cancelled at once, even while it is waiting for its next chunk, so the upstream call and its
+    scheduler slot are released without waiting for another write to fail.
+    """
+    source = chunks.__aiter__()
+    stopper = asyncio.ensure_future(stop)
+    pending: Optional["asyncio.Future[str]"] = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(source.__anext__())
+            await asyncio.wait({pending, stopper}, return_when=asyncio.FIRST_COMPLETED)
+            if not pending.done():
+                raise StreamAbandoned("Client disconnected")
+            fut, pending = pending, None
+            try:
+                chunk = fut.result()
+            except StopAsyncIteration:
+                return
+            yield chunk
+    finally:
+        stopper.cancel()
+        await _close_source(source, pending)
+
+
+async def close_when_abandoned(
+    chunks: AsyncIterator[str],
+    timeout: float,
+    on_abandon: Optional[Callable[[], None]] = None,
+) -> AsyncGenerator[str, None]:
+    """Pass chunks through, closing the source once the consumer has not asked for the next one for `timeout` s.
+
+    For consumers that stop iterating without closing the generator: Gradio leaves the handler suspended when
+    the browser tab closes. Closing the source cancels the upstream call it was reading. 0 disables.
+    """
+    loop = asyncio.get_running_loop()
+    source = chunks.__aiter__()
+    closing: List["asyncio.Future[None]"] = []
+
+    def _abandon() -> None:
+        if on_abandon is not None:
+            on_abandon()
+        if hasattr(source, "aclose"):
+            closing.append(asyncio.ensure_future(source.aclose()))
+
+    try:
+        async for chunk in source:
+            handle = loop.call_later(timeout, _abandon) if timeout > 0 else None
+            try:
+                yield chunk
+            finally:
+                if handle is not None:
+                    handle.cancel()
+            if closing:
+                return
+    finally:
+        if closing:
+            await asyncio.gather(*closing, return_exceptions=True)
+        elif hasattr(source, "aclose"):
+            await source.aclose()
+
+
+def sse_event(data: str, event: Optional[str] = None, event_id: Optional[str] = None) -> str:
+    """Format one Server-Sent Event; multi-line data becomes several `data:` fields."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    for line in data.split("\n"):
+        lines.append(f"data: {line}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _partial_tag(text: str, tag: str) -> int:
+    """Length of the longest end of `text` that could be the start of `tag`."""
+    for size in range(min(len(text), len(tag) - 1), 0, -1):
+        if text.endswith(tag[:size]):
+            return size
+    return 0
+
+
+class ThinkFilter:
+    """Removes <think>...</think> reasoning blocks from streamed text, chunk by chunk.
+
+    A chunk ending in what may be the start of a tag ("<thi") is held back until the next chunk settles it, so
+    tags split across chunks are still found. Whitespace right after a closing tag is dropped too. Call
+    flush() at the end of the stream for any held-back text.
+    """
+
+    OPEN, CLOSE = "<think>", "</think>"
+
+    def __init__(self) -> None:
+        self.inside = False
+        self._pending = ""
+        self._trim = False
+
+    def feed(self, chunk: str) -> str:
+        text, self._pending = self._pending + chunk, ""
+        out: List[str] = []
+        while text:
+            tag = self.CLOSE if self.inside else self.OPEN
+            index = text.find(tag)
+            if index < 0:
+                keep = _partial_tag(text, tag)
+                if not self.inside:
+                    out.append(self._visible(text[:len(text) - keep]))
+                self._pending = text[len(text) - keep:]
+                break
+            if not self.inside:
+                out.append(self._visible(text[:index]))
+            text = text[index + len(tag):]
+            self.inside = not self.inside
+            self._trim = self._trim or not self.inside
+        return "".join(out)
+
+    def flush(self) -> str:
+        text, self._pending = ("" if self.inside else self._pending), ""
+        return self._visible(text)
+
+    def _visible(self, text: str) -> str:
+        # Trimmed where it is emitted, so the result does not depend on where chunks split
+        if self._trim and text:
+            text = text.lstrip()
+            self._trim = not text
+        return text
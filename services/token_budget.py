@@ -0,0 +1,73 @@
+import math
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from config import (
+    TOKEN_BUDGET_WINDOW,
+    TOKEN_BUDGET_MIN_SAMPLES,
+    TOKEN_BUDGET_PERCENTILE,
+    TOKEN_BUDGET_HEADROOM,
+    TOKEN_BUDGET_MIN,
+    TOKEN_BUDGET_MAX,
+)
+from .metrics import TOKEN_BUDGET
+
+
+class TokenBudgets:
+    """num_predict per (doc_type, model), learned from the lengths of recent documents.
+
+    The budget is a percentile of recent lengths times `headroom`, kept within [floor, ceiling]. A document cut
+    off at its budget only shows that it needed more, so it is recorded at twice its length; that lets a budget
+    that is too small grow again. There is no budget until `min_samples` documents were seen.
+    """
+
+    def __init__(
+        self,
+        window: int,
+        min_samples: int,
+        percentile: float,
+        headroom: float,
+        floor: int,
+        ceiling: int,
+    ) -> None:
+        self.window = max(1, window)
+        self.min_samples = max(1, min_samples)
+        self.percentile = percentile
+        self.headroom = headroom
+        self.floor = floor
+        self.ceiling = ceiling
+        self._lengths: Dict[Tuple[str, str], Deque[int]] = {}
+        self._budgets: Dict[Tuple[str, str], int] = {}
+
+    def observe(self, doc_type: str, model: str, tokens: int, truncated: bool = False) -> None:
+        key = (doc_type, model)
+        lengths = self._lengths.get(key)
+        if lengths is None:
+            lengths = self._lengths[key] = deque(maxlen=self.window)
+        lengths.append(tokens * 2 if truncated else tokens)
+        if len(lengths) < self.min_samples:
+            return
+        ordered = sorted(lengths)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100.0))
+        budget = min(self.ceiling, max(self.floor, math.ceil(ordered[index] * self.headroom)))
+        self._budgets[key] = budget
+        TOKEN_BUDGET.labels(doc_type=doc_type, model=model).set(budget)
+
+    def budget(self, doc_type: str, model: str) -> Optional[int]:
+        return self._budgets.get((doc_type, model))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            f"{doc_type}/{model}": {"budget": self._budgets.get((doc_type, model)), "samples": len(lengths)}
+            for (doc_type, model), lengths in self._lengths.items()
+        }
+
+
+token_budgets = TokenBudgets(
+    TOKEN_BUDGET_WINDOW,
+    min_samples=TOKEN_BUDGET_MIN_SAMPLES,
+    percentile=TOKEN_BUDGET_PERCENTILE,
+    headroom=TOKEN_BUDGET_HEADROOM,
+    floor=TOKEN_BUDGET_MIN,
+    ceiling=TOKEN_BUDGET_MAX,
+)
@@ -0,0 +1,120 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+from config import SERVER_TIMING
+from .profiler import profiler
+
+# Spans kept per trace; a task that outlives its request cannot grow the trace without bound
+MAX_SPANS = 512
+
+
+class Span(NamedTuple):
+    name: str
+    start: Optional[float]  # seconds after the trace started; None for durations reported by Ollama
+    duration: float
+
+
+class Trace:
+    """The spans of one request: where its time went (prompt, queue, connect, first token, decode, export...).
+
+    Tasks started while handling the request copy its context, so spans recorded in them land here too. Spans of
+    concurrent work (parallel sections, hedged calls) overlap, and their totals can exceed the wall time.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.spans: List[Span] = []
+
+    def add(self, name: str, duration: float, start: Optional[float] = None) -> None:
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append(Span(name, start, max(0.0, duration)))
+
+    def totals(self) -> Dict[str, float]:
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration
+        return totals
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: the total per span name so far, then the time to this header."""
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.totals().items()]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+    def breakdown(self) -> Dict[str, Any]:
+        """JSON timing breakdown for clients that ask for it; all values in milliseconds."""
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "spans": [
+                {
+                    "name": span.name,
+                    "start_ms": None if span.start is None else round(span.start * 1000, 3),
+                    "duration_ms": round(span.duration * 1000, 3),
+                }
+                for span in self.spans
+            ],
+            "totals_ms": {name: round(seconds * 1000, 3) for name, seconds in self.totals().items()},
+        }
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the block as span `name` of the current request; does nothing outside a request."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, time.perf_counter() - started, started - trace.started)
+
+
+def record(name: str, duration: float, started: Optional[float] = None) -> None:
+    """Add a span measured elsewhere; `started` is its perf_counter() start, if known."""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, duration, None if started is None else started - trace.started)
+
+
+class TracingMiddleware:
+    """ASGI middleware: a Trace per HTTP request, reported in a Server-Timing response header.
+
+    The header is sent with the response head, so a stream reports the spans up to its first chunk; the rest
+    is in the opt-in JSON breakdown. Requests picked by the sampling profiler are profiled while they run.
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trace = Trace()
+        token = _current.set(trace)
+
+        async def send_with_timing(message: Dict[str, Any]) -> None:
+            if SERVER_TIMING and message["type"] == "http.response.start":
+                header = (b"server-timing", trace.server_timing().encode())
+                message = {**message, "headers": [*message.get("headers", []), header]}
+            await send(message)
+
+        # Admin calls are not what a profile is for
+        sampled = not scope["path"].startswith("/admin/") and profiler.enter()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if sampled:
+                profiler.leave()
+            _current.reset(token)
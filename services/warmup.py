@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from config import KEEP_ALIVE, WARMUP_MODELS
+from .backends import Backend
+from .metrics import MODEL_RESIDENT
+from .ollama_client import OllamaError, backend_pool, load_model, observe_cold_start, running_models
+
+logger = logging.getLogger("legal-assistant.warmup")
+
+
+def _model_name(name: str) -> str:
+    """Ollama lists a model requested as "deepseek-r1" as "deepseek-r1:latest"."""
+    return name[: -len(":latest")] if name.endswith(":latest") else name
+
+
+class ModelWarmer:
+    """Loads the configured models on every healthy backend and keeps them resident.
+
+    Each check lists the loaded models via /api/ps. A missing model is loaded (a warm-up cold start) and a
+    resident one gets an empty keep_alive call, which restarts Ollama's unload timer. Models are loaded one at
+    a time per backend so they do not compete for GPU memory.
+    """
+
+    def __init__(self, models: List[str], keep_alive: Optional[str] = None) -> None:
+        self.models = models
+        self.keep_alive = keep_alive or None
+        self.warm = False  # every model was resident on every healthy backend after the last check
+        self.loads = 0
+        self.pings = 0
+        self._resident: Dict[str, Set[str]] = {}
+        self._checked_at: Dict[str, float] = {}
+
+    async def _check_backend(self, backend: Backend) -> bool:
+        resident = {_model_name(m) for m in await running_models(backend)}
+        complete = True
+        for model in self.models:
+            was_resident = _model_name(model) in resident
+            try:
+                data = await load_model(backend, model, self.keep_alive)
+            except OllamaError as e:
+                logger.warning("Could not load %s on %s: %s", model, backend.base_url, e)
+                MODEL_RESIDENT.labels(backend=backend.base_url, model=model).set(0)
+                complete = False
+                continue
+            if was_resident:
+                self.pings += 1
+            else:
+                self.loads += 1
+                observe_cold_start(model, data, "warmup")
+                logger.info("Loaded %s on %s in %.2fs", model, backend.base_url,
+                            (data.get("load_duration") or 0) / 1e9)
+            resident.add(_model_name(model))
+            MODEL_RESIDENT.labels(backend=backend.base_url, model=model).set(1)
+        self._resident[backend.base_url] = resident
+        self._checked_at[backend.base_url] = time.time()
+        return complete
+
+    async def check(self) -> bool:
+        """Load or ping every model on every healthy backend; returns whether all of them are resident."""
+        backends = [b for b in backend_pool.backends if b.healthy]
+        results = await asyncio.gather(*(self._check_backend(b) for b in backends), return_exceptions=True)
+        warm = bool(backends)
+        for backend, result in zip(backends, results):
+            if isinstance(result, Exception):
+                logger.warning("Residency check on %s failed: %s", backend.base_url, result)
+            warm = warm and result is True
+        self.warm = warm
+        return warm
+
+    async def run(self, interval: float, warm_up: bool = True) -> None:
+        """Warm up at once (unless `warm_up` is false), then re-check every `interval` seconds (0 = never)."""
+        if not self.models:
+            return
+        if not warm_up:
+            if interval <= 0:
+                return
+            await asyncio.sleep(interval)
+        while True:
+            try:
+                await self.check()
+            except Exception:
+                logger.exception("Model warm-up failed")
+            if interval <= 0:
+                return
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "models": self.models,
+            "keep_alive": self.keep_alive,
+            "warm": self.warm,
+            "loads": self.loads,
+            "pings": self.pings,
+            "resident": {url: sorted(models) for url, models in self._resident.items()},
+            "checked_at": dict(self._checked_at),
+        }
+
+
+model_warmer = ModelWarmer(WARMUP_MODELS, keep_alive=KEEP_ALIVE)
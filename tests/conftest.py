@@ -0,0 +1,61 @@
+"""Fixtures that run the mock Ollama server and the app in subprocesses, like the benchmark harness does."""
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import pytest
+
+from bench.run_bench import free_port, server_process
+
+
+@pytest.fixture(scope="module")
+def mock_ollama() -> Iterator[str]:
+    """Base URL of a `bench.mock_ollama` whose documents are long and slow enough to interrupt."""
+    port = free_port()
+    with server_process([
+        sys.executable, "-m", "bench.mock_ollama", "--port", str(port),
+        "--ttft", "0.05", "--tokens-per-sec", "50", "--tokens", "5000", "--jitter", "0",
+    ], f"http://127.0.0.1:{port}/api/tags", timeout=60):
+        yield f"http://127.0.0.1:{port}"
+
+
+@contextmanager
+def _app_server(ollama_urls: str, store_path: str, env: Optional[Dict[str, str]] = None) -> Iterator[str]:
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = {
+        "OLLAMA_URL": ollama_urls.split(",")[0],
+        "OLLAMA_URLS": ollama_urls,
+        "ENABLE_UI": "false",
+        "WARMUP_ON_STARTUP": "false",
+        "DOCUMENT_STORE_PATH": store_path,
+        **(env or {}),
+    }
+    with server_process([
+        sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+        "--log-level", "warning",
+    ], f"{base}/health", env, timeout=60):
+        yield base
+
+
+@pytest.fixture(scope="module")
+def app_server() -> Callable[..., Any]:
+    """app_server(ollama_urls, store_path, env=None): a context manager running the app (API only) against
+    comma-separated Ollama generate URLs, yielding its base URL."""
+    return _app_server
+
+
+def _wait_for(check: Callable[[], Any], timeout: float = 10.0) -> Any:
+    deadline = time.monotonic() + timeout
+    while True:
+        value = check()
+        if value or time.monotonic() >= deadline:
+            return value
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def wait_for() -> Callable[..., Any]:
+    """wait_for(check, timeout=10): poll `check` until it returns something truthy; returns its last result."""
+    return _wait_for
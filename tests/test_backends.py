@@ -0,0 +1,80 @@
+"""Routing across two Ollama backends: least in flight, failover when one goes down, and its return."""
+import sys
+from contextlib import ExitStack, contextmanager
+from typing import Iterator
+
+import httpx
+import pytest
+
+from bench.run_bench import free_port, server_process
+
+
+@contextmanager
+def _mock(port: int) -> Iterator[str]:
+    # ~2s per document: long enough to hold two streams open, short enough to run several in a row
+    with server_process([
+        sys.executable, "-m", "bench.mock_ollama", "--port", str(port),
+        "--ttft", "0.05", "--tokens-per-sec", "20", "--tokens", "40", "--jitter", "0",
+    ], f"http://127.0.0.1:{port}/api/tags", timeout=60):
+        yield f"http://127.0.0.1:{port}"
+
+
+@pytest.fixture(scope="module")
+def servers(app_server, tmp_path_factory):
+    ports = [free_port(), free_port()]
+    store = str(tmp_path_factory.mktemp("store") / "documents.db")
+    with ExitStack() as stack:
+        # The second mock gets its own stack so a test can stop it
+        second = ExitStack()
+        stack.push(second)
+        mocks = [stack.enter_context(_mock(ports[0])), second.enter_context(_mock(ports[1]))]
+        urls = ",".join(f"{m}/api/generate" for m in mocks)
+        base = stack.enter_context(app_server(urls, store, {"BACKEND_HEALTH_INTERVAL": "0.5"}))
+        yield base, mocks, ports, second
+
+
+def _in_flight(mock: str) -> int:
+    return httpx.get(f"{mock}/stats").json()["in_flight"]
+
+
+def _backends(base: str) -> list:
+    return httpx.get(f"{base}/health").json()["backends"]
+
+
+def _payload(n: int) -> dict:
+    return {"doc_type": "nda", "party1": f"Routing Test {n}", "party2": "Counterparty", "bypass_cache": True}
+
+
+def _assert_spread(base: str, mocks: list) -> None:
+    """Two concurrent streams land on different backends."""
+    with httpx.Client(base_url=base, timeout=30) as client, ExitStack() as stack:
+        for n in range(2):
+            r = stack.enter_context(client.stream("POST", "/legal/stream", json=_payload(n)))
+            assert r.status_code == 200
+            # Keep the iterator open so the stream stays in flight
+            chunks = r.iter_text()
+            assert next(text for text in chunks if text)
+            stack.callback(chunks.close)
+        assert [_in_flight(m) for m in mocks] == [1, 1]
+
+
+def test_least_in_flight_routing(servers):
+    base, mocks, _, _ = servers
+    _assert_spread(base, mocks)
+
+
+def test_failover_and_recovery(servers, wait_for):
+    base, mocks, ports, second = servers
+    second.close()
+
+    with httpx.Client(base_url=base, timeout=30) as client:
+        for n in range(3):
+            r = client.post("/legal/", json=_payload(10 + n))
+            assert r.status_code == 200, r.text
+            assert r.json()["response"]
+    assert wait_for(lambda: [b["healthy"] for b in _backends(base)] == [True, False])
+
+    with _mock(ports[1]):
+        assert wait_for(lambda: all(b["healthy"] for b in _backends(base)))
+        _assert_spread(base, mocks)
+        assert [b["consecutive_failures"] for b in _backends(base)] == [0, 0]
@@ -0,0 +1,73 @@
+import asyncio
+
+from services import cache, legal_generator
+from services.cache import LRUTTLCache
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_least_recently_used_entry_is_evicted():
+    c: LRUTTLCache[str] = LRUTTLCache(2, 60)
+    c.set("a", "A")
+    c.set("b", "B")
+    assert c.get("a") == "A"
+    c.set("c", "C")
+    assert c.get("b") is None
+    assert (c.get("a"), c.get("c")) == ("A", "C")
+    assert c.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    c: LRUTTLCache[str] = LRUTTLCache(4, 10)
+    c.set("a", "A")
+    clock.now += 9.9
+    assert c.get("a") == "A"
+    clock.now += 0.1
+    assert c.get("a") is None
+    assert len(c) == 0
+    assert c.stats()["expirations"] == 1
+
+
+def test_zero_size_or_ttl_disables_the_cache():
+    for c in (LRUTTLCache(0, 60), LRUTTLCache(4, 0)):
+        c.set("a", "A")
+        assert c.get("a") is None
+        assert len(c) == 0
+
+
+def test_cache_key_covers_prompt_model_and_options():
+    key = legal_generator._cache_key("prompt", "m", {"temperature": 0.7, "top_p": 0.9})
+    assert key == legal_generator._cache_key("prompt", "m", {"top_p": 0.9, "temperature": 0.7})
+    assert key != legal_generator._cache_key("prompt!", "m", {"temperature": 0.7, "top_p": 0.9})
+    assert key != legal_generator._cache_key("prompt", "m2", {"temperature": 0.7, "top_p": 0.9})
+    assert key != legal_generator._cache_key("prompt", "m", {"temperature": 0.2, "top_p": 0.9})
+
+
+def test_repeated_document_is_served_from_the_cache(monkeypatch):
+    calls = []
+
+    async def fake_generate_raw(prompt, **kwargs):
+        calls.append(prompt)
+        return {"response": "Agreement text", "eval_count": 3, "done_reason": "stop"}
+
+    monkeypatch.setattr(legal_generator, "generate_raw", fake_generate_raw)
+    monkeypatch.setattr(legal_generator, "response_cache", LRUTTLCache(4, 60))
+    monkeypatch.setattr(legal_generator, "PROMPT_CONTEXT_REUSE", False)
+    request = {"doc_type": "nda", "party1": "Cache A", "party2": "Cache B", "skeleton": False}
+
+    async def run():
+        first = await legal_generator.generate_legal_document(**request)
+        second = await legal_generator.generate_legal_document(**request)
+        third = await legal_generator.generate_legal_document(**request, use_cache=False)
+        return first, second, third
+
+    assert asyncio.run(run()) == ("Agreement text",) * 3
+    assert len(calls) == 2
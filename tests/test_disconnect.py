@@ -0,0 +1,37 @@
+"""A client that hangs up mid-stream must cancel the upstream call and free its model slot."""
+import httpx
+import pytest
+
+from bench.run_bench import cancellation_counters
+
+
+@pytest.fixture(scope="module")
+def servers(mock_ollama, app_server, tmp_path_factory):
+    store = str(tmp_path_factory.mktemp("store") / "documents.db")
+    with app_server(f"{mock_ollama}/api/generate", store) as base:
+        yield base, mock_ollama
+
+
+def test_disconnect_cancels_upstream_and_frees_slot(servers, wait_for):
+    base, mock = servers
+    before = cancellation_counters(base)
+    payload = {"doc_type": "nda", "party1": "Disconnect Test A", "party2": "Disconnect Test B", "bypass_cache": True}
+
+    with httpx.Client(base_url=base, timeout=30) as client:
+        with client.stream("POST", "/legal/stream", json=payload) as r:
+            assert r.status_code == 200
+            # Keep the iterator: leaving a for loop over it would close the connection right away
+            chunks = r.iter_text()
+            assert next(text for text in chunks if text)
+            assert httpx.get(f"{mock}/stats").json()["in_flight"] == 1
+            assert cancellation_counters(base)["active_slots"] == 1
+
+    assert wait_for(lambda: httpx.get(f"{mock}/stats").json()["in_flight"] == 0)
+
+    def cancelled():
+        counters = cancellation_counters(base)
+        return counters if counters["streams_cancelled"] > before["streams_cancelled"] else None
+
+    after = wait_for(cancelled)
+    assert after, "legal_streams_cancelled_total did not increase"
+    assert after["active_slots"] == 0
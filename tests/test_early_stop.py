@@ -0,0 +1,46 @@
+from services.legal_generator import IMPORTANT_NOTICE, NoticeStop
+
+
+def _stop_at(chunks):
+    """Feed chunks to a NoticeStop; the text up to where it stops, or None if it never does."""
+    stop = NoticeStop()
+    text = ""
+    for chunk in chunks:
+        cut = stop(chunk)
+        if cut is not None:
+            return text + chunk[:cut]
+        text += chunk
+    return None
+
+
+def test_stops_after_the_closing_notice():
+    body = "Residential Rental Agreement\n\n1. Premises\nThe premises are let as is.\n\n"
+    assert _stop_at([body, IMPORTANT_NOTICE, "\n\nLet me know if you need changes."]) == body + IMPORTANT_NOTICE
+
+
+def test_stops_after_a_formatted_notice_split_over_lines_and_chunks():
+    notice = "**Important Notice:**\nThis document is AI-generated and must be reviewed by a qualified attorney.\n"
+    text = "1. Governing Law\nThis agreement is governed by the laws of Ohio.\n\n" + notice + "Anything else?\n"
+    chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+    assert _stop_at(chunks) == text[: text.index(notice) + len(notice) - 1]
+
+
+def test_body_mention_of_an_important_notice_does_not_stop():
+    body = (
+        "Important Notice to Tenant\n"
+        "In case of any important notice to the tenant, contact the landlord's attorney.\n"
+        "Notices must be sent in writing; the Tenant may consult counsel or a lawyer.\n\n"
+        "9. Default\nIf the Tenant fails to pay rent, the Landlord may terminate this agreement.\n"
+    )
+    assert _stop_at([body[i:i + 5] for i in range(0, len(body), 5)]) is None
+
+
+def test_notice_as_a_leading_disclaimer_does_not_stop():
+    text = (
+        "Mutual Non-Disclosure Agreement\n\n"
+        f"**{IMPORTANT_NOTICE}**\n\n"
+        "1. Definitions\nConfidential Information means any non-public information.\n\n"
+        f"{IMPORTANT_NOTICE}\n\nAnything else?\n"
+    )
+    end = text.rindex(IMPORTANT_NOTICE) + len(IMPORTANT_NOTICE)
+    assert _stop_at([text[i:i + 9] for i in range(0, len(text), 9)]) == text[:end]
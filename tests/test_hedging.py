@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from services import ollama_client
+from services.backends import BackendPool
+from services.ollama_client import OllamaConnectError, OllamaTimeout
+
+
+def _lines(text):
+    return [{"response": text}, {"response": "", "done": True, "done_reason": "stop"}]
+
+
+@pytest.fixture
+def attempts(monkeypatch):
+    """Replace each upstream call with the next scripted (delay, error, text); records what ran and was cancelled."""
+    log = {"backends": [], "cancelled": [], "script": []}
+
+    async def fake_attempt(backend, payload, model):
+        n = len(log["backends"])
+        log["backends"].append(backend.base_url)
+        delay, error, text = log["script"][n]
+        try:
+            await asyncio.sleep(delay)
+            if error is not None:
+                raise error
+            for line in _lines(text):
+                yield line
+        except asyncio.CancelledError:
+            log["cancelled"].append(n)
+            raise
+
+    monkeypatch.setattr(ollama_client, "_attempt", fake_attempt)
+    monkeypatch.setattr(ollama_client, "backend_pool", BackendPool(["http://a:11434", "http://b:11434"]))
+    monkeypatch.setattr(ollama_client, "_backoff", lambda attempt: 0.0)
+    return log
+
+
+def _generate(**kwargs):
+    return asyncio.run(ollama_client.generate_raw("prompt", model="hedge-test", **kwargs))["response"]
+
+
+def test_hedge_fires_on_another_backend_and_cancels_the_loser(monkeypatch, attempts):
+    monkeypatch.setattr(ollama_client, "HEDGE_REQUESTS", True)
+    monkeypatch.setattr(ollama_client.first_token_times, "hedge_delay", lambda model: 0.05)
+    attempts["script"] = [(5.0, None, "slow"), (0.0, None, "fast")]
+
+    assert _generate() == "fast"
+    assert len(set(attempts["backends"])) == 2
+    assert attempts["cancelled"] == [0]
+
+
+def test_no_hedge_when_the_first_line_arrives_in_time(monkeypatch, attempts):
+    monkeypatch.setattr(ollama_client, "HEDGE_REQUESTS", True)
+    monkeypatch.setattr(ollama_client.first_token_times, "hedge_delay", lambda model: 1.0)
+    attempts["script"] = [(0.0, None, "primary")]
+
+    assert _generate() == "primary"
+    assert len(attempts["backends"]) == 1
+
+
+def test_hedge_delay_is_a_percentile_of_recent_first_token_times(monkeypatch):
+    monkeypatch.setattr(ollama_client, "HEDGE_MIN_SAMPLES", 10)
+    monkeypatch.setattr(ollama_client, "HEDGE_PERCENTILE", 90)
+    monkeypatch.setattr(ollama_client, "HEDGE_DEFAULT_DELAY", 2.0)
+    monkeypatch.setattr(ollama_client, "HEDGE_MIN_DELAY", 0.2)
+    times = ollama_client._FirstTokenTimes()
+    for i in range(9):
+        times.observe("m", 0.5 + i * 0.1)
+    assert times.hedge_delay("m") == 2.0
+    times.observe("m", 1.4)
+    assert times.hedge_delay("m") == pytest.approx(1.4)
+    fast = ollama_client._FirstTokenTimes()
+    for _ in range(10):
+        fast.observe("m", 0.01)
+    assert fast.hedge_delay("m") == 0.2
+
+
+def test_connect_errors_are_retried(monkeypatch, attempts):
+    monkeypatch.setattr(ollama_client, "HEDGE_REQUESTS", False)
+    monkeypatch.setattr(ollama_client, "RETRY_ATTEMPTS", 2)
+    attempts["script"] = [(0.0, OllamaConnectError("refused"), ""), (0.0, None, "retried")]
+
+    assert _generate() == "retried"
+    assert len(attempts["backends"]) == 2
+
+
+def test_other_errors_are_not_retried(monkeypatch, attempts):
+    monkeypatch.setattr(ollama_client, "HEDGE_REQUESTS", False)
+    monkeypatch.setattr(ollama_client, "RETRY_ATTEMPTS", 2)
+    attempts["script"] = [(0.0, OllamaTimeout("no first token"), ""), (0.0, None, "unused")]
+
+    with pytest.raises(OllamaTimeout):
+        _generate()
+    assert len(attempts["backends"]) == 1
+
+
+def test_retries_stop_after_retry_attempts(monkeypatch, attempts):
+    monkeypatch.setattr(ollama_client, "HEDGE_REQUESTS", False)
+    monkeypatch.setattr(ollama_client, "RETRY_ATTEMPTS", 1)
+    attempts["script"] = [(0.0, OllamaConnectError("refused"), "")] * 3
+
+    with pytest.raises(OllamaConnectError):
+        _generate()
+    assert len(attempts["backends"]) == 2
@@ -0,0 +1,20 @@
+import asyncio
+
+from services import ollama_client
+
+
+def test_lazily_created_client_is_closed_with_its_loop(monkeypatch):
+    monkeypatch.setattr(ollama_client, "_async_client", None)
+    monkeypatch.setattr(ollama_client, "_async_client_loop", None)
+    monkeypatch.setattr(ollama_client, "_async_client_closer", None)
+
+    async def use():
+        async with ollama_client._async_client_ctx() as client:
+            assert not client.is_closed
+            return client
+
+    first = asyncio.run(use())
+    assert first.is_closed
+    second = asyncio.run(use())
+    assert second is not first
+    assert second.is_closed
@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+from services import export_utils
+
+
+class SlowBuilder:
+    def __init__(self, title):
+        self.text = ""
+
+    def feed(self, text):
+        time.sleep(0.3)
+        self.text += text
+
+    def finish(self):
+        return self.text.encode("utf-8")
+
+
+def test_finish_during_a_slow_render_returns_everything(monkeypatch):
+    monkeypatch.setitem(export_utils.EXPORT_BUILDERS, "slow", SlowBuilder)
+
+    async def main():
+        export = export_utils.IncrementalExport(["slow"])
+        export.feed("a")
+        await asyncio.sleep(0.05)  # "a" is rendering
+        export.feed("b")
+        return await asyncio.wait_for(export.finish(), timeout=5)
+
+    assert asyncio.run(main()) == {"slow": b"ab"}
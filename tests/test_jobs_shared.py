@@ -0,0 +1,48 @@
+"""Jobs are served by any worker: two app processes sharing one document store stand in for uvicorn workers."""
+import httpx
+import pytest
+
+PAYLOAD = {"doc_type": "nda", "party1": "Shared Job A", "party2": "Shared Job B", "bypass_cache": True}
+
+
+@pytest.fixture(scope="module")
+def workers(mock_ollama, app_server, tmp_path_factory):
+    store = str(tmp_path_factory.mktemp("store") / "documents.db")
+    url = f"{mock_ollama}/api/generate"
+    with app_server(url, store) as first, app_server(url, store) as second:
+        yield first, second, mock_ollama
+
+
+def test_other_worker_reports_streams_and_cancels_a_job(workers, wait_for):
+    first, second, mock = workers
+    job = httpx.post(f"{first}/legal/jobs", json=PAYLOAD).json()
+    url = f"{second}/legal/jobs/{job['id']}"
+
+    assert wait_for(lambda: httpx.get(url).json()["status"] == "running")
+    assert httpx.get(f"{second}/health").json()["jobs"]["shared"] is True
+
+    # Resume from an offset through the other worker
+    with httpx.stream("GET", f"{url}/stream", params={"offset": 3}, timeout=30) as r:
+        chunks = r.iter_bytes()
+        resumed = next(chunk for chunk in chunks if chunk)
+
+    cancelled = httpx.delete(url, timeout=30).json()
+    assert cancelled["status"] == "cancelled"
+    assert httpx.get(f"{first}/legal/jobs/{job['id']}").json()["status"] == "cancelled"
+    assert wait_for(lambda: httpx.get(f"{mock}/stats").json()["in_flight"] == 0)
+    # The owner's output, byte for byte
+    owner = httpx.get(f"{first}/legal/jobs/{job['id']}/stream").content
+    assert owner[3:3 + len(resumed)] == resumed
+
+
+def test_other_worker_serves_a_finished_job(workers, wait_for):
+    first, second, _ = workers
+    payload = {**PAYLOAD, "party1": "Finished Job A", "num_predict": 40}
+    job = httpx.post(f"{first}/legal/jobs", json=payload).json()
+    url = f"{second}/legal/jobs/{job['id']}"
+
+    assert wait_for(lambda: httpx.get(url).json()["status"] == "done")
+    result = httpx.get(f"{url}/result").json()
+    assert result["response"] == httpx.get(f"{first}/legal/jobs/{job['id']}/result").json()["response"]
+    assert httpx.get(f"{url}/stream", params={"offset": 5}).text == result["response"].encode()[5:].decode()
+    assert httpx.get(f"{second}/legal/jobs/0123456789abcdef").status_code == 404
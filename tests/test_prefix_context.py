@@ -0,0 +1,42 @@
+import asyncio
+
+from services import legal_generator
+from services.ollama_client import OllamaError
+
+
+def _prime(monkeypatch, response, times=1):
+    calls = []
+
+    async def fake_generate_raw(prompt, **kwargs):
+        calls.append(kwargs)
+        if isinstance(response, Exception):
+            raise response
+        return {"response": response, "context": [1, 2, 3]}
+
+    monkeypatch.setattr(legal_generator, "generate_raw", fake_generate_raw)
+    monkeypatch.setattr(legal_generator, "context_cache", legal_generator.LRUTTLCache(4, 60))
+    monkeypatch.setattr(legal_generator, "context_failures", legal_generator.LRUTTLCache(4, 60))
+    for _ in range(times):
+        context = asyncio.run(legal_generator._prefix_context("Draft a contract.", "test-model", "batch"))
+    return context, calls
+
+
+def test_priming_disables_reasoning_and_caches_the_context(monkeypatch):
+    context, calls = _prime(monkeypatch, "OK")
+    assert context == [1, 2, 3]
+    assert calls[0]["think"] is False
+    assert len(legal_generator.context_cache) == 1
+
+
+def test_context_ending_in_reasoning_is_not_cached(monkeypatch):
+    for response in ("", "<think>\nThe user"):
+        context, _ = _prime(monkeypatch, response)
+        assert context is None
+        assert len(legal_generator.context_cache) == 0
+
+
+def test_failed_priming_is_not_retried_until_it_expires(monkeypatch):
+    for response in ("", OllamaError("down")):
+        context, calls = _prime(monkeypatch, response, times=3)
+        assert context is None
+        assert len(calls) == 1
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from services.scheduler import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    QueueFullError,
+    QueueTimeoutError,
+    Scheduler,
+)
+
+
+def test_interactive_requests_are_admitted_before_batch():
+    scheduler = Scheduler(1, 8, 10)
+    order = []
+
+    async def worker(name, priority):
+        async with scheduler.slot("m", priority):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await scheduler.acquire("m")
+        workers = [asyncio.ensure_future(worker(f"batch{i}", PRIORITY_BATCH)) for i in range(2)]
+        workers += [asyncio.ensure_future(worker(f"interactive{i}", PRIORITY_INTERACTIVE)) for i in range(2)]
+        await asyncio.sleep(0.01)
+        scheduler.release("m")
+        await asyncio.gather(*workers)
+
+    asyncio.run(run())
+    assert order == ["interactive0", "interactive1", "batch0", "batch1"]
+
+
+def test_full_queue_is_rejected_with_429_and_retry_after():
+    scheduler = Scheduler(1, 1, 10)
+
+    async def run():
+        await scheduler.acquire("m")
+        waiter = asyncio.ensure_future(scheduler.acquire("m"))
+        await asyncio.sleep(0.01)
+        try:
+            with pytest.raises(QueueFullError) as exc:
+                await scheduler.acquire("m")
+        finally:
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+        return exc.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 429
+    assert error.retry_after >= 1
+    assert scheduler.stats()["m"]["rejected"] == 1
+
+
+def test_queue_timeout_fails_with_503_and_retry_after():
+    scheduler = Scheduler(1, 4, 0.05)
+
+    async def run():
+        await scheduler.acquire("m")
+        with pytest.raises(QueueTimeoutError) as exc:
+            await scheduler.acquire("m")
+        return exc.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 503
+    assert error.retry_after >= 1
+    assert scheduler.stats()["m"]["queued"] == 0
+
+
+def test_cancelled_holder_and_waiter_release_their_slots():
+    scheduler = Scheduler(1, 4, 10)
+
+    async def hold():
+        async with scheduler.slot("m"):
+            await asyncio.sleep(10)
+
+    async def run():
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0.01)
+        waiter = asyncio.ensure_future(scheduler.acquire("m"))
+        await asyncio.sleep(0.01)
+        assert scheduler.stats()["m"]["queued"] == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert scheduler.stats()["m"]["queued"] == 0
+        holder.cancel()
+        await asyncio.gather(holder, return_exceptions=True)
+        assert scheduler.stats()["m"]["active"] == 0
+        await asyncio.wait_for(scheduler.acquire("m"), 1)
+
+    asyncio.run(run())
+    assert scheduler.stats()["m"]["active"] == 1
+
+
+def test_per_model_limits_override_the_default():
+    scheduler = Scheduler(1, 0, 10, limits={"big": 2})
+
+    async def run():
+        await scheduler.acquire("big")
+        await scheduler.acquire("big")
+        await scheduler.acquire("small")
+        with pytest.raises(QueueFullError):
+            await scheduler.acquire("small")
+
+    asyncio.run(run())
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from services import legal_generator
+from services.ollama_client import OllamaError
+from services.scheduler import Scheduler
+
+
+def test_failed_section_cancels_and_awaits_the_others(monkeypatch):
+    async def fake_generate(prompt, **kwargs):
+        if "section 1 of" in prompt:
+            raise OllamaError("section failed")
+        await asyncio.sleep(3600)
+
+    scheduler = Scheduler(8, 64, 30)
+    monkeypatch.setattr(legal_generator, "generate", fake_generate)
+    monkeypatch.setattr(legal_generator, "scheduler", scheduler)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        unretrieved = []
+        loop.set_exception_handler(lambda _, context: unretrieved.append(context))
+        stream = legal_generator._section_stream(
+            "nda", "A", "B", "", "", model="test-model", temperature=0.3, top_p=0.9, num_predict=None,
+            priority="batch",
+        )
+        with pytest.raises(OllamaError):
+            async for _ in stream:
+                pass
+        # Every other section has left its slot by the time the error reaches the caller
+        assert scheduler.stats()["test-model"]["active"] == 0
+        others = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        assert all(t.done() for t in others)
+        return unretrieved
+
+    unretrieved = asyncio.run(main())
+    assert not unretrieved
+
+
+def test_sections_share_the_document_budget(monkeypatch):
+    budgets = []
+
+    async def fake_generate(prompt, **kwargs):
+        budgets.append(kwargs["num_predict"])
+        return "text"
+
+    monkeypatch.setattr(legal_generator, "generate", fake_generate)
+    monkeypatch.setattr(legal_generator, "scheduler", Scheduler(8, 64, 30))
+    monkeypatch.setattr(legal_generator, "TOKEN_BUDGET_ADAPTIVE", False)
+    monkeypatch.setattr(legal_generator, "DEFAULT_NUM_PREDICT", 4096)
+    sections = len(legal_generator.template_sections("rental agreement"))
+
+    async def main():
+        async for _ in legal_generator._section_stream(
+            "rental agreement", "A", "B", "12", "", model="test-model", temperature=0.3, top_p=0.9,
+            num_predict=None, priority="batch",
+        ):
+            pass
+
+    asyncio.run(main())
+    assert budgets == [-(-4096 // sections)] * sections
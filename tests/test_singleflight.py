@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from services.singleflight import SingleFlight, StreamSingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run():
+        results = await asyncio.gather(*(flights.do("key", work) for _ in range(5)))
+        return results, flights.in_flight()
+
+    results, in_flight = asyncio.run(run())
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert in_flight == 0
+
+
+def test_error_reaches_every_caller():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.05)
+        raise ValueError("boom")
+
+    async def run():
+        return await asyncio.gather(*(flights.do("key", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert [type(r) for r in results] == [ValueError] * 3
+
+
+def test_call_is_cancelled_only_after_the_last_caller_leaves():
+    flights = SingleFlight()
+    cancelled = []
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def run():
+        callers = [asyncio.ensure_future(flights.do("key", work)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        callers[0].cancel()
+        await asyncio.sleep(0.01)
+        first = list(cancelled)
+        callers[1].cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0.01)
+        return first, list(cancelled), flights.in_flight()
+
+    first, last, in_flight = asyncio.run(run())
+    assert first == []
+    assert last == [1]
+    assert in_flight == 0
+
+
+def test_stream_fans_out_with_replay_for_late_subscribers():
+    flights = StreamSingleFlight()
+    calls = []
+
+    async def source():
+        calls.append(1)
+        for chunk in ("a", "b", "c"):
+            await asyncio.sleep(0.02)
+            yield chunk
+
+    async def collect(delay):
+        await asyncio.sleep(delay)
+        return "".join([chunk async for chunk in flights.stream("key", source)])
+
+    async def run():
+        return await asyncio.gather(collect(0), collect(0.03), collect(0.05))
+
+    assert asyncio.run(run()) == ["abc"] * 3
+    assert len(calls) == 1
+
+
+def test_stream_error_reaches_every_subscriber():
+    flights = StreamSingleFlight()
+
+    async def source():
+        yield "a"
+        await asyncio.sleep(0.02)
+        raise ValueError("boom")
+
+    async def collect():
+        chunks = []
+        with pytest.raises(ValueError):
+            async for chunk in flights.stream("key", source):
+                chunks.append(chunk)
+        return chunks
+
+    async def run():
+        return await asyncio.gather(collect(), collect(), collect())
+
+    assert asyncio.run(run()) == [["a"]] * 3
@@ -0,0 +1,35 @@
+from services.streaming import ThinkFilter
+
+
+def _run(chunks):
+    think = ThinkFilter()
+    return "".join(think.feed(chunk) for chunk in chunks) + think.flush()
+
+
+def test_reasoning_block_is_removed():
+    assert _run(["<think>plan the clauses</think>\n\nAgreement"]) == "Agreement"
+
+
+def test_tags_split_across_chunks_are_found():
+    text = "<think>\nplan</think>\nAgreement <think>check</think> text"
+    for size in (1, 2, 3, 5, 8, len(text)):
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        assert _run(chunks) == "Agreement text", size
+
+
+def test_partial_tag_is_held_back_until_settled():
+    think = ThinkFilter()
+    assert think.feed("Terms <thi") == "Terms "
+    assert think.feed("s apply") == "<this apply"
+    assert think.flush() == ""
+
+
+def test_text_before_and_between_blocks_is_kept():
+    chunks = ["Intro <th", "ink>a</think> middle <think>b</th", "ink> end"]
+    assert _run(chunks) == "Intro middle end"
+
+
+def test_unclosed_block_is_dropped_and_plain_text_passes_through():
+    assert _run(["Agreement", " <think>never closed"]) == "Agreement "
+    assert _run(["a < b", " and x<y"]) == "a < b and x<y"
+    assert _run(["ends with <"]) == "ends with <"